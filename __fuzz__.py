@@ -0,0 +1,360 @@
+# This file contains randomized differential tests that compare the fast
+#   tracing and aggregation paths against the reference tracing methods on
+#   large random networks, timing both
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# __fuzz__()
+FUZ_LAK = 2 # number of lakes
+FUZ_TRB = 10 # number of tributaries per lake
+FUZ_RCH = 300 # largest number of reaches per tributary
+FUZ_BAR = 0.3 # proportion of reaches with barriers
+FUZ_CAT = 0.2 # proportion of reaches that start a new catchment
+FUZ_SMP = 300 # number of objects sampled for slow reference checks
+FUZ_TOL = 1e-9 # relative tolerance of compared values
+
+
+# ~~ __random_data__() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def __random_data__(seed=None, lakes=FUZ_LAK, tributaries=FUZ_TRB, reaches=FUZ_RCH,
+    barrierRate=FUZ_BAR, catchmentRate=FUZ_CAT):
+    """
+    __RANDOM_DATA__() generates a random network formatted for Hydrography,
+    as returned by load_data.load_hydro_mdb(). Reaches drain to one of the
+    previous few reaches of their tributary, catchments are connected groups
+    of reaches and barrier downstream links follow the reaches.
+
+    INPUT:
+        seed            = (optional) random seed. Default (None) is random.
+
+        lakes           = (optional) number of lakes. Default is FUZ_LAK.
+
+        tributaries     = (optional) number of tributaries per lake. Default
+            is FUZ_TRB.
+
+        reaches         = (optional) largest number of reaches per tributary.
+            Default is FUZ_RCH.
+
+        barrierRate     = (optional) proportion of reaches with barriers.
+            Default is FUZ_BAR.
+
+        catchmentRate   = (optional) proportion of reaches that start a new
+            catchment. Default is FUZ_CAT.
+
+    OUTPUT: a dictionary formatted for Hydrography
+    """
+    import random
+    from hydrography import (
+        CRH_DAT_BAR, CRH_DAT_FLO, CRH_DAT_CAT, CRH_DAT_TRB, CRH_FLD_BID,
+        CRH_FLD_BDS, CRH_FLD_RID, CRH_FLD_NAT, CRH_FLD_LAK, CRH_FLD_FPR,
+        CRH_FLD_HAB, CRH_FLD_CST, CRH_FLD_LAM, CRH_FLD_P04, CRH_FLD_P07,
+        CRH_FLD_P10, CRH_FLD_BFW, CRH_FLD_DRP, CRH_FLD_HIT, CRH_FLD_TYP,
+        CRH_FLD_RDS, CRH_FLD_TID, CRH_FLD_CAT, CRH_FLD_CDS, CRH_FLD_WSA,
+        CRH_FLD_LEN, CRH_FLD_STO
+    )
+
+    def index(*fields): return dict((fields[i], i) for i in xrange(len(fields)))
+
+    generator = random.Random(seed)
+    barriers, flowlines, catchments, tribs = [], [], [], []
+    for l in xrange(lakes):
+        lake = 'L%i' % l
+        for t in xrange(tributaries):
+            tid = '%sT%i' % (lake, t)
+            tribs.append([tid, lake])
+            n = generator.randint(max(reaches // 2, 1), max(reaches, 1))
+            rid = ['%sR%i' % (tid, k) for k in xrange(n)]
+            down = [None] + [generator.randint(max(0, k - 10), k - 1) for k in xrange(1, n)]
+
+            # catchments start at a reach and take the reaches draining to it
+            catchment = [None] * n
+            for k in xrange(n):
+                if (k == 0) or (generator.random() < catchmentRate):
+                    catchment[k] = '%sC%i' % (tid, k)
+                    cds = None if k == 0 else catchment[down[k]]
+                    catchments.append([catchment[k], cds, round(generator.uniform(0.1, 20.), 3)])
+                else:
+                    catchment[k] = catchment[down[k]]
+
+            for k in xrange(n):
+                flowlines.append([
+                    rid[k], (None if down[k] is None else rid[down[k]]), tid,
+                    catchment[k], round(generator.uniform(0.1, 2.), 3), None
+                ])
+
+            # barriers, each linked to the next barrier downstream, which is
+            #   later on its reach or the most upstream barrier below it
+            onReach = [[] for k in xrange(n)]
+            rows = {}
+            for k in xrange(n):
+                if generator.random() < barrierRate:
+                    count = generator.randint(1, 2)
+                    fprops = sorted(set([round(generator.uniform(0.01, 0.99), 2) for i in xrange(count)]))
+                    onReach[k] = ['%sB%i_%i' % (tid, k, i) for i in xrange(len(fprops))]
+                    for i in xrange(len(fprops)):
+                        isDam = generator.random() < 0.1
+                        rows[onReach[k][i]] = len(barriers)
+                        barriers.append([
+                            onReach[k][i], None, rid[k], fprops[i], None,
+                            (None if generator.random() < 0.1 else float(generator.randint(1, 100))),
+                            generator.choice(('USA', 'CAN')), None,
+                            round(generator.random(), 2), round(generator.random(), 2), round(generator.random(), 2),
+                            (None if isDam else round(generator.uniform(0., 2.), 2)),
+                            (None if isDam else round(generator.uniform(0.5, 5.), 2)),
+                            (round(generator.uniform(1., 10.), 1) if isDam else None), isDam
+                        ])
+
+            firstBelow = [None] * n
+            for k in xrange(n):
+                below = None if down[k] is None else firstBelow[down[k]]
+                firstBelow[k] = onReach[k][0] if len(onReach[k]) > 0 else below
+                links = onReach[k][1:] + [below]
+                for i in xrange(len(onReach[k])):
+                    barriers[rows[onReach[k][i]]][1] = links[i]
+
+    barFields = index(
+        CRH_FLD_BID, CRH_FLD_BDS, CRH_FLD_RID, CRH_FLD_FPR, CRH_FLD_HAB,
+        CRH_FLD_CST, CRH_FLD_NAT, CRH_FLD_LAM, CRH_FLD_P04, CRH_FLD_P07,
+        CRH_FLD_P10, CRH_FLD_DRP, CRH_FLD_BFW, CRH_FLD_HIT, CRH_FLD_TYP
+    )
+    floFields = index(
+        CRH_FLD_RID, CRH_FLD_RDS, CRH_FLD_TID, CRH_FLD_CAT, CRH_FLD_LEN,
+        CRH_FLD_STO
+    )
+    catFields = index(CRH_FLD_CAT, CRH_FLD_CDS, CRH_FLD_WSA)
+    trbFields = index(CRH_FLD_TID, CRH_FLD_LAK)
+    return {
+        CRH_DAT_BAR: (barFields, barriers), CRH_DAT_FLO: (floFields, flowlines),
+        CRH_DAT_CAT: (catFields, catchments), CRH_DAT_TRB: (trbFields, tribs)
+    }
+
+
+
+# ~~ __fuzz__() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def __fuzz__(seed=None, verbose=True, samples=FUZ_SMP, **options):
+    """
+    __FUZZ__() builds a random network (see __random_data__()) and checks
+    every fast path against the reference tracing methods, printing the
+    time each took. Each fast path runs twice: first with the network's
+    cached indexes dropped, so the time includes building them, then again
+    with the indexes built. Fast paths that create a new network include
+    its creation either way.
+
+    INPUT:
+        seed        = (optional) random seed. Default (None) is random.
+
+        verbose     = (optional) whether to print each check's result and
+            timing (True). Failures are always printed. Default is True.
+
+        samples     = (optional) number of objects sampled for checks whose
+            reference is slow. Default is FUZ_SMP.
+
+        **options   = optional keyword arguments for __random_data__()
+
+    OUTPUT: list of (check name, passed, reference seconds, fast seconds
+        with indexes built, fast seconds including index builds). Raises
+        AssertionError if any check fails.
+    """
+    import random, time, numpy
+    from hydrography import Barrier, Dam, Reach, Catchment, Tributary, Hydrography
+    from topology import TreeIndex
+
+    if seed is None: seed = random.randint(0, 2**31)
+    data = __random_data__(seed, **options)
+    H = Hydrography(data)
+    generator = random.Random(seed)
+
+    reaches = sorted(H.get_reaches(), key=lambda r: r.id)
+    catchments = sorted(H.get_catchments(), key=lambda c: c.id)
+    barriers = sorted(H.get_barriers(), key=lambda b: b.id)
+    tributaries = sorted(H.get_tributaries(), key=lambda t: t.id)
+    def sample(objects): return generator.sample(objects, min(samples, len(objects)))
+    sampledReaches = sample(reaches)
+    sampledCatchments = sample(catchments)
+    sampledBarriers = sample(barriers)
+
+    def close(a, b):
+        return abs(a - b) <= FUZ_TOL * max(1., abs(a), abs(b))
+
+    def all_close(a, b):
+        return (len(a) == len(b)) and all([close(x, y) for x, y in zip(a, b)])
+
+    # ~~ FAST PATHS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def tree_trace_up(objects):
+        index = TreeIndex.from_objects(reaches)
+        return [set(index.upstream(r)) for r in objects]
+
+    def matrix_trace_down(objects):
+        matrix = H.network_matrix(Barrier)
+        masks = [matrix.downstream_mask(matrix.indexes([b])) for b in objects]
+        return [set(matrix.objects(numpy.flatnonzero(m))) - set([b]) for m, b in zip(masks, objects)]
+
+    def matrix_sums(objType, attribute, objects, up):
+        matrix = H.network_matrix(objType)
+        values = matrix.values(attribute)
+        if up: sums = matrix.upstream_sum(values, False)
+        else: sums = matrix.downstream_sum(values, False)
+        return list(sums[matrix.indexes(objects)])
+
+    def view_objects(objects):
+        return [H.subnetwork(r).get_reaches() - set([r]) for r in objects]
+
+    def brute_habitat(guild):
+        habitat = []
+        for t in tributaries:
+            total = 0.
+            for r in t.reaches:
+                bs = sorted(r.barriers, key=lambda b: b.fprop)
+                cuts = [0.] + [b.fprop for b in bs] + [1.]
+                for k in xrange(len(cuts) - 1):
+                    if k < len(bs): owner = bs[k]
+                    else:
+                        owner = None
+                        for d in r.trace_down():
+                            if len(d.barriers) > 0:
+                                owner = min(d.barriers, key=lambda b: b.fprop)
+                                break
+                    product = 1.
+                    if owner is not None:
+                        for b in [owner] + owner.trace_down():
+                            p = b.passabilities.get(guild)
+                            product *= 1. if p is None else p
+                    total += (cuts[k+1] - cuts[k]) * r.length * product
+            habitat.append(total)
+        return habitat
+
+    def tree_habitat(guild):
+        habitat = H.barrier_tree().habitat(guild)
+        return [habitat[t] for t in tributaries]
+
+    def scenario_gains(guild, objects):
+        return [H.scenario(removed=[b]).gain(guild) for b in objects]
+
+    def tree_gains(guild, objects):
+        tree = H.barrier_tree()
+        gain = tree.removal_gain(guild)
+        return [gain[tree.index[b]] for b in objects]
+
+    def brute_mouth(objects):
+        return [
+            (1. - b.fprop) * b.reach.length + sum([r.length for r in b.reach.trace_down()])
+            for b in objects
+        ]
+
+    def brute_heads():
+        heads = [
+            r for r in reaches if (r.down is r) or (len(r.barriers) > 0)
+            or (len(r.tributary.reachUp[r.down]) != 1)
+        ]
+        return [(r.id, r.tributary.length_up(r) + r.length) for r in heads]
+
+    def contracted_heads():
+        contracted = H.contracted_network()
+        sums = contracted.matrix.upstream_sum(contracted.length)
+        return sorted([(r.id, sums[k]) for k, r in enumerate(contracted.matrix.nodes)])
+
+    # ~~ CHECKS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    # (name, reference function, fast function, comparison)
+    equal = lambda a, b: a == b
+    checks = [
+        ('trace_up of reaches vs TreeIndex',
+            lambda: [r.tributary.trace_up(r) for r in sampledReaches],
+            lambda: tree_trace_up(sampledReaches), equal),
+        ('trace_down of barriers vs NetworkMatrix',
+            lambda: [set(b.trace_down()) for b in sampledBarriers],
+            lambda: matrix_trace_down(sampledBarriers), equal),
+        ('length_up vs NetworkMatrix',
+            lambda: [r.tributary.length_up(r) for r in reaches],
+            lambda: matrix_sums(Reach, 'length', reaches, True), all_close),
+        ('length_down vs NetworkMatrix',
+            lambda: [r.tributary.length_down(r) for r in reaches],
+            lambda: matrix_sums(Reach, 'length', reaches, False), all_close),
+        ('area_up vs NetworkMatrix',
+            lambda: [c.tributary.area_up(c) for c in catchments],
+            lambda: matrix_sums(Catchment, 'area', catchments, True), all_close),
+        ('area_down vs NetworkMatrix',
+            lambda: [c.tributary.area_down(c) for c in catchments],
+            lambda: matrix_sums(Catchment, 'area', catchments, False), all_close),
+        ('trace_up of reaches vs SubNetwork.get_objects',
+            lambda: [r.tributary.trace_up(r) for r in sampledReaches],
+            lambda: view_objects(sampledReaches), equal),
+        ('trace_up of barriers vs batch trace',
+            lambda: [b.tributary.trace_up(b) for b in barriers],
+            lambda: [set(t) for t in [H.trace_batch(barriers)] for t in [t[k] for k in xrange(len(t))]], equal),
+        ('trace_down of reaches vs batch trace',
+            lambda: [r.trace_down() for r in reaches],
+            lambda: [t[k] for t in [H.trace_batch(reaches, upstream=False)] for k in xrange(len(t))], equal),
+        ('get_objects vs lazy Hydrography',
+            lambda: [sorted([o.id for o in H.get_objects(t)]) for t in (Barrier, Reach, Catchment, Tributary)],
+            lambda: [sorted([o.id for o in L.get_objects(t)]) for L in [Hydrography(data, lazy=True)] for t in (Barrier, Reach, Catchment, Tributary)],
+            equal),
+        ('trace_down distance to mouth vs DistanceIndex',
+            lambda: brute_mouth(sampledBarriers),
+            lambda: list(H.river_distance(sampledBarriers)), all_close),
+        ('loaded barrier links vs links derived from reaches',
+            lambda: [(b.id, b.down.id) for b in barriers],
+            lambda: [(b.id, b.down.id) for b in sorted(Hydrography(data, validate=False, barrierLinks=False).get_barriers(), key=lambda b: b.id)],
+            equal),
+        ('next Dam below barriers vs NextIndex',
+            lambda: [([d for d in b.trace_down() if isinstance(d, Dam)] or [None])[0] for b in barriers],
+            lambda: [H.next_downstream(b, Dam) for b in barriers], equal),
+        ('mouths of reaches vs NextIndex',
+            lambda: [(r.trace_down() or [r])[-1] for r in sampledReaches],
+            lambda: [H.mouth(r) for r in sampledReaches], equal),
+        ('serial vs parallel Hydrography fingerprint',
+            lambda: H.fingerprint(),
+            lambda: Hydrography(data, validate=False, workers=2).fingerprint(), equal),
+        ('length_up of chain heads vs ContractedNetwork',
+            brute_heads, contracted_heads,
+            lambda a, b: ([x[0] for x in a] == [x[0] for x in b]) and all_close([x[1] for x in a], [x[1] for x in b])),
+    ]
+    for guild in sorted(H.barrier_tree().guilds()):
+        checks.append(('traced habitat (%s) vs BarrierTree' % guild,
+            lambda g=guild: brute_habitat(g), lambda g=guild: tree_habitat(g), all_close))
+        checks.append(('Scenario removal gains (%s) vs BarrierTree.removal_gain' % guild,
+            lambda g=guild: scenario_gains(g, sampledBarriers[:samples//10 or 1]),
+            lambda g=guild: tree_gains(g, sampledBarriers[:samples//10 or 1]), all_close))
+
+    # run checks, timing the fast path with and without building its
+    #   indexes
+    if verbose:
+        print 'Fuzzing seed %i: %i reaches, %i catchments, %i barriers' % (
+            seed, len(reaches), len(catchments), len(barriers)
+        )
+    results = []
+    for name, reference, fast, compare in checks:
+        H.__dict__.pop('indexes', None)
+        start = time.time()
+        coldResult = fast()
+        coldTime = time.time() - start
+        start = time.time()
+        fastResult = fast()
+        fastTime = time.time() - start
+        start = time.time()
+        referenceResult = reference()
+        referenceTime = time.time() - start
+        passed = compare(referenceResult, coldResult) and compare(referenceResult, fastResult)
+        results.append((name, passed, referenceTime, fastTime, coldTime))
+        if verbose or not passed:
+            print '%s: %s (reference %.3f s, fast %.3f s, %.1fx; %.3f s with index builds)' % (
+                'PASSED' if passed else 'FAILED', name, referenceTime, fastTime,
+                referenceTime / max(fastTime, 1e-6), coldTime
+            )
+
+    failures = len([r for r in results if not r[1]])
+    if failures > 0:
+        raise AssertionError('%i of %i fuzz checks failed with seed %i.' % (failures, len(results), seed))
+
+    return results
+
+
+
+if __name__ == '__main__':
+    import sys
+    __fuzz__(int(sys.argv[1]) if len(sys.argv) > 1 else None)
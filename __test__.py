@@ -6,9 +6,88 @@
 # ArcGIS version: 10.3.1
 # Python version: 2.7.8
 
+def __test_data__():
+    """
+    Returns the test network of __test__() formatted for Hydrography, as
+    returned by load_data.load_hydro_mdb().
+    """
+
+    from hydrography import (
+        CRH_DAT_BAR, CRH_DAT_FLO, CRH_DAT_CAT, CRH_DAT_TRB, CRH_FLD_BID,
+        CRH_FLD_BDS, CRH_FLD_RID, CRH_FLD_NAT, CRH_FLD_LAK, CRH_FLD_FPR, 
+        CRH_FLD_HAB, CRH_FLD_CST, CRH_FLD_LAM, CRH_FLD_P04, CRH_FLD_P07, 
+        CRH_FLD_P10, CRH_FLD_BFW, CRH_FLD_DRP, CRH_FLD_HIT, CRH_FLD_TYP,
+        CRH_FLD_RDS, CRH_FLD_TID, CRH_FLD_CAT, CRH_FLD_CDS, CRH_FLD_WSA,
+        CRH_FLD_LEN, CRH_FLD_STO
+    )
+    
+    def index(*fields): return dict((fields[i], i) for i in xrange(len(fields)))
+    
+    # barriers
+    barFields = index(
+        CRH_FLD_BID, CRH_FLD_BDS, CRH_FLD_RID, CRH_FLD_FPR, CRH_FLD_HAB,
+        CRH_FLD_CST, CRH_FLD_NAT, CRH_FLD_LAM, CRH_FLD_P04, CRH_FLD_P07,
+        CRH_FLD_P10, CRH_FLD_DRP, CRH_FLD_BFW, CRH_FLD_HIT, CRH_FLD_TYP
+    )
+    barriers = [
+        ['BA', 'BB', 'RA', 0.1, None, 10., 'USA', None, 0.5, 0.6, 0.7, 0.5, 2.0, None, False],
+        ['BB', 'BC', 'RC', 0.2, None, 20., 'USA', None, 0.1, 0.2, 0.3, 1.0, 3.0, None, False],
+        ['BC', 'BH', 'RC', 0.3, None, 30., 'CAN', None, 1.0, 1.0, 1.0, 0.0, 3.0, None, False],
+        ['BD', 'BF', 'RF', 0.1, None, 10., 'CAN', None, 0.4, 0.5, 0.6, 0.5, 1.0, None, False],
+        ['BE', 'BF', 'RG', 0.2, None, 10., 'USA', None, 0.9, 0.9, 0.9, 0.1, 1.0, None, False],
+        ['BF', 'BG', 'RH', 0.3, None, 40., 'USA', None, 0.0, 0.3, 0.6, 2.0, 2.0, None, False],
+        ['BG', 'BJ', 'RH', 0.4, None, 50., 'CAN', None, 0.8, 0.9, 1.0, 0.2, 2.0, None, False],
+        ['BH', None, 'RI', 0.1, None, 900., 'USA', None, 0.0, 0.0, 0.1, None, None, 4.0, True],
+        ['BI', 'BJ', 'RJ', 0.2, None, 10., 'CAN', None, 0.3, 0.3, 0.3, 0.7, 1.5, None, False],
+        ['BJ', None, 'RN', 0.3, None, 60., 'USA', None, 0.6, 0.7, 0.8, 0.3, 4.0, None, False],
+        ['BK', 'BL', 'RP', 0.1, None, 10., 'USA', None, 0.2, 0.4, 0.6, 0.6, 1.0, None, False],
+        ['BL', 'BN', 'RP', 0.2, None, 20., 'USA', None, 0.7, 0.8, 0.9, 0.2, 1.0, None, False],
+        ['BM', 'BN', 'RR', 0.1, None, 30., 'CAN', None, 0.5, 0.5, 0.5, 0.4, 1.0, None, False],
+        ['BN', None, 'RT', 0.1, None, 500., 'CAN', None, 0.1, 0.2, 0.3, None, None, 2.0, True]
+    ]
+    
+    # flowlines
+    floFields = index(
+        CRH_FLD_RID, CRH_FLD_RDS, CRH_FLD_TID, CRH_FLD_CAT, CRH_FLD_LEN,
+        CRH_FLD_STO
+    )
+    flowlines = [
+        ['RA', 'RC', 'TA', 'CA', 1.1, None], ['RB', 'RC', 'TA', 'CA', 1.2, None],
+        ['RC', 'RE', 'TA', 'CA', 1.3, None], ['RD', 'RE', 'TA', 'CA', 1.4, None],
+        ['RE', 'RI', 'TA', 'CA', 1.5, None], ['RF', 'RH', 'TA', 'CB', 1.1, None],
+        ['RG', 'RH', 'TA', 'CB', 1.2, None], ['RH', 'RK', 'TA', 'CB', 1.3, None],
+        ['RI', 'RO', 'TA', 'CD', 1.1, None], ['RJ', 'RM', 'TA', 'CD', 1.2, None],
+        ['RK', 'RM', 'TA', 'CD', 1.3, None], ['RL', 'RN', 'TA', 'CD', 1.4, None],
+        ['RM', 'RN', 'TA', 'CD', 1.5, None], ['RN', 'RO', 'TA', 'CD', 1.6, None],
+        ['RO', None, 'TA', 'CD', 1.7, None], ['RP', 'RQ', 'TB', 'CC', 1.1, None],
+        ['RQ', 'RS', 'TB', 'CE', 1.1, None], ['RR', 'RS', 'TB', 'CE', 1.2, None],
+        ['RS', 'RT', 'TB', 'CE', 1.3, None], ['RT', 'RV', 'TB', 'CF', 1.1, None],
+        ['RU', 'RV', 'TB', 'CF', 1.2, None], ['RV', None, 'TB', 'CF', 1.3, None]
+    ]
+    
+    # catchments
+    catFields = index(CRH_FLD_CAT, CRH_FLD_CDS, CRH_FLD_WSA)
+    catchments = [
+        ['CA', 'CD', 10.1], ['CB', 'CD', 10.2], ['CC', 'CE', 10.1],
+        ['CD', None, 10.3], ['CE', 'CF', 10.2], ['CF', None, 10.3]
+    ]
+    
+    # tributaries
+    trbFields = index(CRH_FLD_TID, CRH_FLD_LAK)
+    tributaries = [['TA', 'LA'], ['TB', 'LA']]
+    
+    return {
+        CRH_DAT_BAR: (barFields, barriers), CRH_DAT_FLO: (floFields, flowlines),
+        CRH_DAT_CAT: (catFields, catchments), CRH_DAT_TRB: (trbFields, tributaries)
+    }
+    
+    
 def __test__(verbose=False):
 
-    from hydrography import Barrier, Reach, Catchment, Tributary, Lake
+    from hydrography import Barrier, Dam, RSX, Reach, Catchment, Tributary, Lake, Hydrography
+    from spatial import ReachGrid
+    from topology import TreeIndex, find_problems, TopologyError
+    from scenario import Scenario
 
     # Test Data
     
@@ -103,6 +182,207 @@ def __test__(verbose=False):
     
     LA = Lake([TA, TB])
     
+    # Formatted data, network and broken copies of the data
+    data = __test_data__()
+    H = Hydrography(data)
+    cycleData = __test_data__()
+    cycleData['flowlines'][1][2][1] = 'RA' # RC drains to RA
+    missingData = __test_data__()
+    missingData['barriers'][1][0][1] = 'BZ' # BA drains to unknown barrier
+    missingData['barriers'][1][8][1] = 'BA' # BI drains upstream
+    missingData['catchments'][1].append(['CG', None, 1.0]) # catchment without reaches
+    index = TreeIndex.from_objects(TA.reaches)
+    
+    # Reach geometries and a network for adding barriers
+    SA = Reach(id='SA', geometry=[(0., 0.), (10., 0.)])
+    SB = Reach(id='SB', geometry=[(10., 0.), (10., 10.), (20., 10.)])
+    grid = ReachGrid([SA, SB], cellSize=3.)
+    H2 = Hydrography(data)
+    BX = RSX(id='BX', reach=H2.get_object(Reach, 'RC'), fprop=0.25)
+    BY = Dam(id='BY', reach=H2.get_object(Reach, 'RO'), fprop=0.5)
+    H2.add_barriers([BX, BY])
+    HN = Hydrography(__test_data__())
+    addedBefore = (HN.fingerprint(), HN.barrier_tree(), HN.accessible_habitat('passlow')[HN.get_object(Tributary, 'TA')])
+    BW = RSX(id='BW', reach=HN.get_object(Reach, 'RL'), fprop=0.5, passabilities={'passlow': 0., 'passmid': 0., 'passhigh': 0.})
+    HN.add_barriers([BW])
+    addedAfter = (HN.fingerprint(), HN.barrier_tree(), HN.accessible_habitat('passlow')[HN.get_object(Tributary, 'TA')])
+    BW.passabilities['passlow'] = 1.
+    addedEdited = HN.fingerprint()
+    
+    # Sub-network views
+    lakeView = H.subnetwork(H.get_object(Lake, 'LA'))
+    tribView = H.subnetwork(H.get_object(Tributary, 'TB'))
+    reachView = H.subnetwork(H.get_object(Reach, 'RM'))
+    HRM, HRN, HRJ, HCD = [H.get_object(Reach, r) for r in ('RM', 'RN', 'RJ')] + [H.get_object(Catchment, 'CD')]
+    
+    # Lazy network with one tributary per lake
+    lazyData = __test_data__()
+    lazyData['tributaries'][1][1][1] = 'LB'
+    H3 = Hydrography(lazyData, lazy=True)
+    H4 = Hydrography(lazyData, lazy=True)
+    lazyView = H4.subnetwork(H4.get_object(Tributary, 'TB'))
+    
+    # Exported tables
+    import tempfile, shutil, os, csv, numpy
+    exportPath = tempfile.mkdtemp()
+    exported = H.export(exportPath, columns={Barrier: {'double': lambda b: 2 * b.cost}})
+    exportedBarriers = list(csv.DictReader(open(os.path.join(exportPath, 'barriers.csv'))))
+    import export
+    exportedExtra = export.table_columns(H, {
+        Dam: {'damheight': 'height'}, RSX: {'rsxdrop': lambda b: b.drop},
+        Barrier: {'dropped': lambda b: b.drop}
+    })['barriers']
+    exportedExtra = dict(zip(exportedExtra[0], exportedExtra[1]))
+    exportMatrix = H.network_matrix(Reach)
+    exportedLengths = export.table_columns(H, {
+        Reach: {'lengthup': (exportMatrix, exportMatrix.upstream_sum(exportMatrix.values('length')))}
+    })['flowlines']
+    exportedLengths = dict(zip(exportedLengths[1][0], exportedLengths[1][exportedLengths[0].index('lengthup')]))
+    shutil.rmtree(exportPath)
+    
+    # Scenarios
+    HBH, HBF, HBK = [H.get_object(Barrier, b) for b in ('BH', 'BF', 'BK')]
+    habitat = dict((t.id, v) for t, v in H.accessible_habitat('passlow').items())
+    scenario = H.scenario(removed=[HBH, HBF], passabilities={HBK: {'passlow': 1.}})
+    nested = Scenario(scenario, removed=[HBK])
+    scenarioHabitat = dict((t.id, v) for t, v in scenario.habitat('passlow').items())
+    series = {HBH: [0., 1., 0.5, 0.], HBF: [0.8, 1., 1., 0.8]}
+    seriesTributaries, seriesHabitat = H.habitat_series('passlow', series, chunkSize=3)
+    ranks = H.rank_removals()
+    front, frontBox = H.pareto_front(epsilon=0., budget=100.)
+    import runner, cPickle, json
+    jobPath = tempfile.mkdtemp()
+    cPickle.dump(__test_data__(), open(os.path.join(jobPath, 'data.pickle'), 'wb'))
+    job = {
+        'data': 'data.pickle', 'scenarios': {'output': 'scenarios.jsonl', 'sets': [
+            {'name': 'BH', 'removed': ['BH']}, {'name': 'BH+BF', 'removed': ['BH', 'BF']}
+        ]}, 'rank': {'output': 'rank.json'}
+    }
+    json.dump(job, open(os.path.join(jobPath, 'job.json'), 'w'))
+    runner.main([os.path.join(jobPath, 'job.json'), '--quiet'])
+    jobLines = open(os.path.join(jobPath, 'scenarios.jsonl')).readlines()
+    open(os.path.join(jobPath, 'scenarios.jsonl'), 'w').write(jobLines[0] + jobLines[1][:10])
+    runner.main([os.path.join(jobPath, 'job.json'), '--quiet', '--stages', 'scenarios'])
+    resumedLines = open(os.path.join(jobPath, 'scenarios.jsonl')).readlines()
+    jobRanks = json.load(open(os.path.join(jobPath, 'rank.json')))
+    jobBuilds = [f for f in os.listdir(os.path.join(jobPath, 'cache')) if f.startswith('build-')]
+    jobNetwork = cPickle.load(open(os.path.join(jobPath, 'cache', jobBuilds[0]), 'rb'))
+    jobNetwork.marker = 'cached'
+    cPickle.dump(jobNetwork, open(os.path.join(jobPath, 'cache', jobBuilds[0]), 'wb'), 2)
+    jobCached = runner.run(runner.load_config(os.path.join(jobPath, 'job.json')), [], verbose=False)[runner.RUN_STG_BLD]
+    job['hydrography'] = {'barrierLinks': False}
+    json.dump(job, open(os.path.join(jobPath, 'job.json'), 'w'))
+    jobRebuilt = runner.run(runner.load_config(os.path.join(jobPath, 'job.json')), [], verbose=False)[runner.RUN_STG_BLD]
+    shutil.rmtree(jobPath)
+    import service
+    server = service.QueryServer({'test': H}, port=0)
+    server.start()
+    served = service.query('test', [
+        {'op': 'trace_up', 'type': 'Reach', 'id': 'RM'}, {'op': 'length_up', 'type': 'Reach', 'id': 'RM'},
+        {'op': 'scenario', 'removed': ['BH']}, {'op': 'get', 'type': 'Reach', 'id': 'BA'},
+        {'op': 'trace_down', 'type': 'Barrier', 'id': 'BK'}
+    ], port=server.server_address[1])
+    import urllib2
+    badStatus = []
+    for badBody in ('{"network": "test", "queries": 5}', '{"network": 5, "queries": []}', '{"network": "test", "queries": [5]}'):
+        try: urllib2.urlopen('http://127.0.0.1:%i/query' % server.server_address[1], badBody, timeout=10)
+        except urllib2.HTTPError as e: badStatus.append(e.code)
+    brokenBatch = server.batcher.submit('test', [{'op': 'get', 'type': 'Reach', 'id': set()}])
+    servedAfter = service.query('test', [{'op': 'length_up', 'type': 'Reach', 'id': 'RM'}], port=server.server_address[1])
+    workerAlive = server.batcher.worker.is_alive()
+    server.stop()
+    reachMatrix = H.network_matrix(Reach)
+    reachLengths = reachMatrix.values('length')
+    barrierMatrix = H.network_matrix(Barrier)
+    batchUp = H.trace_batch([H.get_object(Barrier, b) for b in ('BJ', 'BA', 'BF')])
+    batchDown = H.trace_batch([HRM, HRJ, H.get_object(Reach, 'RO')], upstream=False)
+    potamodromous = H.potamodromous_index('passlow')
+    dciTributaries = dict((t.id, v) for t, v in potamodromous.tributary_index().items())
+    dciLakes = dict((l.id, v) for l, v in potamodromous.lake_index().items())
+    potamodromous.set_passability(HBH, 1.)
+    potamodromous.set_passability(HBK, 0.9)
+    HP = Hydrography(__test_data__())
+    HP.get_object(Barrier, 'BH').passabilities = dict(HBH.passabilities, passlow=1.)
+    HP.get_object(Barrier, 'BK').passabilities = dict(HBK.passabilities, passlow=0.9)
+    updatedDci = [sorted([(x.id, round(v, 9)) for x, v in d.items()]) for d in (potamodromous.tributary_index(), potamodromous.lake_index())]
+    freshPotamodromous = HP.potamodromous_index('passlow')
+    freshDci = [sorted([(x.id, round(v, 9)) for x, v in d.items()]) for d in (freshPotamodromous.tributary_index(), freshPotamodromous.lake_index())]
+    contracted = H.contracted_network()
+    contractedEdges = contracted.edges([H.get_object(Reach, 'RE'), HRM])
+    contractedPoints = contracted.contract_points([H.get_object(Reach, 'RI'), H.get_object(Reach, 'RE')], [0.5, 0.5])
+    expandedPoints = contracted.expand_points(*contractedPoints)
+    import models
+    HM = Hydrography(__test_data__())
+    modelChanges = HM.apply_models([
+        models.BarrierModel(RSX, {'passnew': {'drop': models.Logistic(0.5, 4.), 'bfw': models.Piecewise([(0., 1.), (4., 0.5)])}}),
+        models.BarrierModel(Dam, {'passlow': {'height': models.Logistic(3., 1.)}}, {'height': models.Power(100., 1., 50.)})
+    ])
+    modelHabitat = HM.accessible_habitat('passnew')
+    HM.apply_models([models.BarrierModel(Dam, costs={'height': models.Power(100., 1., 50.)})], overwrite=True)
+    staleData = __test_data__()
+    for row in staleData['barriers'][1]: row[staleData['barriers'][0]['bds']] = 'BX'
+    HD = Hydrography(staleData, barrierLinks=False)
+    derivedLinks = sorted([(b.id, b.down.id) for b in HD.get_barriers()])
+    import cPickle
+    chainData = __test_data__()
+    chainData['flowlines'][1].extend([['RX%i' % i, 'RX%i' % (i - 1) if i > 0 else 'RA', 'TA', 'CA', 0.001, 1] for i in xrange(5000)])
+    HC = Hydrography(chainData)
+    pickledChain = cPickle.loads(cPickle.dumps(HC, 2))
+    pickled = cPickle.loads(cPickle.dumps(H.subnetwork(H.get_object(Tributary, 'TA')), 2))
+    import cache
+    cachePath = tempfile.mkdtemp()
+    HS = Hydrography(__test_data__())
+    scenarioCache = cache.ScenarioCache(cachePath, disk=600)
+    cachedFirst = scenarioCache.evaluate(HS, [HS.get_object(Barrier, 'BH')])
+    cachedSecond = scenarioCache.evaluate(HS, set([HS.get_object(Barrier, 'BH')]))
+    cachedHits = (scenarioCache.hits, scenarioCache.misses)
+    diskCache = cache.ScenarioCache(cachePath)
+    cachedDisk = diskCache.evaluate(HS, [HS.get_object(Barrier, 'BH')])
+    diskHits = diskCache.hits
+    HS.get_object(Barrier, 'BH').passabilities = dict(HS.get_object(Barrier, 'BH').passabilities, passlow=0.5)
+    cachedChanged = diskCache.evaluate(HS, [HS.get_object(Barrier, 'BH')])
+    for b in ('BA', 'BB', 'BC', 'BD', 'BE', 'BF'): scenarioCache.evaluate(HS, [HS.get_object(Barrier, b)])
+    cachedFiles = len([name for name in os.listdir(cachePath) if name.endswith('.json')])
+    shutil.rmtree(cachePath)
+    sharedPath = tempfile.mkdtemp()
+    firstCache, secondCache = cache.ScenarioCache(sharedPath, disk=600), cache.ScenarioCache(sharedPath, disk=600)
+    firstCache.put('first0', {'value': 'x' * 100})
+    for i in xrange(4): secondCache.put('second%i' % i, {'value': 'x' * 100})
+    for i in xrange(1, 5): firstCache.put('first%i' % i, {'value': 'x' * 100})
+    sharedBytes = sum([os.path.getsize(os.path.join(sharedPath, name)) for name in os.listdir(sharedPath) if name.endswith('.json')])
+    shutil.rmtree(sharedPath)
+    memoryCache = cache.ScenarioCache()
+    editedCached = memoryCache.evaluate(HS, [HS.get_object(Barrier, 'BA')])
+    editedPrint = HS.fingerprint()
+    HS.get_object(Barrier, 'BB').passabilities['passlow'] = 1.0
+    editedRecached = memoryCache.evaluate(HS, [HS.get_object(Barrier, 'BA')])
+    HE, HO = Hydrography(__test_data__()), Hydrography(__test_data__())
+    editedBefore = HE.accessible_habitat('passlow')[HE.get_object(Tributary, 'TA')]
+    otherVersion = HO.version.count
+    HE.get_object(Barrier, 'BH').passabilities['passlow'] = 1.0
+    editedAfter = HE.accessible_habitat('passlow')[HE.get_object(Tributary, 'TA')]
+    editedData = __test_data__()
+    for row in editedData['barriers'][1]:
+        if row[editedData['barriers'][0]['bid']] == 'BH': row[editedData['barriers'][0]['passlow']] = 1.0
+    editedFresh = Hydrography(editedData).accessible_habitat('passlow')
+    editedPickle = cPickle.loads(cPickle.dumps(HE, 2))
+    editedPickle.get_object(Barrier, 'BH').passabilities['passlow'] = 0.0
+    HP = Hydrography(__test_data__(), workers=2)
+    HF = Hydrography(__test_data__())
+    linkedData = [__test_data__(), __test_data__()]
+    for data in linkedData: data['flowlines'][1][-1][1] = 'RN'
+    HLP = Hydrography(linkedData[0], validate=False, barrierLinks=False, workers=2)
+    HLF = Hydrography(linkedData[1], validate=False, barrierLinks=False)
+    linkedDowns = [
+        dict(((cls, o.id), o.down.id) for cls in (Barrier, Reach, Catchment, Tributary) for o in network.ids[cls].values())
+        for network in (HLP, HLF)
+    ]
+    from __fuzz__ import __fuzz__, __random_data__
+    HL = Hydrography(__random_data__(7, lakes=1, tributaries=2, reaches=150), validate=False)
+    largeFront, largeBox = HL.pareto_front(maxSize=50)
+    fuzzResults = __fuzz__(seed=20151201, verbose=False, tributaries=3, reaches=80, samples=40)
+    streamedHabitat = H.habitat_series('passlow', lambda a, b: dict((k, v[a:b]) for k, v in series.items()), steps=4, chunkSize=1)[1]
+    
     # Tests
     epsilon = 1e5
     tests = (
@@ -124,8 +404,97 @@ def __test__(verbose=False):
         'abs(LA.area_all() - (CA.area + CB.area + CC.area + CD.area + CE.area + CF.area)) < epsilon', # sum of areas matches in area_all function
         'abs(LA.length_all() - sum([r.length for r in (RA, RB, RC, RD, RE, RF, RG, RH, RI, RJ, RK, RL, RM, RN, RO, RP, RQ, RR, RS, RT, RU, RV)])) < epsilon', # lake's length_all is correct
         'BJ.reach.trace_up(BJ) == set()', # barriers with no upstream barriers have empty upstream set
-        'RL.tributary.length_up(RL) == 0.' # reaches without upstream reaches have up length == 0
+        'RL.tributary.length_up(RL) == 0.', # reaches without upstream reaches have up length == 0
+        'TA.stream_order() == []', # stream orders calculate without disagreement when size is undefined
+        '(RO.strahler, RE.strahler, RJ.strahler) == (3, 2, 1)', # Strahler orders are correct
+        '(RO.shreve, RM.shreve) == (7, 3)', # Shreve magnitudes are correct
+        '(RO.upcount, RH.upcount, RL.upcount) == (14, 2, 0)', # upstream reach counts are correct
+        'len(H.get_barriers()) == 14 and H.problems == []', # formatted test data creates without problems
+        'set(index.upstream(RM)) == TA.trace_up(RM)', # tree index subtrees match traces
+        'index.is_upstream(RA, RI) and not index.is_upstream(RI, RA)', # tree index up/downstream tests are correct
+        '[p[0] for p in find_problems(cycleData)] == ["cycle"]', # cycles are found
+        'sorted([p[0] for p in find_problems(missingData)]) == ["missing", "order", "orphan"]', # missing IDs, bad barrier order and orphans are found together
+        'raises(TopologyError, Hydrography, cycleData)', # creation fails on topology errors instead of looping
+        'H.get_object(Reach, "RA").id == "RA" and raises(KeyError, H.get_object, Reach, "BA")', # ID lookups are correct
+        'abs(H.river_distance([H.get_object(Barrier, "BA")])[0] - 6.59) < 1e-9', # distance to mouth is correct
+        'abs(H.river_distance([(H.get_object(Reach, "RA"), 0.1)], [(H.get_object(Reach, "RJ"), 0.2)])[0] - 8.95) < 1e-9', # distance across a confluence is correct
+        'grid.snap([(2., 1.), (11., 5.), (15., 11.)]) == [(SA, 0.2, 1.), (SB, 0.25, 1.), (SB, 0.75, 1.)]', # points snap to the nearest reach with correct fprop
+        'grid.snap([(50., 50.)], maxDistance=5.) == [None]', # points beyond maxDistance are not snapped
+        '(H2.get_object(Barrier, "BB").down, BX.down, BX.tributary) == (BX, H2.get_object(Barrier, "BC"), H2.get_object(Tributary, "TA"))', # added barrier links into its reach
+        'BX.tributary.trace_up(BY) == BX.tributary.barriers - set([BY])', # added barrier below all others drains the tributary
+        'addedAfter[0] != addedBefore[0] and addedAfter[1] is not addedBefore[1] and addedAfter[2] < addedBefore[2] and addedEdited != addedAfter[0]', # added barriers and their later edits refresh cached indexes
+        'lakeView.get_reaches() == H.get_reaches() and len(tribView.get_barriers()) == 4', # lake and tributary views contain their objects
+        'set([r.id for r in reachView.get_reaches()]) == set(["RM", "RJ", "RK", "RH", "RF", "RG"])', # reach views contain the reach and everything upstream
+        'set([b.id for b in reachView.get_barriers()]) == set(["BI", "BF", "BG", "BD", "BE"]) and reachView.get_catchments() == set([H.get_object(Catchment, "CB")])', # reach views contain upstream barriers and whole catchments
+        'reachView.trace_down(HRJ) == [HRM] and not reachView.contains(HRN)', # tracing stops at the edge of the view
+        'abs(reachView.length_all() - 7.6) < 1e-9 and abs(reachView.length_up(HRM) - 6.1) < 1e-9', # view aggregation is correct
+        'raises(KeyError, reachView.get_object, Reach, "RN") and reachView.subnetwork(HRJ).get_reaches() == set([HRJ])', # views check membership and can be nested
+        'lakeView.lake_ids() == tribView.lake_ids() == reachView.lake_ids() == ["LA"] and lakeView.get_lake("LA") is tribView.get_lake("LA") is reachView.get_lake("LA") is H.get_object(Lake, "LA")', # views find their lakes
+        'raises(KeyError, lazyView.get_lake, "LA") and lazyView.lake_ids() == ["LB"]', # views only find their own lakes
+        'H3.lakeObjects == {} and sorted(H3.lake_ids()) == ["LA", "LB"]', # lazy networks create no lakes up front
+        'H3.get_object(Barrier, "BK").tributary.lake.id == "LB" and H3.lakeObjects.keys() == ["LB"]', # ID lookups create only the object's lake
+        'len(H3.get_barriers()) == 14 and len(H3.lakeObjects) == 2', # accessing all objects creates all lakes
+        'len(exported) == 4 and len(exportedBarriers) == 14', # a table is exported for each object type
+        'exportedExtra["damheight"][7] == 4.0 and exportedExtra["damheight"][0] is None and exportedExtra["rsxdrop"][:2] == [0.5, 1.0] and exportedExtra["rsxdrop"][7] is None and exportedExtra["dropped"][13] is None', # exported tables take sub-class columns
+        'abs(exportedLengths["RA"] - RA.length) < epsilon and abs(exportedLengths["RE"] - sum(r.length for r in [RA, RB, RC, RD, RE])) < epsilon', # exported matrix arrays are placed by the matrix's index
+        'raises(TypeError, export.table_columns, H, {Reach: {"rank": numpy.arange(22)}})', # exported arrays without their matrix are rejected
+        '(exportedBarriers[0]["BID"], exportedBarriers[0]["BID_DS"], exportedBarriers[0]["RID"], exportedBarriers[0]["double"]) == ("BA", "BB", "RA", "20.0")', # exported tables keep source IDs and extra columns
+        'list(H.river_distance([H.get_object(Barrier, b) for b in ("BB", "BA", "BC", "BA")], [H.get_object(Barrier, b) for b in ("BC", "BC", "BA", "BK")]).round(9)) == [0.13, 1.38, 1.38, float("inf")]', # distances along one path and between mouths are correct
+        '(round(habitat["TA"], 9), round(habitat["TB"], 9)) == (7.7676, 3.95224)', # habitat accessible from mouths is correct
+        '(round(scenarioHabitat["TA"], 9), round(scenarioHabitat["TB"], 9)) == (13.3161, 3.9584)', # scenario habitat matches re-evaluating the whole network
+        'abs(scenario.gain("passlow") - 5.55466) < 1e-9 and scenario.removal_cost() == 940.', # scenario gain and cost are correct
+        'HBH.passabilities["passlow"] == 0. and H.accessible_habitat("passlow")[HBH.tributary] == habitat["TA"]', # scenarios do not change the network
+        'not nested.present(HBH) and nested.passability(HBK, "passlow") == 1. and HBK not in nested.get_barriers()', # nested scenarios read through their bases
+        '[t.id for t in seriesTributaries] == ["TA", "TB"] and list(seriesHabitat[:,1].round(9)) == [13.3161, 3.95224]', # habitat is evaluated at every time step
+        'list(seriesHabitat[0].round(9)) == [8.766, 13.3161, 11.16585, 8.766] and (streamedHabitat == seriesHabitat).all()', # series read in chunks give the same habitat
+        'all([abs(H.scenario(removed=[b]).gain(g) - gain) < 1e-9 for g in ranks for b, gain, cost, score in ranks[g]])', # removal gains of all barriers match removing each one alone
+        '[r[0].id for r in ranks["passlow"][:3]] == ["BJ", "BF", "BI"] and abs(ranks["passlow"][0][3] - ranks["passlow"][0][1] / 60.) < 1e-12', # barriers are ranked by gain per cost
+        'len(front) == 88 and front[0][0] == frozenset() and all([s[1] <= 100. for s in front]) and frontBox == 0.', # Pareto fronts start from no removals and respect the budget
+        'all([abs(H.scenario(removed=r).gain(g) - gains[g]) < 1e-9 and sum(spent.values()) == cost for r, cost, gains, spent in front for g in gains])', # Pareto front gains and spending are correct
+        'not any([all([a[2][g] >= b[2][g] for g in a[2]]) and all([a[3][c] <= b[3][c] for c in a[3]]) for a in front for b in front if a is not b])', # no solution on the front dominates another
+        '0 < len(largeFront) <= 50 and all([abs(HL.scenario(removed=r).gain(g) - gains[g]) < 1e-6 for r, cost, gains, spent in largeFront[::10] for g in gains]) and not any([all([a[2][g] >= b[2][g] for g in a[2]]) and all([a[3][c] <= b[3][c] for c in a[3]]) for a in largeFront for b in largeFront if a is not b]) and largeBox > 0.001', # Pareto fronts of large networks are capped, correct and report their coarser boxes
+        '[json.loads(l)["name"] for l in jobLines] == ["BH", "BH+BF"] and json.loads(jobLines[0])["cost"] == 900.', # batch jobs evaluate configured scenarios
+        'resumedLines == jobLines and jobRanks["passlow"][0]["id"] == "BJ"', # interrupted scenario sweeps resume where they stopped
+        'len(jobBuilds) == 1 and jobCached.marker == "cached" and not hasattr(jobRebuilt, "marker") and not jobRebuilt.barrierLinks', # built networks are cached by data and options
+        'served[0]["result"] == ["RF", "RG", "RH", "RJ", "RK"] and abs(served[1]["result"] - 6.1) < 1e-9', # the query service traces and aggregates
+        'served[2]["result"]["cost"] == 900. and "error" in served[3]', # the query service evaluates scenarios and reports bad queries
+        'served[4]["result"] == ["BL", "BN"]', # the query service traces barriers of every type downstream
+        'badStatus == [400, 400, 400] and "error" in brokenBatch[0] and servedAfter == [served[1]] and workerAlive', # malformed requests are rejected without stopping the query service
+        '[r.id for r in reachMatrix.nodes[:5]] == ["RO", "RI", "RE", "RC", "RA"] and reachMatrix.adjacency.nnz == 20 and (reachMatrix.adjacency.nonzero()[0] < reachMatrix.adjacency.nonzero()[1]).all()', # network matrices are numbered stably and upper triangular
+        'all([abs(reachMatrix.upstream_sum(reachLengths, False)[reachMatrix.index[r]] - r.tributary.length_up(r)) < 1e-9 and abs(reachMatrix.downstream_sum(reachLengths, False)[reachMatrix.index[r]] - r.tributary.length_down(r)) < 1e-9 for r in H.get_reaches()])', # matrix accumulation matches tracing
+        'abs(barrierMatrix.downstream_product(numpy.full(14, 0.5))[barrierMatrix.index[H.get_object(Barrier, "BE")]] - 0.0625) < 1e-12 and barrierMatrix.downstream_product(numpy.zeros(14)).sum() == 0.', # cumulative passability is correct
+        'sorted([r.id for r in reachMatrix.objects(numpy.flatnonzero(reachMatrix.upstream_mask(reachMatrix.indexes([HRM]))))]) == ["RF", "RG", "RH", "RJ", "RK", "RM"]', # upstream reachability is correct
+        'len(fuzzResults) > 0 and all([r[1] for r in fuzzResults])', # fast paths agree with reference tracing on a random network
+        '[sorted([b.id for b in batchUp[k]]) for k in xrange(3)] == [["BD", "BE", "BF", "BG", "BI"], [], ["BD", "BE"]] and list(batchUp.offsets) == [0, 5, 5, 7]', # batch upstream traces are correct
+        '[[r.id for r in batchDown[k]] for k in xrange(3)] == [["RN", "RO"], ["RM", "RN", "RO"], []] and abs(batchDown.sums(reachMatrix.values("length"))[1] - 4.8) < 1e-9', # batch downstream traces are ordered and can be summed
+        '(round(dciTributaries["TA"], 5), round(dciTributaries["TB"], 5)) == (0.30235, 0.53425) and round(dciLakes["LA"], 5) == 0.27405', # potamodromous connectivity of tributaries is correct
+        'updatedDci == freshDci and updatedDci[0][0][1] > round(dciTributaries["TA"], 9)', # potamodromous connectivity updates incrementally with barrier passabilities
+        'len(contracted) == 20 and [r.id for r in contracted.members(contracted.edges([H.get_object(Reach, "RE")])[0])] == ["RI", "RE"] and contractedEdges[0] != contractedEdges[1]', # barrier-free single-child chains are contracted
+        'abs(contracted.length.sum() - reachLengths.sum()) < 1e-9 and abs(contracted.area.sum() - sum([c.area for c in H.get_catchments()])) < 1e-9 and numpy.allclose(contracted.matrix.upstream_sum(contracted.length), reachMatrix.upstream_sum(reachLengths)[contracted.heads])', # contraction keeps length and area
+        '(H.get_object(Barrier, "BA").drop, H.get_object(Barrier, "BA").bfw, HBH.height) == (0.5, 2.0, 4.0)', # barrier dimensions are loaded from their own fields
+        'raises(TypeError, models.Curve) and isinstance(models.Power(1.), models.Curve)', # curves must define evaluate()
+        'modelChanges == 12 and abs(HM.get_object(Barrier, "BA").passabilities["passnew"] - 0.375) < 1e-12 and HM.get_object(Barrier, "BH").passabilities["passlow"] == 0.0 and "passnew" not in HM.get_object(Barrier, "BH").passabilities', # passability models fill in missing passabilities by barrier type
+        '(HM.get_object(Barrier, "BH").cost, HM.get_object(Barrier, "BN").cost) == (450., 250.) and modelHabitat[HM.get_object(Tributary, "TA")] < HM.get_object(Tributary, "TA").length_all()', # cost models overwrite costs on request and derived passabilities feed accumulation
+        'derivedLinks == sorted([(b.id, b.down.id) for b in H.get_barriers()]) and sorted([b.id for b in HD.get_object(Tributary, "TA").barUp[HD.get_object(Barrier, "BJ")]]) == ["BG", "BI"]', # barrier links can be derived from reaches, ignoring stale downstream IDs
+        'len(pickledChain.get_object(Reach, "RX4999").trace_down()) == 5004 and pickledChain.get_object(Reach, "RX0").down is pickledChain.get_object(Reach, "RA") and len(pickledChain.get_reaches()) == 5022', # networks with long downstream chains can be pickled
+        'pickled.feature.id == "TA" and sorted([r.id for r in pickled.get_reaches()]) == sorted([r.id for r in H.get_object(Tributary, "TA").reaches]) and pickled.accessible_habitat("passlow").values() == H.subnetwork(H.get_object(Tributary, "TA")).accessible_habitat("passlow").values() and pickled.network.get_object(Barrier, "BA").reach.catchment.tributary.lake.id == "LA"', # pickled networks keep their attributes and links
+        '[(H.next_downstream(H.get_object(Barrier, b)), H.next_downstream(H.get_object(Barrier, b), Dam)) for b in ("BA", "BD", "BH")] == [(H.get_object(Barrier, "BB"), HBH), (H.get_object(Barrier, "BF"), None), (None, None)]', # next barriers of a type downstream of barriers are found
+        '[H.next_downstream(H.get_object(Reach, r)) for r in ("RC", "RD", "RO")] == [H.get_object(Barrier, "BB"), HBH, None] and H.next_downstream(HRM, RSX).id == "BJ" and H.mouth(HRM).id == "RO" and H.mouth(H.get_object(Barrier, "BK")).id == "RV"', # next barriers downstream of reaches and mouths are found
+        'cachedFirst == cachedSecond and cachedHits == (1, 1) and cachedDisk == cachedFirst and diskHits == 1 and abs(cachedFirst["gains"]["passlow"] - H.scenario(removed=[HBH]).gain("passlow")) < 1e-12', # scenario results are cached by removal set in memory and on disk
+        'cachedChanged["gains"]["passlow"] != cachedFirst["gains"]["passlow"] and 0 < cachedFiles < 9 and scenarioCache.size <= 600', # scenario caches miss after the network changes and stay within their disk limit
+        'editedPrint != HS.fingerprint() and editedRecached != editedCached and memoryCache.misses == 2', # fingerprints and cached scenarios follow passabilities edited in place
+        '0 < sharedBytes <= 600', # scenario caches sharing a directory stay within their disk limit together
+        'HP.fingerprint() == HF.fingerprint() and [sorted([t.id for t in L.tributaries]) for L in HP.lakes] == [["TA", "TB"]] and HP.get_object(Reach, "RB").down is HP.get_object(Reach, "RC") and sorted([(t.id, v) for t, v in HP.accessible_habitat("passlow").items()]) == sorted([(t.id, v) for t, v in HF.accessible_habitat("passlow").items()])', # networks created in parallel match networks created serially
+        'linkedDowns[0] == linkedDowns[1] and HLP.get_object(Barrier, "BN").down is HLP.get_object(Barrier, "BJ")', # tributaries linked to each other are created in parallel as serially
+        'editedBefore < editedAfter and abs(editedAfter - [v for t, v in editedFresh.items() if t.id == "TA"][0]) < 1e-9 and HO.version.count == otherVersion', # passabilities edited in place rebuild only their own network's indexes
+        'raises(ValueError, HE.get_object(Barrier, "BH").passabilities.__setitem__, "passlow", 2.) and abs(editedPickle.accessible_habitat("passlow")[editedPickle.get_object(Tributary, "TA")] - editedBefore) < 1e-9', # passabilities edited in place are checked, and pickled networks see the edits
+        'numpy.allclose(contractedPoints[1], [1 - 0.55 / 2.6, 1 - 1.85 / 2.6]) and [r.id for r in expandedPoints[0]] == ["RI", "RE"] and numpy.allclose(expandedPoints[1], 0.5) and (contracted.expand(contracted.length)[contracted.heads] == contracted.length).all()', # contracted results map back onto reaches
     )
+    def raises(exception, function, *args):
+        try: function(*args)
+        except exception: return True
+        return False
+    
     failures = 0
     for test in tests:
         try:
@@ -141,4 +510,6 @@ def __test__(verbose=False):
             failures += 1
             
     if failures > 0:
-        import pdb; pdb.set_trace()
\ No newline at end of file
+        raise AssertionError('%i of %i tests failed.' % (failures, len(tests)))
+        
+    return failures
\ No newline at end of file
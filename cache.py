@@ -0,0 +1,299 @@
+# This file contains a content-addressed cache of scenario results, keyed by
+#   a fingerprint of the network and the scenario's changes, with an
+#   in-memory tier and a size-bounded on-disk tier
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import os, json, hashlib, threading
+from collections import OrderedDict
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# ScenarioCache
+CCH_MEM = 10000 # number of results kept in memory
+CCH_DSK = 256 * 2**20 # bytes of results kept on disk
+CCH_LOW = 0.8 # fraction of CCH_DSK the disk tier is trimmed to when full
+CCH_EXT = '.json'
+
+
+# ~~ network_fingerprint() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def network_fingerprint(hydrography):
+    """
+    NETWORK_FINGERPRINT() hashes everything scenario results depend on: the
+    tributaries, reaches (links and lengths) and barriers (type, links,
+    position, passabilities and cost) of a network. Equal networks have
+    equal fingerprints however they were loaded.
+
+    INPUT:
+        hydrography = Hydrography to fingerprint
+
+    OUTPUT: hexadecimal SHA-1 digest string
+    """
+    from hydrography import Barrier, Reach, Tributary
+
+    def oid(obj): return None if obj is None else obj.id
+
+    digest = hashlib.sha1()
+    for tributary in sorted(hydrography.get_objects(Tributary), key=lambda t: t.id):
+        digest.update(json.dumps([tributary.id, oid(tributary.lake)]))
+    for reach in sorted(hydrography.get_objects(Reach), key=lambda r: r.id):
+        digest.update(json.dumps([reach.id, reach.down.id, oid(reach.tributary), reach.length]))
+    for barrier in sorted(hydrography.get_objects(Barrier), key=lambda b: b.id):
+        digest.update(json.dumps([
+            barrier.id, barrier.__class__.__name__, barrier.down.id, oid(barrier.reach),
+            barrier.fprop, barrier.cost, sorted(barrier.passabilities.items())
+        ]))
+
+    return digest.hexdigest()
+
+
+
+# ~~ scenario_key() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def scenario_key(fingerprint, removed=(), passabilities=None, costs=None, guilds=None):
+    """
+    SCENARIO_KEY() returns the cache key of a scenario: a hash of the
+    network fingerprint and the scenario's changes in a canonical order.
+
+    INPUT:
+        fingerprint = network_fingerprint() of the network
+
+        removed     = (optional) iterable of barriers removed. Default is
+            none.
+
+        passabilities = (optional) dictionary of barriers to dictionaries of
+            guilds to passabilities. Default is none.
+
+        costs       = (optional) dictionary of barriers to costs. Default is
+            none.
+
+        guilds      = (optional) iterable of guilds evaluated. Default is
+            none.
+
+    OUTPUT: hexadecimal SHA-1 digest string
+    """
+    if passabilities is None: passabilities = {}
+    if costs is None: costs = {}
+    canonical = json.dumps([
+        fingerprint,
+        sorted(set([b.id for b in removed])),
+        sorted([(b.id, sorted(passabilities[b].items())) for b in passabilities]),
+        sorted([(b.id, costs[b]) for b in costs]),
+        None if guilds is None else sorted(set(guilds))
+    ])
+    return hashlib.sha1(canonical).hexdigest()
+
+
+
+# ~~ SCENARIO CACHE ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class ScenarioCache(object):
+    """
+    ScenarioCache keeps scenario results (see evaluate()) by scenario_key().
+    The most recently used results are kept in memory and, when a directory
+    is given, every result is also written to a file there so it is shared
+    between sessions and processes. The least recently used files are
+    removed when they take more than the disk limit.
+
+    Keys include the network fingerprint, which is recomputed whenever the
+    network's objects change, so results of an older version of a network
+    are never returned.
+    """
+
+    def __init__(self, directory=None, memory=CCH_MEM, disk=CCH_DSK):
+        """
+        INPUTS:
+            directory   = (optional) directory of the disk tier. Default
+                (None) keeps results in memory only.
+
+            memory      = (optional) number of results kept in memory.
+                Default is CCH_MEM.
+
+            disk        = (optional) bytes of results kept on disk. Default
+                is CCH_DSK.
+        """
+        self.directory = directory
+        self.memory = memory
+        self.disk = disk
+        self.results = OrderedDict()
+        self.files = None
+        self.listed = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self.results)
+
+
+    # ~~ TIERS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def get(self, key):
+        """Returns the result cached under key, or None if there is none."""
+        with self.lock:
+            if key in self.results:
+                result = self.results.pop(key)
+                self.results[key] = result
+                self.hits += 1
+                return result
+
+            result = self.__read__(key)
+            if result is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.__remember__(key, result)
+            return result
+
+
+    def put(self, key, result):
+        """Caches a JSON-serializable result under key."""
+        with self.lock:
+            self.__remember__(key, result)
+            self.__write__(key, result)
+
+
+    def clear(self):
+        """Removes every cached result from memory and disk."""
+        with self.lock:
+            self.results.clear()
+            for key in self.__files__().keys():
+                self.__forget__(key)
+
+
+    def __remember__(self, key, result):
+        """Keeps a result in memory, dropping the least recently used."""
+        self.results.pop(key, None)
+        self.results[key] = result
+        while len(self.results) > self.memory:
+            self.results.popitem(last=False)
+
+
+    def __path__(self, key):
+        return os.path.join(self.directory, key + CCH_EXT)
+
+
+    def __listed__(self):
+        """Returns the modification time of the directory, or None."""
+        if self.directory is None: return None
+        try: return os.path.getmtime(self.directory)
+        except OSError: return None
+
+
+    def __files__(self):
+        """
+        Returns the dictionary of keys of cached files to (size, last use
+        time). The directory is listed on first use and again whenever
+        another process has added or removed files since, so their sizes
+        count towards the disk limit.
+        """
+        listed = self.__listed__()
+        if (self.files is None) or (listed != self.listed):
+            self.listed = listed
+            self.files = {}
+            if (self.directory is not None) and os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if not name.endswith(CCH_EXT): continue
+                    path = os.path.join(self.directory, name)
+                    try: self.files[name[:-len(CCH_EXT)]] = (os.path.getsize(path), os.path.getmtime(path))
+                    except OSError: pass
+            self.size = sum([v[0] for v in self.files.itervalues()])
+        return self.files
+
+
+    def __read__(self, key):
+        """Returns the result in the file of key, or None."""
+        if self.directory is None: return None
+        path = self.__path__(key)
+        try:
+            f = open(path, 'rb')
+            try: result = json.loads(f.read())
+            finally: f.close()
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            self.__forget__(key)
+            return None
+
+        files = self.__files__()
+        if key not in files:
+            files[key] = (os.path.getsize(path), 0)
+            self.size += files[key][0]
+        files[key] = (files[key][0], os.path.getmtime(path))
+        return result
+
+
+    def __write__(self, key, result):
+        """Writes a result to the file of key and trims the disk tier."""
+        if self.directory is None: return
+        if not os.path.isdir(self.directory): os.makedirs(self.directory)
+        files = self.__files__()
+
+        # write a temporary file that replaces the result's file when done
+        content = json.dumps(result, sort_keys=True)
+        path = self.__path__(key)
+        temporary = '%s.%i.tmp' % (path, os.getpid())
+        f = open(temporary, 'wb')
+        try: f.write(content)
+        finally: f.close()
+        if os.path.exists(path): os.remove(path)
+        os.rename(temporary, path)
+        self.size += len(content) - files.get(key, (0, 0))[0]
+        files[key] = (len(content), os.path.getmtime(path))
+        self.listed = self.__listed__()
+
+        # remove the least recently used files once over the limit, first
+        #   listing the directory again in case other processes changed it
+        if self.size > self.disk:
+            self.files = None
+            files = self.__files__()
+        if self.size > self.disk:
+            for old in sorted(files, key=lambda k: files[k][1]):
+                if self.size <= CCH_LOW * self.disk: break
+                if old != key: self.__forget__(old)
+
+
+    def __forget__(self, key):
+        """Removes the file of key."""
+        self.size -= self.__files__().pop(key, (0, 0))[0]
+        try: os.remove(self.__path__(key))
+        except OSError: pass
+        self.listed = self.__listed__()
+
+
+    # ~~ EVALUATION ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def evaluate(self, hydrography, removed=(), passabilities=None, costs=None, guilds=None):
+        """
+        Returns the results of a scenario of a network, evaluating it only
+        when it is not cached. See Hydrography.scenario().
+
+        INPUTS:
+            hydrography = Hydrography the scenario is laid over
+
+            removed, passabilities, costs = (optional) see scenario_key()
+
+            guilds      = (optional) iterable of guilds to evaluate. Default
+                (None) is every guild of the network's barriers.
+
+        OUTPUTS: dictionary with the "cost" of the removals and the habitat
+            "gains" for each guild
+        """
+        removed = list(removed)
+        key = scenario_key(hydrography.fingerprint(), removed, passabilities, costs, guilds)
+        result = self.get(key)
+        if result is not None: return result
+
+        if guilds is None: guilds = sorted(hydrography.barrier_tree().guilds())
+        scenario = hydrography.scenario(removed, passabilities, costs)
+        result = {
+            'cost': scenario.removal_cost(),
+            'gains': dict((g, scenario.gain(g)) for g in guilds)
+        }
+        self.put(key, result)
+        return result
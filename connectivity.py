@@ -0,0 +1,432 @@
+# This file contains the barrier tree of a hydrography network and array-based
+#   accumulation of habitat accessible from river mouths through barriers
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import numpy
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# BarrierTree
+BTR_DPS = 1.0 # passability used for barriers with an undefined passability
+BTR_CHK = 365 # number of time steps of passability series accumulated at a time
+
+
+# ~~ BARRIER TREE ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class BarrierTree(object):
+    """
+    BarrierTree arranges the barriers of tributaries into trees of arrays.
+    Each tributary's mouth is a root node (represented by the Tributary) and
+    every barrier is a node whose parent is its downstream barrier (or the
+    mouth). Each node holds the length of river in its section: the reaches
+    between it and the next barriers upstream.
+
+    Habitat accessible from the mouth is the sum over sections of section
+    length times the product of passabilities of the barriers between the
+    section and the mouth. It is accumulated upstream-to-downstream as
+        S[v] = p[v] * (L[v] + sum of S[c] over upstream nodes c of v)
+    so that S of a mouth is the accessible habitat of its tributary.
+    """
+
+    def __init__(self, tributaries):
+        """
+        INPUTS:
+            tributaries = iterable of Tributaries to include
+        """
+        from hydrography import Dam
+
+        nodes = []
+        parent = []
+        depth = []
+        index = {}
+        roots = []
+
+        # number nodes in preorder using each tributary's barUp dictionary
+        for tributary in tributaries:
+            up = tributary.barUp
+            roots.append(len(nodes))
+            stack = [(tributary, -1, 0)]
+            while len(stack) > 0:
+                node, p, d = stack.pop()
+                i = len(nodes)
+                index[node] = i
+                nodes.append(node)
+                parent.append(p)
+                depth.append(d)
+                if node is tributary:
+                    upstream = [b for b in tributary.barriers if b.down is b]
+                else:
+                    upstream = up.get(node, ())
+                stack.extend([(b, i, d+1) for b in sorted(upstream, key=lambda b: b.id, reverse=True)])
+
+        # split each reach's length between the sections it crosses, adding
+        #   reaches in order of ID so sums do not depend on set order
+        length = [0.] * len(nodes)
+        for tributary in tributaries:
+            below = {}
+            for reach in tributary.topological_order('reachUp', 'reaches'):
+                down = reach.down
+                if (down is reach) or (down not in below):
+                    below[reach] = tributary
+                else:
+                    downBarriers = down.barriers
+                    if len(downBarriers) > 0:
+                        below[reach] = min(downBarriers, key=lambda b: b.fprop)
+                    else:
+                        below[reach] = below[down]
+
+            for reach in sorted(below, key=lambda r: r.id):
+                reachLength = reach.length if reach.length is not None else 0.
+                last = 0.
+                for barrier in sorted(reach.barriers, key=lambda b: (b.fprop, b.id)):
+                    if barrier in index:
+                        length[index[barrier]] += (barrier.fprop - last) * reachLength
+                        last = barrier.fprop
+                length[index[below[reach]]] += (1. - last) * reachLength
+
+        self.nodes = nodes
+        self.index = index
+        self.roots = numpy.array(roots, dtype=numpy.int64)
+        self.parent = numpy.array(parent, dtype=numpy.int64)
+        self.depth = numpy.array(depth, dtype=numpy.int64)
+        self.length = numpy.array(length, dtype=float)
+        self.barrier = numpy.ones(len(nodes), dtype=bool)
+        self.barrier[self.roots] = False
+        self.cost = numpy.array([
+            (numpy.nan if (not self.barrier[i]) or (nodes[i].cost is None) else nodes[i].cost)
+            for i in xrange(len(nodes))
+        ], dtype=float)
+        self.dam = numpy.array([isinstance(node, Dam) for node in nodes], dtype=bool)
+        self.__passabilities__ = {}
+        self.__aggregates__ = {}
+
+        # plan of upstream-to-downstream accumulation: for each depth from
+        #   deepest, the nodes at that depth sorted by parent and where each
+        #   parent's group of nodes starts
+        self.levels = []
+        if len(nodes) > 0:
+            byDepth = numpy.argsort(-self.depth, kind='mergesort')
+            bounds = numpy.flatnonzero(numpy.diff(self.depth[byDepth])) + 1
+            for level in numpy.split(byDepth, bounds):
+                level = level[numpy.argsort(self.parent[level], kind='mergesort')]
+                parents = self.parent[level]
+                starts = numpy.flatnonzero(numpy.concatenate(([True], parents[1:] != parents[:-1])))
+                self.levels.append((level, parents[starts], starts))
+
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+    def guilds(self):
+        """Returns the set of passability keys (guilds) of all barriers."""
+        guilds = set()
+        for node in self.nodes:
+            passabilities = node.__dict__.get('passabilities')
+            if passabilities: guilds.update(passabilities)
+        return guilds
+
+
+    def passability(self, guild):
+        """
+        Returns an array of each node's passability for a guild. Mouths have
+        a passability of 1 and undefined passabilities are BTR_DPS.
+        """
+        if guild not in self.__passabilities__:
+            values = numpy.ones(len(self.nodes), dtype=float)
+            for i in numpy.flatnonzero(self.barrier):
+                value = self.nodes[i].passabilities.get(guild)
+                values[i] = BTR_DPS if value is None else value
+            self.__passabilities__[guild] = values
+
+        return self.__passabilities__[guild]
+
+
+    def accumulate(self, passability, length=None):
+        """
+        Accumulates accessible habitat upstream-to-downstream for one or more
+        sets of passabilities.
+
+        INPUTS:
+            passability = array of node passabilities, either 1-dimensional
+                or 2-dimensional with nodes along the first dimension (e.g.
+                nodes x time steps)
+
+            length      = (optional) array of section lengths. Default (None)
+                is the tree's section lengths.
+
+        OUTPUTS: tuple of (S, C) arrays shaped like passability, where S is
+            the accessible habitat of each node's subtree as seen from below
+            the node and C is the sum of S over each node's upstream nodes
+        """
+        if length is None: length = self.length
+        passability = numpy.asarray(passability, dtype=float)
+        if passability.ndim > 1:
+            length = length.reshape((-1,) + (1,) * (passability.ndim - 1))
+
+        S = numpy.zeros(passability.shape, dtype=float)
+        C = numpy.zeros(passability.shape, dtype=float)
+        for level, parents, starts in self.levels:
+            S[level] = passability[level] * (length[level] + C[level])
+            if parents[0] >= 0:
+                C[parents] += numpy.add.reduceat(S[level], starts, axis=0)
+
+        return S, C
+
+
+    def aggregates(self, guild):
+        """Returns the cached (S, C) of accumulate() for a guild."""
+        if guild not in self.__aggregates__:
+            self.__aggregates__[guild] = self.accumulate(self.passability(guild))
+        return self.__aggregates__[guild]
+
+
+    def habitat(self, guild):
+        """
+        Returns a dictionary of each Tributary's habitat accessible from its
+        mouth for a guild.
+        """
+        S = self.aggregates(guild)[0]
+        return dict((self.nodes[i], S[i]) for i in self.roots)
+
+
+    def habitat_series(self, guild, series, steps=None, chunkSize=BTR_CHK):
+        """
+        Calculates each tributary's accessible habitat at every step of a
+        time series of barrier passabilities, a chunk of time steps at a time.
+        All nodes and steps of a chunk are accumulated together.
+
+        INPUTS:
+            guild       = passability key used for barriers without a series
+
+            series      = either a dictionary of Barriers to sequences (e.g.
+                arrays) of passabilities with one value per time step, or a
+                function of (start, stop) that returns such a dictionary for
+                steps start to stop, so long records can be read as needed
+
+            steps       = (optional) number of time steps. Required when
+                series is a function. Default (None) is the length of the
+                series.
+
+            chunkSize   = (optional) number of time steps to accumulate at a
+                time. Default is BTR_CHK.
+
+        OUTPUTS: tuple of (list of Tributaries, array of accessible habitat
+            with one row per tributary and one column per time step)
+        """
+        if callable(series):
+            if steps is None:
+                raise ValueError('steps must be given when series is a function.')
+            read = series
+        else:
+            if steps is None:
+                steps = max([len(v) for v in series.values()]) if len(series) > 0 else 1
+            read = lambda start, stop: dict(
+                (b, series[b][start:stop]) for b in series
+            )
+
+        static = self.passability(guild)
+        habitat = numpy.zeros((len(self.roots), steps), dtype=float)
+        for start in xrange(0, steps, chunkSize):
+            stop = min(start + chunkSize, steps)
+            values = read(start, stop)
+            passability = numpy.repeat(static[:,None], stop - start, axis=1)
+            for barrier in values:
+                if barrier in self.index:
+                    passability[self.index[barrier]] = numpy.asarray(values[barrier], dtype=float)
+            habitat[:,start:stop] = self.accumulate(passability)[0][self.roots]
+
+        return [self.nodes[i] for i in self.roots], habitat
+
+
+    def downstream_passability(self, passability):
+        """
+        Returns an array of the product of the passabilities of the barriers
+        below each node (not including the node itself), accumulated from
+        the mouths upstream.
+        """
+        passability = numpy.asarray(passability, dtype=float)
+        Q = numpy.ones(passability.shape, dtype=float)
+        for level, parents, starts in reversed(self.levels):
+            if parents[0] >= 0:
+                p = self.parent[level]
+                Q[level] = Q[p] * passability[p]
+
+        return Q
+
+
+    def removal_gain(self, guild):
+        """
+        Calculates the gain in accessible habitat for a guild from removing
+        each barrier alone, for all barriers at once. Removing barrier b
+        changes its passability p[b] to 1, which raises habitat at its mouth
+        by
+            Q[b] * (1 - p[b]) * (L[b] + C[b])
+        where Q[b] is the product of passabilities below b.
+
+        OUTPUTS: array of each node's removal gain (0 for mouths)
+        """
+        passability = self.passability(guild)
+        C = self.aggregates(guild)[1]
+        Q = self.downstream_passability(passability)
+        gain = Q * (1. - passability) * (self.length + C)
+        gain[self.roots] = 0.
+        return gain
+
+
+
+# ~~ POTAMODROMOUS INDEX ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class PotamodromousIndex(object):
+    """
+    PotamodromousIndex calculates the potamodromous dendritic connectivity
+    index of each tributary and lake for a guild,
+        DCI = sum over pairs of sections (i, j) of l[i] * l[j] * c[i,j] / L^2
+    where l are section lengths, L is their total and c[i,j] is the product
+    of the passabilities of the barriers between sections i and j. Lakes
+    join the mouths of their tributaries, so pairs of sections in different
+    tributaries of a lake connect through the lake.
+
+    The sum is found without enumerating pairs, from two passes over a
+    BarrierTree. The upstream pass finds D[v], the passability-weighted
+    length of v's subtree as seen from v. The downstream pass reroots it to
+    A[v], the passability-weighted length of the whole tributary as seen
+    from v:
+        A[c] = D[c] + p[c] * (A[v] - p[c] * D[c])
+    for each node c draining to v, and the sum over pairs is the sum of
+    l[v] * A[v].
+
+    Changing one barrier's passability only changes pairs of sections on
+    either side of it, so the index is updated by walking the barrier's
+    path to its mouth instead of recalculating.
+    """
+
+    def __init__(self, tree, guild):
+        """
+        INPUTS:
+            tree        = BarrierTree to calculate the index on
+
+            guild       = passability key of the barriers
+        """
+        self.tree = tree
+        self.guild = guild
+        p = tree.passability(guild).copy()
+        S, C = tree.accumulate(p)
+        D = tree.length + C
+        self.p = p
+        self.D = D
+
+        # lake of each mouth
+        roots = tree.roots
+        self.lakeOf = dict((i, tree.nodes[i].lake) for i in roots)
+        self.lakeRoots = {}
+        for i in roots:
+            lake = self.lakeOf[i]
+            self.lakeRoots.setdefault(lake if lake is not None else i, []).append(i)
+        self.rootOf = numpy.empty(len(tree), dtype=numpy.int64)
+        self.rootOf[roots] = roots
+
+        # reroot to whole-tributary accessible lengths and each node's
+        #   passability to its mouth
+        A = numpy.empty(len(tree), dtype=float)
+        Q = numpy.ones(len(tree), dtype=float)
+        for level, parents, starts in reversed(tree.levels):
+            if parents[0] < 0:
+                A[level] = D[level]
+            else:
+                up = tree.parent[level]
+                A[level] = D[level] + p[level] * (A[up] - p[level] * D[level])
+                Q[level] = Q[up] * p[level]
+                self.rootOf[level] = self.rootOf[up]
+
+        # pair sums of tributaries and lakes
+        l = tree.length
+        self.tributaryLength = numpy.bincount(self.rootOf, weights=l, minlength=len(tree))
+        self.tributarySum = numpy.bincount(self.rootOf, weights=l*A, minlength=len(tree))
+        self.lakeLength = {}
+        self.lakeSum = {}
+        self.lakeTotal = {}
+        outside = numpy.zeros(len(tree), dtype=float)
+        for key in self.lakeRoots:
+            members = self.lakeRoots[key]
+            total = sum([D[i] for i in members])
+            self.lakeTotal[key] = total
+            for i in members: outside[i] = total - D[i]
+            self.lakeLength[key] = sum([self.tributaryLength[i] for i in members])
+        lakeTerms = numpy.bincount(self.rootOf, weights=l*Q, minlength=len(tree))
+        for key in self.lakeRoots:
+            self.lakeSum[key] = sum([
+                self.tributarySum[i] + outside[i] * lakeTerms[i] for i in self.lakeRoots[key]
+            ])
+
+
+    def tributary_index(self):
+        """Returns a dictionary of Tributaries to their index."""
+        index = {}
+        for i in self.tree.roots:
+            L = self.tributaryLength[i]
+            index[self.tree.nodes[i]] = (self.tributarySum[i] / (L * L)) if L > 0 else 0.
+        return index
+
+
+    def lake_index(self):
+        """Returns a dictionary of Lakes to their index."""
+        index = {}
+        for key in self.lakeRoots:
+            lake = self.lakeOf[self.lakeRoots[key][0]]
+            if lake is None: continue
+            L = self.lakeLength[key]
+            index[lake] = (self.lakeSum[key] / (L * L)) if L > 0 else 0.
+        return index
+
+
+    def set_passability(self, barrier, value):
+        """
+        Changes the passability of a barrier in the index (not on the
+        barrier itself), updating the index along the barrier's path to its
+        mouth.
+        """
+        tree = self.tree
+        p, D, parent = self.p, self.D, tree.parent
+        if (value is None) or (value < 0) or (value > 1):
+            raise ValueError('passabilities must be between 0 and 1.')
+        b = tree.index[barrier]
+        change = value - p[b]
+        if change == 0: return
+
+        # path from the barrier's downstream section to the mouth
+        path = []
+        i = parent[b]
+        while i >= 0:
+            path.append(i)
+            i = parent[i]
+        root = path[-1]
+        lake = self.lakeOf[root]
+        key = lake if lake is not None else root
+
+        # accessible length from the downstream section, rerooted from the
+        #   mouth, and its passability to the mouth
+        A = D[root]
+        Q = 1.
+        for i in reversed(path[:-1]):
+            A = D[i] + p[i] * (A - p[i] * D[i])
+            Q *= p[i]
+
+        # sums over pairs of sections on either side of the barrier
+        outsideTributary = A - p[b] * D[b]
+        outsideLake = outsideTributary + Q * (self.lakeTotal[key] - D[root])
+        self.tributarySum[root] += 2 * change * D[b] * outsideTributary
+        self.lakeSum[key] += 2 * change * D[b] * outsideLake
+
+        # upstream lengths of the sections below the barrier, and the total
+        #   of the lake's mouths
+        delta = change * D[b]
+        p[b] = value
+        for i in path:
+            D[i] += delta
+            if i == root: self.lakeTotal[key] += delta
+            delta *= p[i]
@@ -0,0 +1,198 @@
+# This file contains the contraction of barrier-free chains of reaches into
+#   single edges, giving a compact network for heavy analyses with mappings
+#   back onto the original reaches
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import numpy
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# ContractedNetwork
+CON_RED = {
+    'sum': numpy.add, 'max': numpy.maximum, 'min': numpy.minimum
+} # reductions supported by ContractedNetwork.contract()
+
+
+# ~~ CONTRACTED NETWORK ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class ContractedNetwork(object):
+    """
+    ContractedNetwork collapses chains of reaches into edges. A reach joins
+    the edge of its downstream reach when it is that reach's only upstream
+    reach and has no barriers, so barriers and confluences stay at edge
+    boundaries and only the most downstream reach of an edge (its head) can
+    hold barriers.
+
+    Each edge keeps the total length and catchment area of its reaches and
+    their largest stream order. Catchment areas are split between the
+    catchment's reaches by length. In the reach numbering of a
+    matrix.NetworkMatrix the reaches of an edge are a contiguous block from
+    its head upstream, so edges are numbered in the same preorder and the
+    contracted graph is itself a NetworkMatrix (of head reaches) for
+    accumulation and tracing. Results on edges are mapped back onto reaches
+    with expand() and reach values are summarized onto edges with contract().
+    """
+
+    def __init__(self, reaches):
+        """
+        INPUTS:
+            reaches     = iterable of Reaches to contract, or a
+                matrix.NetworkMatrix of them
+        """
+        from matrix import NetworkMatrix
+
+        if not isinstance(reaches, NetworkMatrix): reaches = NetworkMatrix(reaches)
+        self.reaches = reaches
+        n = len(reaches)
+        parent = reaches.parent
+
+        # a reach starts a new edge unless it is the only upstream reach of
+        #   its downstream reach and holds no barriers
+        linked = numpy.flatnonzero(parent >= 0)
+        children = numpy.bincount(parent[linked], minlength=n)
+        start = numpy.ones(n, dtype=bool)
+        start[linked] = children[parent[linked]] != 1
+        start |= numpy.fromiter((len(r.barriers) > 0 for r in reaches.nodes), dtype=bool, count=n)
+
+        self.heads = numpy.flatnonzero(start)
+        self.edge = numpy.cumsum(start) - 1
+        self.sizes = numpy.diff(numpy.append(self.heads, n))
+
+        # number edges in the reach preorder
+        heads = self.heads
+        edgeParent = numpy.where(parent[heads] >= 0, self.edge[numpy.maximum(parent[heads], 0)], -1)
+        edgeEnd = self.edge[reaches.end[heads] - 1] + 1
+        edgeDepth = reaches.downstream_sum(start.astype(float)).round().astype(numpy.int64)[heads] - 1
+        self.matrix = NetworkMatrix.from_arrays(
+            reaches.objects(heads), edgeParent, edgeEnd, edgeDepth
+        )
+
+        # split catchment areas between their reaches by length
+        length = reaches.values('length')
+        catchments = {}
+        catchment = numpy.fromiter(
+            (catchments.setdefault(r.catchment, len(catchments)) for r in reaches.nodes),
+            dtype=numpy.int64, count=n
+        )
+        area = numpy.array([
+            0. if (c is None) or (c.area is None) else c.area
+            for c in sorted(catchments, key=catchments.get)
+        ])
+        share = numpy.bincount(catchment, weights=length, minlength=len(area))
+        count = numpy.bincount(catchment, minlength=len(area))
+        self.reachArea = numpy.where(
+            share[catchment] > 0,
+            area[catchment] * length / numpy.where(share[catchment] > 0, share[catchment], 1.),
+            area[catchment] / count[catchment]
+        )
+        self.reachLength = length
+
+        # summarize edges
+        self.length = self.contract(length)
+        self.area = self.contract(self.reachArea)
+        self.strahler = self.contract(reaches.values('strahler'), 'max')
+        self.shreve = self.contract(reaches.values('shreve'), 'max')
+        self.size = self.contract(reaches.values('size'), 'max')
+
+        # distance from the downstream end of each reach's edge to the
+        #   downstream end of the reach
+        self.cumulative = numpy.append(0., numpy.cumsum(length))
+        self.below = self.cumulative[:-1] - self.cumulative[heads][self.edge]
+
+
+    def __len__(self):
+        return len(self.heads)
+
+
+    # ~~ MAPPING ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def edges(self, reaches):
+        """Returns an array of the edge numbers of reaches."""
+        return self.edge[self.reaches.indexes(reaches)]
+
+
+    def members(self, k):
+        """Returns the list of reaches of edge k from its head upstream."""
+        return self.reaches.nodes[self.heads[k]:self.heads[k] + self.sizes[k]]
+
+
+    def contract(self, values, how='sum'):
+        """
+        Summarizes reach values onto edges.
+
+        INPUTS:
+            values      = array of reach values in the reach numbering,
+                either 1-dimensional or 2-dimensional with reaches along the
+                first dimension
+
+            how         = (optional) how to summarize the values of an edge's
+                reaches. One of 'sum', 'max' or 'min'. Default is 'sum'.
+
+        OUTPUTS: array of edge values
+        """
+        if how not in CON_RED:
+            raise ValueError('Unknown reduction: %s' % how)
+
+        values = numpy.asarray(values, dtype=float)
+        if len(self.heads) == 0: return values[:0]
+        return CON_RED[how].reduceat(values, self.heads, axis=0)
+
+
+    def expand(self, values):
+        """
+        Maps edge values back onto reaches, giving every reach the value of
+        its edge.
+
+        INPUTS:
+            values      = array of edge values, either 1-dimensional or
+                2-dimensional with edges along the first dimension
+
+        OUTPUTS: array of reach values in the reach numbering
+        """
+        return numpy.asarray(values)[self.edge]
+
+
+    def contract_points(self, reaches, fprops):
+        """
+        Converts positions along reaches to positions along edges, with
+        fprops measured from the upstream end as for Barriers.
+
+        INPUTS:
+            reaches     = sequence of Reaches
+
+            fprops      = array of positions along each reach
+
+        OUTPUTS: tuple of (array of edge numbers, array of positions along
+            the edges)
+        """
+        i = self.reaches.indexes(reaches)
+        edge = self.edge[i]
+        fromDown = self.below[i] + (1. - numpy.asarray(fprops, dtype=float)) * self.reachLength[i]
+        total = self.length[edge]
+        return edge, 1. - fromDown / numpy.where(total > 0, total, 1.)
+
+
+    def expand_points(self, edges, fprops):
+        """
+        Converts positions along edges back to positions along reaches. See
+        contract_points().
+
+        OUTPUTS: tuple of (list of Reaches, array of positions along the
+            reaches)
+        """
+        edges = numpy.asarray(edges, dtype=numpy.int64)
+        heads = self.heads[edges]
+        fromDown = (1. - numpy.asarray(fprops, dtype=float)) * self.length[edges]
+
+        # find the reach of the edge whose span covers each position
+        target = self.cumulative[heads] + fromDown
+        i = numpy.searchsorted(self.cumulative[:-1], target, 'right') - 1
+        i = numpy.clip(i, heads, heads + self.sizes[edges] - 1)
+
+        length = self.reachLength[i]
+        within = (fromDown - self.below[i]) / numpy.where(length > 0, length, 1.)
+        return self.reaches.objects(i), numpy.clip(1. - within, 0., 1.)
@@ -0,0 +1,173 @@
+# This file contains batch in-river distance calculations between points on
+#   hydrography reaches using cumulative distances and lowest common
+#   downstream reaches
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import numpy
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# DistanceIndex
+DST_INF = numpy.inf # distance between points that do not share a river mouth
+
+
+# ~~ DISTANCE INDEX ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class DistanceIndex(object):
+    """
+    DistanceIndex precomputes the in-river distance from every reach to its
+    river mouth and a binary-lifting table of downstream reaches so that
+    batches of point-to-point and point-to-mouth distances are answered with
+    array operations.
+
+    Points are given as (reach, fprop) tuples or as Structures (which use
+    their reach and fprop). fprop is the proportion along the reach from its
+    upstream end.
+    """
+
+    def __init__(self, reaches):
+        """
+        INPUTS:
+            reaches = iterable of Reaches to index. Reaches draining to a reach
+                that is not included are treated as river mouths.
+        """
+        from topology import TreeIndex
+
+        tree = TreeIndex.from_objects(reaches)
+        n = len(tree)
+        parent = tree.parent
+        length = [(r.length if r.length is not None else 0.) for r in tree.nodes]
+
+        # distance from the downstream end of each reach to its mouth and the
+        #   mouth reach of each reach (parents always come first in preorder)
+        below = [0.] * n
+        mouth = range(n)
+        for i in xrange(n):
+            p = parent[i]
+            if p >= 0:
+                below[i] = below[p] + length[p]
+                mouth[i] = mouth[p]
+
+        # binary lifting table of 2^k-th downstream reaches
+        up = numpy.array([(p if p >= 0 else i) for i, p in enumerate(parent)], dtype=numpy.int64)
+        lifts = [up]
+        maxDepth = max(tree.depth) if n > 0 else 0
+        while (1 << len(lifts)) <= maxDepth:
+            lifts.append(lifts[-1][lifts[-1]])
+
+        self.tree = tree
+        self.length = numpy.array(length, dtype=float)
+        self.below = numpy.array(below, dtype=float)
+        self.mouth = numpy.array(mouth, dtype=numpy.int64)
+        self.depth = numpy.array(tree.depth, dtype=numpy.int64)
+        self.lifts = lifts
+
+
+    def locate(self, points):
+        """
+        Converts points to arrays of reach indexes and proportions along the
+        reaches.
+
+        INPUTS:
+            points  = sequence of (reach, fprop) tuples or Structures
+
+        OUTPUTS: tuple of (index array, fprop array)
+        """
+        index = self.tree.index
+        reaches = []
+        fprops = []
+        for point in points:
+            if isinstance(point, tuple): reach, fprop = point
+            else: reach, fprop = point.reach, point.fprop
+            if reach not in index:
+                raise KeyError('%s is not in the distance index.' % repr(reach))
+
+            reaches.append(index[reach])
+            fprops.append(fprop)
+
+        return numpy.array(reaches, dtype=numpy.int64), numpy.array(fprops, dtype=float)
+
+
+    def to_mouth(self, points):
+        """
+        Calculates the in-river distance from each point to its river mouth.
+
+        INPUTS:
+            points  = sequence of (reach, fprop) tuples or Structures
+
+        OUTPUTS: array of distances
+        """
+        i, f = self.locate(points)
+        return self.__to_mouth__(i, f)
+
+
+    def __to_mouth__(self, i, f):
+        return self.below[i] + (1. - f) * self.length[i]
+
+
+    def common_down(self, i, j):
+        """
+        Finds the lowest common downstream reach index of each pair of reach
+        indexes. Pairs that do not share a river mouth are returned as -1.
+        """
+        a = i.copy()
+        b = j.copy()
+
+        # lift the deeper reach of each pair to the depth of the other
+        swap = self.depth[a] < self.depth[b]
+        a[swap], b[swap] = j[swap], i[swap]
+        diff = self.depth[a] - self.depth[b]
+        for k in xrange(len(self.lifts)):
+            move = (diff >> k) & 1 == 1
+            a[move] = self.lifts[k][a[move]]
+
+        # lift both reaches while they are still different
+        for k in xrange(len(self.lifts)-1, -1, -1):
+            move = self.lifts[k][a] != self.lifts[k][b]
+            a[move] = self.lifts[k][a[move]]
+            b[move] = self.lifts[k][b[move]]
+
+        common = numpy.where(a == b, a, self.lifts[0][a])
+        common[self.mouth[i] != self.mouth[j]] = -1
+        return common
+
+
+    def between(self, points, others):
+        """
+        Calculates the in-river distance between pairs of points.
+
+        INPUTS:
+            points  = sequence of (reach, fprop) tuples or Structures
+
+            others  = sequence of (reach, fprop) tuples or Structures of the
+                same length as points
+
+        OUTPUTS: array of distances, where points that do not share a river
+            mouth are DST_INF apart
+        """
+        i, fi = self.locate(points)
+        j, fj = self.locate(others)
+        if len(i) != len(j):
+            raise ValueError('points and others must have the same length.')
+
+        di = self.__to_mouth__(i, fi)
+        dj = self.__to_mouth__(j, fj)
+        common = self.common_down(i, j)
+
+        # different reaches meet at the upstream end of their common reach
+        #   unless one point is on the common reach itself
+        meet = self.below[common] + self.length[common]
+        meet = numpy.where(common == i, di, meet)
+        meet = numpy.where(common == j, dj, meet)
+        distance = di + dj - 2. * meet
+
+        # points on the same reach
+        same = i == j
+        distance[same] = numpy.abs(fi[same] - fj[same]) * self.length[i[same]]
+        distance[common < 0] = DST_INF
+        return distance
@@ -0,0 +1,321 @@
+# This file contains functions to export hydrography attributes and computed
+#   metrics as columnar tables to CSV, Parquet or GeoPackage files
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# export_tables()
+EXP_FMT_CSV = 'csv'
+EXP_FMT_PAR = 'parquet'
+EXP_FMT_GPK = 'gpkg'
+EXP_CHK = 50000 # number of rows written at a time
+EXP_GPK_APP = 0x47504B47 # GeoPackage application_id ('GPKG')
+EXP_GPK_VER = 10200 # GeoPackage version 1.2
+
+
+# ~~ table_columns() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def table_columns(hydrography, columns=None):
+    """
+    TABLE_COLUMNS() collects the attributes of each type of object in a
+    Hydrography into columns. ID columns use the source data's field names
+    and values so tables can be joined back to the source database.
+
+    INPUT:
+        hydrography = Hydrography to collect attributes from
+
+        columns     = (optional) dictionary of extra columns, where keys are
+            Barrier, Reach, Catchment or Tributary (or a sub-class, e.g.
+            Dam) and values are dictionaries of column names to either a
+            dictionary of objects to values, a function of an object, an
+            attribute name, or a tuple of (matrix.NetworkMatrix, array of
+            values computed with it), whose values are placed by the
+            matrix's index of each object. Columns of a sub-class go in its
+            base class's table and are undefined for other objects, as are
+            attributes an object lacks. Default (None) is no extra columns.
+
+    OUTPUT: dictionary of table name to (column names, list of column lists),
+        with rows sorted by ID
+    """
+
+    from hydrography import (
+        Barrier, Dam, RSX, Reach, Catchment, Tributary, CRH_DAT_BAR,
+        CRH_DAT_FLO, CRH_DAT_CAT, CRH_DAT_TRB, CRH_FLD_FPR, CRH_FLD_NAT,
+        CRH_FLD_CST, CRH_FLD_DRP, CRH_FLD_BFW, CRH_FLD_HIT, CRH_FLD_LEN,
+        CRH_FLD_STO, CRH_FLD_WSA
+    )
+    from load_data import (
+        LOD_FLD_BID, LOD_FLD_BDS, LOD_FLD_RID, LOD_FLD_RDS, LOD_FLD_CAT,
+        LOD_FLD_CDS, LOD_FLD_TID, LOD_FLD_LAK
+    )
+
+    if columns is None: columns = {}
+
+    def down_id(obj):
+        return None if obj.down is obj else obj.down.id
+
+    def parent_id(attribute):
+        def get(obj):
+            parent = obj.__dict__.get(attribute)
+            return None if parent is None else parent.id
+        return get
+
+    def lake_id(obj):
+        return None if obj.tributary.lake is None else obj.tributary.lake.id
+
+    # base columns of each table as (name, function of object)
+    objects = {
+        Barrier: hydrography.get_barriers(),
+        Reach: hydrography.get_reaches(),
+        Catchment: hydrography.get_catchments(),
+        Tributary: hydrography.get_tributaries()
+    }
+    guilds = set()
+    for barrier in objects[Barrier]: guilds.update(barrier.passabilities)
+    definitions = {
+        Barrier: (CRH_DAT_BAR, [
+            (LOD_FLD_BID, lambda b: b.id), (LOD_FLD_BDS, down_id),
+            (LOD_FLD_RID, parent_id('reach')), (LOD_FLD_TID, parent_id('tributary')),
+            (LOD_FLD_LAK, lake_id), ('type', lambda b: b.__class__.__name__),
+            (CRH_FLD_FPR, lambda b: b.fprop), (CRH_FLD_NAT, lambda b: b.country),
+            (CRH_FLD_CST, lambda b: b.cost)
+        ] + [
+            (guild, lambda b, g=guild: b.passabilities.get(g)) for guild in sorted(guilds)
+        ] + [
+            (CRH_FLD_DRP, lambda b: b.drop if isinstance(b, RSX) else None),
+            (CRH_FLD_BFW, lambda b: b.bfw if isinstance(b, RSX) else None),
+            (CRH_FLD_HIT, lambda b: b.height if isinstance(b, Dam) else None)
+        ]),
+        Reach: (CRH_DAT_FLO, [
+            (LOD_FLD_RID, lambda r: r.id), (LOD_FLD_RDS, down_id),
+            (LOD_FLD_CAT, parent_id('catchment')), (LOD_FLD_TID, parent_id('tributary')),
+            (LOD_FLD_LAK, lake_id), (CRH_FLD_LEN, lambda r: r.length),
+            (CRH_FLD_STO, lambda r: r.size), ('strahler', lambda r: r.strahler),
+            ('shreve', lambda r: r.shreve), ('upcount', lambda r: r.upcount)
+        ]),
+        Catchment: (CRH_DAT_CAT, [
+            (LOD_FLD_CAT, lambda c: c.id), (LOD_FLD_CDS, down_id),
+            (LOD_FLD_TID, parent_id('tributary')), (LOD_FLD_LAK, lake_id),
+            (CRH_FLD_WSA, lambda c: c.area)
+        ]),
+        Tributary: (CRH_DAT_TRB, [
+            (LOD_FLD_TID, lambda t: t.id),
+            (LOD_FLD_LAK, lambda t: None if t.lake is None else t.lake.id)
+        ])
+    }
+
+    rows = dict((t, sorted(objects[t], key=lambda obj: obj.id)) for t in objects)
+
+    # add extra columns to the table of each type's base class
+    for objType in columns:
+        tableType = [t for t in (Barrier, Reach, Catchment, Tributary) if issubclass(objType, t)]
+        if len(tableType) == 0:
+            raise TypeError('No table for type: %s' % objType.__name__)
+        tableType = tableType[0]
+        for name in sorted(columns[objType]):
+            values = columns[objType][name]
+            if isinstance(values, basestring):
+                get = lambda obj, a=values: obj.__dict__.get(a)
+            elif isinstance(values, dict):
+                get = lambda obj, v=values: v.get(obj)
+            elif callable(values):
+                get = __lenient__(values)
+            elif isinstance(values, tuple) and (len(values) == 2) and hasattr(values[0], 'index'):
+                matrix, values = values
+                values = values.tolist() if hasattr(values, 'tolist') else list(values)
+                if len(values) != len(matrix):
+                    raise ValueError('Column %s has %i values for %i matrix nodes.' % (
+                        name, len(values), len(matrix)
+                    ))
+                get = lambda obj, i=matrix.index, v=values: v[i[obj]] if obj in i else None
+            else:
+                raise TypeError('Column %s must be a dictionary, function, attribute name or (NetworkMatrix, array).' % name)
+            if objType is not tableType:
+                get = lambda obj, g=get, t=objType: g(obj) if isinstance(obj, t) else None
+            definitions[tableType][1].append((name, get))
+
+    # collect columns
+    tables = {}
+    for objType in definitions:
+        name, definition = definitions[objType]
+        tables[name] = (
+            [d[0] for d in definition],
+            [[get(obj) for obj in rows[objType]] for _, get in definition]
+        )
+
+    return tables
+
+
+
+# ~~ export_tables() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def export_tables(hydrography, path, format=EXP_FMT_CSV, columns=None, chunkSize=EXP_CHK):
+    """
+    EXPORT_TABLES() writes the attribute tables of a Hydrography (see
+    table_columns()) to files, a chunk of rows at a time.
+
+    INPUT:
+        hydrography = Hydrography to export
+
+        path        = for EXP_FMT_CSV and EXP_FMT_PAR, the directory to write
+            one file per table to. For EXP_FMT_GPK, the GeoPackage file to
+            write all tables to.
+
+        format      = (optional) one of EXP_FMT_CSV, EXP_FMT_PAR (requires
+            pyarrow) or EXP_FMT_GPK. Default is EXP_FMT_CSV.
+
+        columns     = (optional) see table_columns()
+
+        chunkSize   = (optional) number of rows to write at a time. Default is
+            EXP_CHK.
+
+    OUTPUT: list of paths written to
+    """
+    import os
+
+    tables = table_columns(hydrography, columns)
+    writers = {
+        EXP_FMT_CSV: __write_csv__, EXP_FMT_PAR: __write_parquet__,
+        EXP_FMT_GPK: __write_gpkg__
+    }
+    if format not in writers:
+        raise ValueError('Unknown export format: %s' % format)
+
+    if (format != EXP_FMT_GPK) and (not os.path.isdir(path)):
+        os.makedirs(path)
+
+    return writers[format](tables, path, chunkSize)
+
+
+def __chunks__(values, chunkSize):
+    """Yields (start, rows) for each chunk of rows of a list of columns."""
+    n = len(values[0]) if len(values) > 0 else 0
+    for start in xrange(0, n, chunkSize):
+        yield start, zip(*[column[start:start+chunkSize] for column in values])
+
+
+def __column_type__(column):
+    """Returns the type of the first defined value of a column, or None."""
+    for value in column:
+        if value is not None: return type(value)
+    return None
+
+
+def __lenient__(get):
+    """
+    Returns a function of an object that calls get(), giving None for
+    attributes the object lacks.
+    """
+    def lenient(obj):
+        try: return get(obj)
+        except AttributeError: return None
+    return lenient
+
+
+def __write_csv__(tables, path, chunkSize):
+    import csv, os
+    paths = []
+    for name in sorted(tables):
+        names, values = tables[name]
+        filePath = os.path.join(path, '%s.csv' % name)
+        f = open(filePath, 'wb')
+        try:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            for _, rows in __chunks__(values, chunkSize):
+                writer.writerows(rows)
+        finally:
+            f.close()
+        paths.append(filePath)
+
+    return paths
+
+
+def __write_parquet__(tables, path, chunkSize):
+    import os
+    try:
+        import pyarrow, pyarrow.parquet
+    except ImportError:
+        raise ImportError('Parquet export requires the pyarrow package.')
+
+    paths = []
+    for name in sorted(tables):
+        names, values = tables[name]
+        filePath = os.path.join(path, '%s.parquet' % name)
+        arrays = [pyarrow.array(column) for column in values]
+        schema = pyarrow.schema([pyarrow.field(n, a.type) for n, a in zip(names, arrays)])
+        writer = pyarrow.parquet.ParquetWriter(filePath, schema)
+        try:
+            n = len(values[0]) if len(values) > 0 else 0
+            for start in xrange(0, n, chunkSize):
+                writer.write_table(pyarrow.Table.from_arrays(
+                    [a.slice(start, chunkSize) for a in arrays], schema=schema
+                ))
+        finally:
+            writer.close()
+        paths.append(filePath)
+
+    return paths
+
+
+def __write_gpkg__(tables, path, chunkSize):
+    import sqlite3, datetime
+    sqlTypes = {bool: 'BOOLEAN', int: 'INTEGER', long: 'INTEGER', float: 'REAL'}
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA application_id = %i' % EXP_GPK_APP)
+        cursor.execute('PRAGMA user_version = %i' % EXP_GPK_VER)
+
+        # required GeoPackage metadata tables
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, '
+            'srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL, '
+            'organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, '
+            'description TEXT)'
+        )
+        cursor.executemany(
+            'INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)', [
+                ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', None),
+                ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', None),
+                ('WGS 84 geodetic', 4326, 'EPSG', 4326, 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]]', None)
+            ]
+        )
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, '
+            'data_type TEXT NOT NULL, identifier TEXT UNIQUE, description TEXT DEFAULT "", '
+            'last_change DATETIME NOT NULL, min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, '
+            'max_y DOUBLE, srs_id INTEGER)'
+        )
+
+        # attribute tables
+        now = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        for name in sorted(tables):
+            names, values = tables[name]
+            definition = ', '.join(
+                ['fid INTEGER PRIMARY KEY AUTOINCREMENT'] + [
+                    '"%s" %s' % (n, sqlTypes.get(__column_type__(v), 'TEXT'))
+                    for n, v in zip(names, values)
+                ]
+            )
+            cursor.execute('DROP TABLE IF EXISTS "%s"' % name)
+            cursor.execute('CREATE TABLE "%s" (%s)' % (name, definition))
+            cursor.execute(
+                'INSERT OR REPLACE INTO gpkg_contents (table_name, data_type, identifier, last_change) '
+                'VALUES (?, ?, ?, ?)', (name, 'attributes', name, now)
+            )
+            insert = 'INSERT INTO "%s" (%s) VALUES (%s)' % (
+                name, ', '.join(['"%s"' % n for n in names]), ', '.join(['?'] * len(names))
+            )
+            for _, rows in __chunks__(values, chunkSize):
+                cursor.executemany(insert, rows)
+
+        connection.commit()
+    finally:
+        connection.close()
+
+    return [path]
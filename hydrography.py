@@ -16,6 +16,10 @@ ORD_DID = 0
 # Reach
 RCH_LEN = None
 RCH_SIZ = None
+RCH_STR = None
+RCH_SHR = None
+RCH_NUP = None
+RCH_GEO = None
 
 # Structure
 STR_FPR = 0.0
@@ -39,6 +43,14 @@ RSX_BFW = None
 # Catchment
 CAT_ARE = None
 
+# Hydrography
+HYD_DRV = (
+    'objects', 'up', 'reaches', 'barriers', 'catchments', 'tributaries', 
+    'catchUp', 'reachUp', 'barUp', '__version__'
+) # object attributes rebuilt from links instead of pickled
+HYD_LNK = ('down', 'reach', 'catchment', 'tributary', 'lake') # object attributes pickled as object numbers
+HYD_SHR = 4 # shares of tributaries created by each worker process
+
 
 # create_hydrography()
 CRH_DAT_BAR = 'barriers'
@@ -70,6 +82,7 @@ CRH_FLD_CDS = 'cds'
 CRH_FLD_WSA = 'area'
 CRH_FLD_LEN = 'length'
 CRH_FLD_STO = 'size'
+CRH_FLD_GEO = 'geometry'
 
 
 # ########################################################################### #
@@ -151,6 +164,16 @@ class OrderedObject(object):
                 
         # handle other attribute assignments
         self.__dict__[attribute] = value
+        self.__modified__()
+        
+        
+    def __modified__(self):
+        """
+        Counts a change to self in the Version of the network self belongs
+        to, if any, so the network's cached indexes are rebuilt.
+        """
+        version = self.__dict__.get('__version__')
+        if version is not None: version.count += 1
         
         
     def __repr__(self):
@@ -193,6 +216,72 @@ class Structure(OrderedObject):
         
         
             
+# ~~ PASSABILITIES ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class Passabilities(dict):
+    """
+    Passabilities is the dictionary of guilds to passabilities of a Barrier.
+    Passabilities must be between 0 and 1, and changes made in place count as
+    changes to the barrier. Copies and pickles are plain dictionaries.
+    """
+    
+    def __init__(self, barrier, values=()):
+        dict.__init__(self)
+        self.barrier = barrier
+        self.update(values)
+        
+        
+    def __reduce__(self):
+        return (dict, (dict(self),))
+        
+        
+    @staticmethod
+    def __check__(values):
+        for value in values:
+            if (value < 0) or (value > 1):
+                raise ValueError('passabilities must be between 0 and 1.')
+                
+                
+    def __setitem__(self, guild, value):
+        self.__check__((value,))
+        dict.__setitem__(self, guild, value)
+        self.barrier.__modified__()
+        
+        
+    def __delitem__(self, guild):
+        dict.__delitem__(self, guild)
+        self.barrier.__modified__()
+        
+        
+    def update(self, *args, **kwargs):
+        values = dict(*args, **kwargs)
+        self.__check__(values.itervalues())
+        dict.update(self, values)
+        self.barrier.__modified__()
+        
+        
+    def setdefault(self, guild, value=None):
+        if guild not in self: self[guild] = value
+        return dict.__getitem__(self, guild)
+        
+        
+    def pop(self, guild, *default):
+        value = dict.pop(self, guild, *default)
+        self.barrier.__modified__()
+        return value
+        
+        
+    def popitem(self):
+        item = dict.popitem(self)
+        self.barrier.__modified__()
+        return item
+        
+        
+    def clear(self):
+        dict.clear(self)
+        self.barrier.__modified__()
+        
+        
+        
 # ~~ BARRIER ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 class Barrier(Structure):
     """
@@ -215,14 +304,11 @@ class Barrier(Structure):
     
     def __setattr__(self, attribute, value):
         
-        super(Barrier, self).__setattr__(attribute, value)
-        
+        # keep passabilities in a Passabilities so changes in place are seen
         if attribute == 'passabilities':
-            for k in value:
-                if (value[k] < 0) or (value[k] > 1):
-                    raise ValueError('passabilities must be between 0 and 1.')
+            value = Passabilities(self, value)
             
-        self.__dict__[attribute] = value
+        super(Barrier, self).__setattr__(attribute, value)
 
         
         
@@ -253,9 +339,6 @@ class Dam(Barrier):
         if attribute in ('width', 'height', 'length'):
             if (value is not None) and (value < 0):
                 raise ValueError('Dam dimensions must be non-negative.')
-    
-    
-        self.__dict__[attribute] = value
         
         
         
@@ -288,9 +371,6 @@ class RSX(Barrier):
         if attribute in ('width', 'drop', 'length', 'bfw'):
             if (value is not None) and (value < 0):
                 raise ValueError('RSX dimensions must be non-negative.')
-    
-    
-        self.__dict__[attribute] = value
             
 
             
@@ -402,6 +482,33 @@ class OrderedCollection(OrderedObject):
         return upstreamObjects
         
         
+    def topological_order(self, upAttr='up', objectAttr='objects'):
+        """
+        Orders objects so that every object comes before all of its upstream
+        objects, visiting each object once.
+        
+        INPUTS:
+            upAttr  = (optional) attribute name for the first_up dictionary.
+                Default is 'up'.
+                
+            objectAttr = (optional) attribute name of the objects to order.
+                Default is 'objects'.
+                
+        OUTPUTS: list of objects ordered from downstream to upstream. Objects
+            that do not drain to a most-downstream object (e.g. objects in a
+            cycle) are left out.
+        """
+        up = self.__dict__[upAttr]
+        objects = self.__dict__[objectAttr]
+        order = [obj for obj in objects if (obj.down is obj) or (obj.down not in objects)]
+        i = 0
+        while i < len(order):
+            order.extend(up[order[i]])
+            i += 1
+            
+        return order
+        
+        
     @staticmethod
     def __operate_over__(objects, attribute, operation='+', ignoreNone=True):
         """
@@ -447,6 +554,10 @@ class Reach(OrderedCollection):
         P = {
             'length': RCH_LEN, # reach segment length
             'size': RCH_SIZ, # reach size (stream order)
+            'strahler': RCH_STR, # Strahler order computed by Tributary.stream_order()
+            'shreve': RCH_SHR, # Shreve magnitude computed by Tributary.stream_order()
+            'upcount': RCH_NUP, # number of upstream reaches computed by Tributary.stream_order()
+            'geometry': RCH_GEO, # list of (x, y) vertices from the upstream to the downstream end
             'catchment': None, # Catchment in which self is found
             'tributary': None # Tributary in which self is found
         }
@@ -590,6 +701,43 @@ class Tributary(OrderedCollection):
         elif isinstance(startingObject, Structure):
             return super(Tributary, self).trace_up(startingObject, levels, filters, (Structure,), 'barUp')
             
+            
+    def stream_order(self):
+        """
+        Calculates the Strahler order, Shreve magnitude and number of upstream
+        reaches for every reach in the tributary in one pass over the reachUp
+        dictionary. Results are set on the strahler, shreve and upcount 
+        attributes of each reach.
+        
+        OUTPUTS: list of (reach, size, strahler) tuples for reaches whose loaded
+            size (stream order) disagrees with the calculated Strahler order. 
+            Reaches with an undefined size are not compared.
+        """
+        up = self.reachUp
+        mismatches = []
+        for reach in reversed(self.topological_order('reachUp', 'reaches')):
+            upstream = up[reach]
+            
+            # headwater reaches
+            if len(upstream) == 0:
+                reach.strahler = 1
+                reach.shreve = 1
+                reach.upcount = 0
+                
+            # confluences and single-child reaches
+            else:
+                orders = [r.strahler for r in upstream]
+                highest = max(orders)
+                if orders.count(highest) > 1: highest += 1
+                reach.strahler = highest
+                reach.shreve = sum([r.shreve for r in upstream])
+                reach.upcount = sum([r.upcount for r in upstream]) + len(upstream)
+                
+            if (reach.size is not None) and (reach.size != reach.strahler):
+                mismatches.append((reach, reach.size, reach.strahler))
+                
+        return mismatches
+            
     
     def area_all(self, ignoreNone=True):
         """
@@ -723,6 +871,20 @@ class Lake(OrderedCollection):
         
         
         
+# ~~ VERSION ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class Version(object):
+    """
+    Version counts changes to the objects of one Hydrography. Each object of
+    the network holds the network's Version and counts its own attribute
+    assignments and passability changes in it, so cached indexes of the
+    network are rebuilt when its objects change, and only then.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        
+        
+        
 # ~~ HYDROGRAPHY ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 class Hydrography(object):
     """
@@ -731,15 +893,143 @@ class Hydrography(object):
     inputs to create the hydrography object.
     """
     
-    def __init__(self, data, **attributes):
+    def __init__(self, data, validate=True, lazy=False, barrierLinks=True, workers=None, **attributes):
+        """
+        INPUTS:
+            data        = dictionary of formatted data (see 
+                load_data.load_hydro_mdb())
+                
+            validate    = (optional) whether to check the data for topology
+                problems (True) before creating the network. Errors are raised
+                together as a topology.TopologyError and warnings are kept in
+                the problems attribute. Default is True.
+                
+            lazy        = (optional) whether to wait to create each lake's 
+                objects (True) until the lake is first accessed through
+                get_lake(), the lakes attribute, get_objects() or an ID lookup.
+                Until then only the lake's rows of the data are kept. Default
+                is False.
+                
+            barrierLinks = (optional) whether to link barriers to their 
+                downstream barriers using the downstream barrier IDs of the
+                data (True) or to derive the links from the reaches and each
+                barrier's fprop (False), ignoring the IDs. Default is True.
+                
+            workers     = (optional) number of processes to create the
+                network's tributaries in at the same time. The data is split
+                into groups of linked tributaries, each process creates its
+                shares, and the objects are merged into self. Ignored when
+                lazy is True. Default (None) creates every object in this
+                process.
+                
+            **attributes = optional attributes to set on self
+        """
         
         # set self attributes
         for k in attributes: setattr(self, k, attributes[k])
+        self.lazy = lazy
+        self.barrierLinks = barrierLinks
+        self.workers = workers
+        self.problems = None
+        if validate:
+            from topology import validate_data
+            self.problems = validate_data(data, barrierLinks)
+            
         self.__process_data__(data)
             
         
     def __process_data__(self, data):
         """Processes formatted data as returned by load_data and modifies self."""
+        self.version = Version()
+        self.ids = dict((cls, {}) for cls in (Barrier, Reach, Catchment, Tributary, Lake))
+        self.lakeObjects = {}
+        self.lakeData = {}
+        self.lakeOf = None
+        
+        # keep each lake's rows to create when first needed
+        if self.lazy:
+            self.lakeData, self.lakeOf = self.__partition__(data)
+            return
+            
+        if (self.workers is not None) and (self.workers > 1):
+            lakes = self.__create_parallel__(data)
+        else:
+            lakes = self.__create__(data)
+        
+        # add warning about lost catchments
+        catCount = 0
+        for lake in lakes:
+            for tributary in lake.tributaries:
+                catCount += len(tributary.catchments)
+                
+        diff = len(data[CRH_DAT_CAT][1]) - catCount
+        if (diff > 0) and (self.problems is None):
+            print 'WARNING: Automatically discarded %i catchments with no associated reaches.' % diff
+            
+            
+    @staticmethod
+    def __partition__(data, parts=None):
+        """
+        Splits formatted data by lake, discarding rows that are not connected
+        to a lake.
+        
+        INPUTS:
+            parts       = (optional) dictionary of tributary IDs to the key of
+                the part to put them in instead of their lake ID. Default is
+                None.
+        
+        OUTPUTS: tuple of (dictionary of lake IDs (or part keys) to formatted
+            data for the lake, dictionary of object classes to dictionaries
+            of object IDs to lake IDs (or part keys))
+        """
+        
+        # find the lake of every object
+        fields, table = data[CRH_DAT_TRB]
+        tributaryLake = dict((row[fields[CRH_FLD_TID]], row[fields[CRH_FLD_LAK]]) for row in table)
+        if parts is not None:
+            tributaryLake = dict((tid, parts[tid]) for tid in tributaryLake)
+        fields, table = data[CRH_DAT_FLO]
+        reachLake = {}
+        catchmentLake = {}
+        for row in table:
+            if row[fields[CRH_FLD_TID]] not in tributaryLake: continue
+            lid = tributaryLake[row[fields[CRH_FLD_TID]]]
+            reachLake[row[fields[CRH_FLD_RID]]] = lid
+            catchmentLake[row[fields[CRH_FLD_CAT]]] = lid
+            
+        fields, table = data[CRH_DAT_BAR]
+        barrierLake = dict(
+            (row[fields[CRH_FLD_BID]], reachLake[row[fields[CRH_FLD_RID]]])
+            for row in table if row[fields[CRH_FLD_RID]] in reachLake
+        )
+        
+        # split rows by lake, sharing the rows of the original data
+        lakeOf = {
+            Barrier: barrierLake, Reach: reachLake, Catchment: catchmentLake,
+            Tributary: tributaryLake, 
+            Lake: dict((lid, lid) for lid in tributaryLake.itervalues())
+        }
+        lakeData = dict(
+            (lid, dict((k, (data[k][0], [])) for k in data)) for lid in lakeOf[Lake]
+        )
+        for dataset, idField, lakes in (
+            (CRH_DAT_BAR, CRH_FLD_BID, barrierLake), (CRH_DAT_FLO, CRH_FLD_RID, reachLake),
+            (CRH_DAT_CAT, CRH_FLD_CAT, catchmentLake), (CRH_DAT_TRB, CRH_FLD_TID, tributaryLake)
+        ):
+            fields, table = data[dataset]
+            for row in table:
+                oid = row[fields[idField]]
+                if oid in lakes: lakeData[lakes[oid]][dataset][1].append(row)
+                
+        return lakeData, lakeOf
+        
+        
+    def __create__(self, data):
+        """
+        Creates the objects of formatted data and adds them to self.
+        
+        OUTPUTS: list of Lakes created
+        """
         
         # ~~ CREATE BARRIERS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
         fields, table = data[CRH_DAT_BAR]
@@ -748,7 +1038,10 @@ class Hydrography(object):
         reachBarriers = {}
         for row in table:
             oid = row[fields[CRH_FLD_BID]]
-            passabilities = dict((k, row[fields[k]]) for k in passabilityFields)
+            passabilities = dict(
+                (k, row[fields[k]]) for k in passabilityFields 
+                if (k in fields) and (row[fields[k]] is not None)
+            )
             attributes = {
                 'id': oid, 'fprop': row[fields[CRH_FLD_FPR]], 
                 'country': row[fields[CRH_FLD_NAT]],
@@ -757,7 +1050,7 @@ class Hydrography(object):
             
             # optional fields
             if CRH_FLD_WID in fields:
-                attributes['width'] = row[fields[CRH_FLD_HIT]]
+                attributes['width'] = row[fields[CRH_FLD_WID]]
             if CRH_FLD_BLN in fields:
                 attributes['length'] = row[fields[CRH_FLD_BLN]]
                     
@@ -769,7 +1062,7 @@ class Hydrography(object):
             
             # RSX specific attributes and create RSX
             else:
-                attributes['drop'] = row[fields[CRH_FLD_HIT]]
+                attributes['drop'] = row[fields[CRH_FLD_DRP]]
                 attributes['bfw'] = row[fields[CRH_FLD_BFW]]
                 barrier = RSX(**attributes)
                 
@@ -785,9 +1078,11 @@ class Hydrography(object):
                 reachBarriers[rid] = []
             reachBarriers[rid].append(barrier)
                 
-        # set barrier downstream objects
+        # set barrier downstream objects, unless they are derived from
+        #   reaches below
         for oid in barriers:
-            if barriers[oid][1] is None: barriers[oid][0].down = barriers[oid][0]
+            if (barriers[oid][1] is None) or (not self.barrierLinks): 
+                barriers[oid][0].down = barriers[oid][0]
             else: barriers[oid][0].down = barriers[barriers[oid][1]][0]
         
         
@@ -806,6 +1101,10 @@ class Hydrography(object):
                 'size': row[fields[CRH_FLD_STO]]
             }        
             
+            # optional fields
+            if CRH_FLD_GEO in fields:
+                attributes['geometry'] = row[fields[CRH_FLD_GEO]]
+            
             # create the reach and keep track of downstream reach and catchment
             reach = Reach(reachBarriers.get(oid, []), **attributes)
             reaches[oid] = (
@@ -828,6 +1127,10 @@ class Hydrography(object):
         for oid in reaches:
             if reaches[oid][1] is None: reaches[oid][0].down = reaches[oid][0]
             else: reaches[oid][0].down = reaches[reaches[oid][1]][0]
+            
+        # replace barrier downstream objects with links along reaches
+        if not self.barrierLinks:
+            self.__link_barriers__([reaches[oid][0] for oid in reaches])
         
         
         # ~~ CREATE CATCHMENTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
@@ -880,18 +1183,756 @@ class Hydrography(object):
         
         
         # ~~ CREATE HYDROGRAPHY ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
-        # create hydrography that contains everything
-        self.lakes = lakes
+        # add lakes to the hydrography
+        for lake in lakes: self.lakeObjects[lake.id] = lake
         
-        # add warning about lost catchments
-        catCount = 0
-        for lake in lakes:
-            for tributary in lake.tributaries:
-                catCount += len(tributary.catchments)
+        # keep ID lookups for objects that made it into the network
+        for cls, objects in ((Barrier, barriers), (Reach, reaches), (Catchment, catchments)):
+            self.ids[cls].update(
+                (oid, objects[oid][0]) for oid in objects if objects[oid][0].tributary is not None
+            )
+        self.ids[Tributary].update(tributaries)
+        self.ids[Lake].update((lake.id, lake) for lake in lakes)
+        
+        # count later changes to the objects in self's version
+        for objects in (barriers, reaches, catchments):
+            self.__adopt__([objects[oid][0] for oid in objects])
+        self.__adopt__(tributaries.values())
+        self.__adopt__(lakes)
+        
+        return lakes
+        
+        
+    def __create_parallel__(self, data):
+        """
+        Creates the objects of formatted data in self.workers processes and
+        merges them into self. See __create__().
+        
+        Tributaries linked to each other by a downstream ID or sharing a
+        catchment always go to the same share, so every share is a closed
+        part of the network that is created exactly as __create__() would
+        create it, and no links cross shares. Shares are balanced by number
+        of reaches, HYD_SHR per process so that shares already created are
+        rebuilt here while others are still being created. The processes
+        inherit the data and split it themselves.
+        
+        Only grouping the tributaries, rebuilding the shares and merging
+        them run in this process, about a seventh of a serial build, so the
+        build is never more than about 7 times faster. Creating and
+        flattening the shares costs about 1.5 times a serial build in all,
+        and a group of linked tributaries is never split, so on 60,000 rows
+        the build is about 1.2, 2.4 and 4 times faster with 2, 4 and 16
+        processes.
+        
+        OUTPUTS: list of Lakes created
+        """
+        from functools import partial
+        from multiprocessing import Pool
+        
+        # group tributaries that are linked to each other
+        fields, table = data[CRH_DAT_TRB]
+        group = dict((row[fields[CRH_FLD_TID]], row[fields[CRH_FLD_TID]]) for row in table)
+        def find(tid):
+            while group[tid] != tid:
+                group[tid] = group[group[tid]]
+                tid = group[tid]
+            return tid
+        def join(tidA, tidB):
+            if (tidA in group) and (tidB in group): group[find(tidA)] = find(tidB)
+        
+        fields, table = data[CRH_DAT_FLO]
+        reachTributary = dict((row[fields[CRH_FLD_RID]], row[fields[CRH_FLD_TID]]) for row in table)
+        catchmentTributary = {}
+        reachCount = {}
+        for row in table:
+            tid = row[fields[CRH_FLD_TID]]
+            reachCount[tid] = reachCount.get(tid, 0) + 1
+            join(tid, reachTributary.get(row[fields[CRH_FLD_RDS]]))
+            cid = row[fields[CRH_FLD_CAT]]
+            if cid in catchmentTributary: join(tid, catchmentTributary[cid])
+            else: catchmentTributary[cid] = tid
+            
+        fields, table = data[CRH_DAT_CAT]
+        for row in table:
+            join(
+                catchmentTributary.get(row[fields[CRH_FLD_CAT]]), 
+                catchmentTributary.get(row[fields[CRH_FLD_CDS]])
+            )
+            
+        if self.barrierLinks:
+            fields, table = data[CRH_DAT_BAR]
+            barrierTributary = dict(
+                (row[fields[CRH_FLD_BID]], reachTributary.get(row[fields[CRH_FLD_RID]]))
+                for row in table
+            )
+            for row in table:
+                join(
+                    barrierTributary[row[fields[CRH_FLD_BID]]], 
+                    barrierTributary.get(row[fields[CRH_FLD_BDS]])
+                )
+        
+        # split groups into shares of about the same number of reaches, 
+        #   largest first
+        groups = {}
+        for tid in group: groups.setdefault(find(tid), []).append(tid)
+        sizes = dict(
+            (root, sum(reachCount.get(tid, 0) for tid in groups[root])) for root in groups
+        )
+        loads = [0] * (self.workers * HYD_SHR)
+        share = {}
+        for root in sorted(groups, key=lambda root: (-sizes[root], root)):
+            k = loads.index(min(loads))
+            for tid in groups[root]: share[tid] = k
+            loads[k] += sizes[root]
+        
+        # create each share's objects in a worker process. Networks are
+        #   pickled as flat arrays, so sending them back is fast
+        create = partial(__create_share__, barrierLinks=self.barrierLinks)
+        pool = Pool(self.workers, __start_worker__, (data, share))
+        try:
+            networks = pool.map(create, sorted(set(share.values())), 1)
+        finally:
+            pool.close()
+            pool.join()
+        
+        # merge the shares, joining the tributaries of each lake
+        lakeTributaries = {}
+        for network in networks:
+            for cls in (Barrier, Reach, Catchment, Tributary):
+                self.ids[cls].update(network.ids[cls])
+            for lake in network.lakeObjects.itervalues():
+                lakeTributaries.setdefault(lake.id, []).extend(lake.tributaries)
                 
-        diff = len(data[CRH_DAT_CAT][1]) - catCount
-        if diff > 0:
-            print 'WARNING: Automatically discarded %i catchments with no associated reaches.' % diff
+        lakes = [Lake(lakeTributaries[lakeID], id=lakeID) for lakeID in sorted(lakeTributaries)]
+        for lake in lakes: self.lakeObjects[lake.id] = lake
+        self.ids[Lake].update((lake.id, lake) for lake in lakes)
+        for cls in self.ids: self.__adopt__(self.ids[cls].values())
+        
+        return lakes
+        
+        
+    def __getstate__(self):
+        """
+        Flattens the network for pickling. Links between objects (down,
+        reach, catchment, tributary, lake, ...) are replaced by arrays of
+        object numbers, so pickling never recurses along the links. Member
+        sets and up dictionaries are left out and rebuilt from the links by
+        __setstate__(), and cached indexes are dropped.
+        """
+        import gc
+        
+        enabled = gc.isenabled()
+        gc.disable()
+        try: return self.__flatten__()
+        finally: 
+            if enabled: gc.enable()
+            
+            
+    def __flatten__(self):
+        """Returns the flattened state of __getstate__()."""
+        import numpy
+
+        # number every created object from each lake upstream
+        objects = []
+        for lid in sorted(self.lakeObjects):
+            lake = self.lakeObjects[lid]
+            objects.append(lake)
+            for tributary in sorted(lake.tributaries, key=lambda t: t.id):
+                objects.append(tributary)
+                objects.extend(sorted(tributary.catchments, key=lambda c: c.id))
+                objects.extend(sorted(tributary.reaches, key=lambda r: r.id))
+                objects.extend(sorted(tributary.barriers, key=lambda b: b.id))
+        index = dict((obj, i) for i, obj in enumerate(objects))
+
+        # split each object's attributes into links and other values
+        classes = []
+        classIndex = {}
+        kinds = []
+        links = dict((k, [-1] * len(objects)) for k in HYD_LNK)
+        attributes = []
+        for i, obj in enumerate(objects):
+            kind = classIndex.get(obj.__class__)
+            if kind is None:
+                kind = classIndex[obj.__class__] = len(classes)
+                classes.append(obj.__class__)
+            kinds.append(kind)
+            values = obj.__dict__.copy()
+            for k in HYD_DRV: values.pop(k, None)
+            for k in HYD_LNK:
+                if values.get(k) in index: links[k][i] = index[values.pop(k)]
+            attributes.append(values)
+        kinds = numpy.array(kinds, dtype=numpy.int32)
+        links = dict((k, numpy.array(links[k], dtype=numpy.int64)) for k in links)
+
+        state = dict(
+            (k, v) for k, v in self.__dict__.iteritems()
+            if k not in ('ids', 'lakeObjects', 'indexes')
+        )
+        state['__network__'] = (
+            classes, kinds, links, attributes,
+            numpy.array([index[self.lakeObjects[lid]] for lid in sorted(self.lakeObjects)], dtype=numpy.int64)
+        )
+        return state
+
+
+    def __setstate__(self, state):
+        """Rebuilds a network flattened by __getstate__()."""
+        import gc
+
+        # pause garbage collection, which would otherwise scan the growing
+        #   network over and over while objects are recreated
+        enabled = gc.isenabled()
+        gc.disable()
+        try: self.__rebuild__(state)
+        finally: 
+            if enabled: gc.enable()
+            
+            
+    def __rebuild__(self, state):
+        """Recreates objects and links from the state of __setstate__()."""
+        state = dict(state)
+        classes, kinds, links, attributes, lakes = state.pop('__network__')
+        self.__dict__.update(state)
+
+        # recreate objects without their constructors and restore links
+        objects = [classes[k].__new__(classes[k]) for k in kinds]
+        for obj, values in zip(objects, attributes): obj.__dict__.update(values)
+        for k in links:
+            for i, j in enumerate(links[k].tolist()):
+                if j >= 0: objects[i].__dict__[k] = objects[j]
+
+        # rebuild member sets from the parent links of each object
+        for obj in objects:
+            if isinstance(obj, OrderedCollection): obj.__dict__['objects'] = set()
+            if isinstance(obj, Tributary):
+                obj.__dict__['catchments'] = set()
+                obj.__dict__['barriers'] = set()
+        for obj in objects:
+            d = obj.__dict__
+            if isinstance(obj, Barrier):
+                d['reach'].objects.add(obj)
+                d['tributary'].barriers.add(obj)
+            elif isinstance(obj, Reach):
+                d['catchment'].objects.add(obj)
+                d['tributary'].objects.add(obj)
+            elif isinstance(obj, Catchment):
+                d['tributary'].catchments.add(obj)
+            elif isinstance(obj, Tributary):
+                d['lake'].objects.add(obj)
+
+        # rebuild member aliases and up dictionaries
+        for obj in objects:
+            d = obj.__dict__
+            if isinstance(obj, Tributary):
+                d['reaches'] = obj.objects
+                obj.first_up('catchUp', 'catchments')
+                obj.first_up('reachUp', 'reaches')
+                obj.first_up('barUp', 'barriers')
+            elif isinstance(obj, OrderedCollection):
+                if isinstance(obj, Reach): d['barriers'] = obj.objects
+                elif isinstance(obj, Catchment): d['reaches'] = obj.objects
+                elif isinstance(obj, Lake): d['tributaries'] = obj.objects
+                obj.first_up()
+
+        # rebuild ID lookups
+        self.lakeObjects = dict((objects[i].id, objects[i]) for i in lakes)
+        self.ids = dict((cls, {}) for cls in (Barrier, Reach, Catchment, Tributary, Lake))
+        for obj in objects:
+            for cls in self.ids:
+                if isinstance(obj, cls): self.ids[cls][obj.id] = obj
+            if isinstance(obj, Barrier):
+                obj.__dict__['passabilities'] = Passabilities(obj, obj.__dict__['passabilities'])
+        self.__adopt__(objects)
+
+
+    @staticmethod
+    def __link_barriers__(reaches):
+        """
+        Sets the downstream object of every barrier on reaches to the next
+        barrier downstream along the reaches and fprop, in one pass that
+        carries each reach's nearest downstream barrier up from its mouth.
+        """
+        
+        # find the most upstream barrier of each reach, ordering barriers by 
+        #   fprop (0 is the upstream end) and then ID
+        ordered = {}
+        for reach in reaches:
+            ordered[reach] = sorted(reach.barriers, key=lambda b: (b.fprop, b.id))
+            
+        # find the nearest barrier below each reach, walking down only as far
+        #   as a reach that is already known
+        below = {}
+        for reach in reaches:
+            path = []
+            current = reach
+            while current not in below:
+                path.append(current)
+                down = current.down
+                if (down is current) or (down not in ordered):
+                    below[current] = None
+                    path.pop()
+                    break
+                current = down
+                
+            for obj in reversed(path):
+                downBarriers = ordered[obj.down]
+                below[obj] = downBarriers[0] if len(downBarriers) > 0 else below[obj.down]
+                
+        # link barriers within each reach and to the barrier below it
+        for reach in reaches:
+            downBarrier = below[reach]
+            for barrier in reversed(ordered[reach]):
+                barrier.down = barrier if downBarrier is None else downBarrier
+                downBarrier = barrier
+                
+                
+    @property
+    def lakes(self):
+        """List of all Lakes, creating any lazy lakes not yet created."""
+        return [self.get_lake(lakeID) for lakeID in self.lake_ids()]
+        
+        
+    def lake_ids(self):
+        """Returns a list of the IDs of all lakes, whether created or not."""
+        return self.lakeObjects.keys() + self.lakeData.keys()
+        
+        
+    def get_lake(self, lakeID):
+        """Returns the Lake with the given ID, creating it if it is lazy."""
+        if lakeID in self.lakeData:
+            self.__create__(self.lakeData.pop(lakeID))
+            
+        return self.lakeObjects[lakeID]
+        
+        
+    def stream_order(self, verbose=True):
+        """
+        Calculates the Strahler order, Shreve magnitude and number of upstream
+        reaches of every reach in the network. See Tributary.stream_order().
+        
+        INPUTS:
+            verbose = (optional) whether to print a warning (True) when loaded
+                stream orders disagree with the calculated Strahler orders.
+                Default is True.
+                
+        OUTPUTS: list of (reach, size, strahler) tuples for reaches whose loaded
+            size disagrees with the calculated Strahler order
+        """
+        mismatches = []
+        for tributary in self.get_tributaries():
+            mismatches.extend(tributary.stream_order())
+            
+        if verbose and (len(mismatches) > 0):
+            print 'WARNING: Loaded stream order disagrees with the calculated Strahler order for %i reaches.' % len(mismatches)
+            
+        return mismatches
+        
+        
+    def get_object(self, objType, oid):
+        """
+        Returns the object of a given class with the given ID from the loaded
+        data, raising a KeyError if there is none.
+        """
+        for cls in (Barrier, Reach, Catchment, Tributary, Lake):
+            if issubclass(objType, cls):
+            
+                # create the object's lake first when it is lazy
+                if (oid not in self.ids[cls]) and (self.lakeOf is not None) and (oid in self.lakeOf[cls]):
+                    self.get_lake(self.lakeOf[cls][oid])
+                    
+                obj = self.ids[cls][oid]
+                if isinstance(obj, objType): return obj
+                
+        raise KeyError('No %s with ID %s.' % (objType.__name__, repr(oid)))
+        
+        
+    def __adopt__(self, objects):
+        """Makes objects count their changes in self's version."""
+        version = self.version
+        for obj in objects: obj.__dict__['__version__'] = version
+        
+        
+    def __cached__(self, key, build):
+        """
+        Returns the cached value of key, first calling build() to (re)create
+        it if it is missing or an object of the network has been modified
+        since it was created.
+        """
+        cache = self.__dict__.setdefault('indexes', {})
+        if (key not in cache) or (cache[key][0] != self.version.count):
+            value = build()
+            cache[key] = (self.version.count, value)
+            
+        return cache[key][1]
+        
+        
+    def invalidate(self):
+        """
+        Drops the cached indexes of the network after changes its objects
+        cannot see, e.g. to member sets or values inside mutable attributes
+        other than passabilities.
+        """
+        self.version.count += 1
+        
+        
+    def reach_index(self):
+        """Returns the network's topology.TreeIndex of all reaches."""
+        from topology import TreeIndex
+        return self.__cached__('reaches', lambda: TreeIndex.from_objects(self.get_reaches()))
+
+
+    def network_matrix(self, objType):
+        """
+        Returns the matrix.NetworkMatrix of all objects of a type (Reach,
+        Catchment or Barrier) in the network.
+        """
+        from matrix import NetworkMatrix
+        return self.__cached__(
+            'matrix-%s' % objType.__name__, lambda: NetworkMatrix(self.get_objects(objType))
+        )
+
+
+    def trace_batch(self, objects, upstream=True):
+        """
+        Traces up- or downstream of many reaches, catchments or barriers (all
+        of one kind) at once. See matrix.NetworkMatrix.trace_up().
+        
+        INPUTS:
+            objects     = sequence of Reaches, Catchments or Barriers
+            
+            upstream    = (optional) whether to trace upstream (True) or
+                downstream (False). Default is True.
+                
+        OUTPUTS: matrix.BatchTrace with one trace per object, in order
+        """
+        objects = list(objects)
+        kinds = set()
+        for obj in objects:
+            kinds.update([k for k in (Reach, Catchment, Barrier) if isinstance(obj, k)])
+        if len(kinds) > 1:
+            raise TypeError('Batch traces start from objects of one kind.')
+        kind = kinds.pop() if len(kinds) > 0 else Reach
+        
+        matrix = self.network_matrix(kind)
+        sources = matrix.indexes(objects)
+        if upstream: return matrix.trace_up(sources)
+        else: return matrix.trace_down(sources)
+
+
+    def next_index(self):
+        """Returns the network's matrix.NextIndex of reaches and barriers."""
+        from matrix import NextIndex
+        return self.__cached__('next', lambda: NextIndex(
+            self.network_matrix(Reach), self.network_matrix(Barrier)
+        ))
+
+
+    def next_downstream(self, obj, objType=None):
+        """
+        Returns the nearest barrier of a type (e.g. Dam or RSX, default any
+        Barrier) downstream of a Reach or Barrier, or None if there is none.
+        Equivalent to the first barrier of the type along obj.trace_down()
+        for barriers, but takes constant time. See matrix.NextIndex.
+        """
+        return self.next_index().next(obj, objType)
+
+
+    def mouth(self, obj):
+        """
+        Returns the Reach at the mouth of the tributary of a Reach or Barrier.
+        """
+        return self.next_index().mouth(obj)
+
+
+    def contracted_network(self):
+        """
+        Returns the contraction.ContractedNetwork of all reaches, where
+        barrier-free chains of reaches are collapsed into single edges.
+        """
+        from contraction import ContractedNetwork
+        return self.__cached__(
+            'contracted', lambda: ContractedNetwork(self.network_matrix(Reach))
+        )
+
+
+    def subnetwork(self, feature):
+        """
+        Returns a subnetwork.SubNetwork view of a Lake, a Tributary, or a 
+        Reach and everything upstream of it, sharing this network's objects.
+        """
+        from subnetwork import SubNetwork
+        return SubNetwork(self, feature)
+        
+        
+    def barrier_tree(self):
+        """Returns the network's connectivity.BarrierTree of all tributaries."""
+        from connectivity import BarrierTree
+        return self.__cached__('barriers', lambda: BarrierTree(
+            sorted(self.get_tributaries(), key=lambda t: t.id)
+        ))
+        
+        
+    def accessible_habitat(self, guild):
+        """
+        Returns a dictionary of each Tributary's river length accessible from
+        its mouth for a guild, weighted by the passability of the barriers
+        along the way. See connectivity.BarrierTree.
+        """
+        return self.barrier_tree().habitat(guild)
+
+
+    def potamodromous_index(self, guild):
+        """
+        Returns a connectivity.PotamodromousIndex of the network for a guild,
+        which gives each tributary's and lake's potamodromous dendritic
+        connectivity index and updates it as barrier passabilities change.
+        """
+        from connectivity import PotamodromousIndex
+        return PotamodromousIndex(self.barrier_tree(), guild)
+
+
+    def habitat_series(self, guild, series, steps=None, chunkSize=None):
+        """
+        Returns each Tributary's accessible habitat at every step of a time
+        series of barrier passabilities as a tuple of (list of Tributaries,
+        tributaries x time steps array). See
+        connectivity.BarrierTree.habitat_series().
+        """
+        from connectivity import BTR_CHK
+        if chunkSize is None: chunkSize = BTR_CHK
+        return self.barrier_tree().habitat_series(guild, series, steps, chunkSize)
+
+
+    def rank_removals(self, guilds=None):
+        """
+        Ranks barriers by the accessible habitat gained from removing each
+        one alone, per unit of removal cost. See
+        connectivity.BarrierTree.removal_gain().
+
+        INPUTS:
+            guilds      = (optional) iterable of guilds to rank for. Default
+                (None) is every guild of the network's barriers.
+
+        OUTPUTS: dictionary of guilds to lists of (barrier, gain, cost, score)
+            sorted by descending score, where score is gain / cost. Barriers
+            without a cost have a score of None and are ranked last by gain.
+        """
+        tree = self.barrier_tree()
+        if guilds is None: guilds = tree.guilds()
+        barriers = [i for i in xrange(len(tree)) if tree.barrier[i]]
+        ranks = {}
+        for guild in guilds:
+            gain = tree.removal_gain(guild)
+            rows = []
+            for i in barriers:
+                cost = tree.cost[i]
+                if cost != cost: score, cost = None, None
+                elif cost == 0: score = float('inf') if gain[i] > 0 else 0.
+                else: score = gain[i] / cost
+                rows.append((tree.nodes[i], gain[i], cost, score))
+
+            rows.sort(key=lambda r: (r[3] is not None, r[3], r[1]), reverse=True)
+            ranks[guild] = rows
+
+        return ranks
+
+
+    def pareto_front(self, guilds=None, epsilon=None, budget=None, maxSize=None):
+        """
+        Returns the barrier removals that are not dominated when maximizing
+        habitat gained for each guild and minimizing spending in each
+        country, and the box size the front was compared in. See
+        optimize.pareto_front().
+        """
+        from optimize import pareto_front, OPT_EPS, OPT_MAX
+        if epsilon is None: epsilon = OPT_EPS
+        if maxSize is None: maxSize = OPT_MAX
+        return pareto_front(self, guilds, epsilon, budget, maxSize)
+
+
+    def apply_models(self, models, overwrite=False):
+        """
+        Derives barrier passabilities and costs from barrier dimensions with
+        models.BarrierModels, writing them into the barriers. See
+        models.apply_models().
+
+        OUTPUTS: number of barriers changed
+        """
+        from models import apply_models
+        return apply_models(self.get_barriers(), models, overwrite)
+
+
+    def fingerprint(self):
+        """
+        Returns a hash of the network's tributaries, reaches and barriers
+        that changes whenever they do. See cache.network_fingerprint().
+        """
+        from cache import network_fingerprint
+        return self.__cached__('fingerprint', lambda: network_fingerprint(self))
+
+
+    def scenario(self, removed=(), passabilities=None, costs=None):
+        """
+        Returns a scenario.Scenario overlay of barrier removals, passabilities
+        and costs on this network, which is left unchanged.
+        """
+        from scenario import Scenario
+        return Scenario(self, removed, passabilities, costs)
+        
+        
+    def distance_index(self):
+        """Returns the network's distance.DistanceIndex of all reaches."""
+        from distance import DistanceIndex
+        return self.__cached__('distance', lambda: DistanceIndex(self.get_reaches()))
+        
+        
+    def river_distance(self, points, others=None):
+        """
+        Calculates in-river distances for a batch of points, either between
+        pairs of points or from each point to its river mouth.
+        
+        INPUTS:
+            points  = sequence of (reach, fprop) tuples or Structures, where
+                fprop is the proportion along the reach from its upstream end
+                
+            others  = (optional) sequence of (reach, fprop) tuples or 
+                Structures the same length as points. Default (None) is to
+                calculate distances to the river mouth of each point.
+                
+        OUTPUTS: numpy array of distances. Pairs of points that do not share
+            a river mouth are infinitely far apart.
+        """
+        index = self.distance_index()
+        if others is None: return index.to_mouth(points)
+        else: return index.between(points, others)
+        
+        
+    def spatial_index(self):
+        """Returns the network's spatial.ReachGrid of reach geometries."""
+        from spatial import ReachGrid
+        return self.__cached__('spatial', lambda: ReachGrid(self.get_reaches()))
+        
+        
+    def snap(self, points, maxDistance=None):
+        """
+        Finds the nearest reach and proportion along it for each point using
+        the reach geometries. See spatial.ReachGrid.nearest().
+        
+        INPUTS:
+            points      = iterable of (x, y) coordinates
+            
+            maxDistance = (optional) largest distance from a point to a reach
+                to snap to. Default (None) is unlimited.
+                
+        OUTPUTS: list of (reach, fprop, distance) tuples or None for each point
+        """
+        return self.spatial_index().snap(points, maxDistance)
+        
+        
+    def add_barriers(self, barriers, points=None, maxDistance=None):
+        """
+        Adds new barriers to the network, linking them to their reach, 
+        tributary and the barriers immediately up- and downstream without
+        rebuilding the network.
+        
+        INPUTS:
+            barriers    = iterable of new Barriers (or Dams or RSX). Without
+                points, each barrier's reach and fprop must already be set.
+                
+            points      = (optional) iterable of (x, y) coordinates of each
+                barrier, which are snapped to the nearest reach to set the 
+                barriers' reach and fprop. Default (None) uses the barriers'
+                existing reach and fprop.
+                
+            maxDistance = (optional) see snap()
+            
+        OUTPUTS: list of barriers that were not added because no reach was 
+            within maxDistance of their point
+        """
+        barriers = list(barriers)
+        skipped = []
+        if points is not None:
+            snapped = self.snap(points, maxDistance)
+            placed = []
+            for barrier, snap in zip(barriers, snapped):
+                if snap is None:
+                    skipped.append(barrier)
+                else:
+                    barrier.reach, barrier.fprop = snap[:2]
+                    placed.append(barrier)
+            barriers = placed
+            
+        for barrier in barriers:
+            reach = barrier.reach
+            if (reach is None) or (reach.tributary is None):
+                raise ValueError('%s is not on a reach in the network.' % repr(barrier))
+            
+            # find the next barrier downstream, first on the same reach and
+            #   then on the reaches below it
+            below = [b for b in reach.barriers if b.fprop > barrier.fprop]
+            if len(below) == 0:
+                for downReach in reach.trace_down():
+                    if len(downReach.barriers) > 0:
+                        below = downReach.barriers
+                        break
+            down = min(below, key=lambda b: b.fprop) if len(below) > 0 else None
+            
+            # barriers that drained past the new barrier now drain to it
+            tributary = reach.tributary
+            if down is None:
+                candidates = [b for b in tributary.barriers if b.down is b]
+            else:
+                candidates = list(tributary.barUp[down])
+                
+            moved = set()
+            for b in candidates:
+                if b.reach is reach: upstream = b.fprop < barrier.fprop
+                else: upstream = reach in b.reach.trace_down()
+                if upstream: moved.add(b)
+                
+            # link the new barrier, counting its later changes in self's
+            #   version
+            self.__adopt__([barrier])
+            barrier.tributary = tributary
+            barrier.down = barrier if down is None else down
+            reach.barriers.add(barrier)
+            tributary.barriers.add(barrier)
+            tributary.barUp[barrier] = moved
+            if down is not None:
+                tributary.barUp[down].difference_update(moved)
+                tributary.barUp[down].add(barrier)
+                
+            for b in moved: b.down = barrier
+            for r in set([reach] + [b.reach for b in moved]): r.first_up()
+            self.ids[Barrier][barrier.id] = barrier
+            
+        if len(barriers) > 0: self.invalidate()
+        return skipped
+        
+        
+    def export(self, path, format='csv', columns=None, chunkSize=50000):
+        """
+        Writes attribute tables of barriers, flowlines, catchments and 
+        tributaries, plus any extra computed columns, to CSV, Parquet or 
+        GeoPackage. See export.export_tables().
+        
+        INPUTS:
+            path        = output directory (CSV and Parquet) or file 
+                (GeoPackage)
+                
+            format      = (optional) 'csv', 'parquet' or 'gpkg'. Default is
+                'csv'.
+                
+            columns     = (optional) dictionary of extra columns by object
+                class. See export.table_columns().
+                
+            chunkSize   = (optional) number of rows to write at a time. 
+                Default is 50000.
+                
+        OUTPUTS: list of paths written to
+        """
+        from export import export_tables
+        return export_tables(self, path, format, columns, chunkSize)
         
         
     def get_objects(self, objType):
@@ -962,6 +2003,35 @@ class Hydrography(object):
         return self.get_objects(Lake)
         
         
+# ~~ __start_worker__() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+__shares__ = {}
+def __start_worker__(data, share):
+    """
+    __START_WORKER__() splits formatted data into the shares of a worker
+    process of Hydrography.__create_parallel__().
+    
+    INPUT:
+        data        = formatted data of the whole network
+        share       = dictionary of tributary IDs to share keys
+    """
+    __shares__.update(Hydrography.__partition__(data, share)[0])
+    
+    
+# ~~ __create_share__() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def __create_share__(k, barrierLinks):
+    """
+    __CREATE_SHARE__() creates the Hydrography of a share of formatted data in
+    a worker process. See __start_worker__().
+    
+    INPUT:
+        k           = key of the share
+        barrierLinks = barrierLinks of the Hydrography
+        
+    OUTPUT: Hydrography
+    """
+    return Hydrography(__shares__.pop(k), validate=False, barrierLinks=barrierLinks)
+    
+    
 if __name__ == '__main__':
 
     from __test__ import __test__
@@ -37,6 +37,13 @@ LOD_FLD_WSA = 'WSAKM2'
 LOD_FLD_LEN = 'Shape_Length'
 LOD_FLD_STO = 'STRAHLER'
 LOD_VAL_SLF = -1
+LOD_FLD_GEO = 'SHAPE@'
+LOD_GEO_LOD = False
+LOD_NUM_WRK = 1
+LOD_VRB_LOD = False
+LOD_ORD_LOD = ( # order in which datasets are read
+    'barriers', 'rsx', 'dams', 'flowlines', 'catchments', 'tributaries'
+)
 
 # ~~ load_hydro_mdb() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 def load_hydro_mdb(database, **options):
@@ -107,6 +114,17 @@ def load_hydro_mdb(database, **options):
                 Default is LOD_FLD_LAK
             slf_value: value that indicates the downstream barrier, flowline,
                 or catchment is itself. Default is LOD_VAL_SLF
+            geo_field: geometry token of flowlines in flowlines dataset.
+                Default is LOD_FLD_GEO
+            geometry: whether to load (True) flowline geometries as lists of
+                (x, y) vertices, e.g. for snapping points to reaches. Default
+                is LOD_GEO_LOD
+            workers: maximum number of datasets to read at the same time in
+                separate threads, which helps when the database is on a
+                network share. Default is LOD_NUM_WRK
+            verbose: whether to print (True) the number of rows and time taken
+                for each dataset as it finishes loading. Default is 
+                LOD_VRB_LOD
                 
     OUTPUT: a dictionary formatted for create_hydrography()
     """
@@ -118,10 +136,10 @@ def load_hydro_mdb(database, **options):
         CRH_FLD_HAB, CRH_FLD_CST, CRH_FLD_LAM, CRH_FLD_P04, CRH_FLD_P07, 
         CRH_FLD_P10, CRH_FLD_BFW, CRH_FLD_DRP, CRH_FLD_HIT, CRH_FLD_WID, 
         CRH_FLD_BLN, CRH_FLD_TYP, CRH_FLD_RDS, CRH_FLD_TID, CRH_FLD_CAT, 
-        CRH_FLD_CDS, CRH_FLD_WSA, CRH_FLD_LEN, CRH_FLD_STO
+        CRH_FLD_CDS, CRH_FLD_WSA, CRH_FLD_LEN, CRH_FLD_STO, CRH_FLD_GEO
     )
     
-    import arcpy, os
+    import arcpy, os, time
     
     # update options
     P = {
@@ -139,7 +157,9 @@ def load_hydro_mdb(database, **options):
         'len_field': LOD_FLD_LEN, 'sto_field': LOD_FLD_STO,
         'wsa_field': LOD_FLD_WSA, 'lak_field': LOD_FLD_LAK,
         'cds_field': LOD_FLD_CDS, 'slf_value': LOD_VAL_SLF,
-        'hit_field': LOD_FLD_HIT
+        'hit_field': LOD_FLD_HIT, 'geo_field': LOD_FLD_GEO,
+        'geometry': LOD_GEO_LOD, 'workers': LOD_NUM_WRK,
+        'verbose': LOD_VRB_LOD
         
     }
     for k in options: P[k.lower()] = options[k]
@@ -173,6 +193,7 @@ def load_hydro_mdb(database, **options):
         'catchments': ('cat_field', 'cds_field', 'wsa_field'),
         'tributaries': ('tid_field', 'lak_field')
     }
+    if P['geometry']: fields['flowlines'] += ('geo_field',)
     
     # define fields for which values should be mapped to other values
     val2Val = {
@@ -210,7 +231,8 @@ def load_hydro_mdb(database, **options):
             CRH_DAT_FLO, {
                 'rid_field': CRH_FLD_RID, 'rds_field': CRH_FLD_RDS,
                 'tid_field': CRH_FLD_TID, 'cat_field': CRH_FLD_CAT,
-                'len_field': CRH_FLD_LEN, 'sto_field': CRH_FLD_STO
+                'len_field': CRH_FLD_LEN, 'sto_field': CRH_FLD_STO,
+                'geo_field': CRH_FLD_GEO
             }
         ),
         'catchments': (
@@ -231,7 +253,10 @@ def load_hydro_mdb(database, **options):
     
     # mapping from loaded raw value to formatted value
     def map_value(dataset, field, value):
-        if (dataset in val2Val) and (field in val2Val[dataset]) and (value == val2Val[dataset][field][0]):
+        if field == 'geo_field':
+            if value is None: return None
+            return [(p.X, p.Y) for part in value for p in part if p]
+        elif (dataset in val2Val) and (field in val2Val[dataset]) and (value == val2Val[dataset][field][0]):
             return val2Val[dataset][field][1]
         else:
             return value
@@ -257,55 +282,86 @@ def load_hydro_mdb(database, **options):
     fInd['barriers'][CRH_FLD_TYP] = len(fInd['barriers'])
         
             
-    # load data
-    data = {}
-    for datasetName in datasets:
+    # load one dataset at a time, mapping values to new values where need-be
+    #   and otherwise just taking the value as is
+    def load_dataset(datasetName):
+        start = time.time()
         datasetPath = datasets[datasetName]
         datasetFields = [P[f] for f in fields[datasetName]]
         cursor = arcpy.da.SearchCursor(datasetPath, datasetFields)
         n = len(fields[datasetName])
-        
-        # load all rows at once, mapping values to new values where need-be
-        #   and otherwise just taking the value as is
-        data[fmap[datasetName][0]] = (
-            fInd[datasetName],
+        rows = [
             [
-                [
-                    map_value(
-                        datasetName, fields[datasetName][i], row[i]
-                    ) for i in xrange(n)
-                ] for row in cursor
-            ]
-        )
-            
+                map_value(
+                    datasetName, fields[datasetName][i], row[i]
+                ) for i in xrange(n)
+            ] for row in cursor
+        ]
         del cursor
+        return datasetName, rows, time.time() - start
         
     # append rsx and dam data on barrier data
-    rowInds = {}
-    for k in extraBarFields:
-        dataTable = data[k][1]
-        nRows = len(dataTable)
-        idInd = data[k][0]['bid_field']
-        rowInds[k] = dict((dataTable[i][idInd], i) for i in xrange(nRows))
-    
-    newBarName = fmap['barriers'][0]
-    newBarIDName = fmap['barriers'][1]['bid_field']
-    newBarIDInd = fInd['barriers'][newBarIDName]
-    fieldLen = dict((k, len(fields[k])-1) for k in extraBarFields)
-    for row in data[newBarName][1]:
-        bid = row[newBarIDInd]
-        isDam = False
+    def join_barriers():
+        rowInds = {}
         for k in extraBarFields:
+            dataTable = data[k][1]
+            nRows = len(dataTable)
+            idInd = data[k][0]['bid_field']
+            rowInds[k] = dict((dataTable[i][idInd], i) for i in xrange(nRows))
         
-            # add data from the rsx and dam datasets
-            if bid in rowInds[k]:
-                row.extend(data[k][1][rowInds[k][bid]][1:])
-                if k == 'dams': isDam = True
+        newBarName = fmap['barriers'][0]
+        newBarIDName = fmap['barriers'][1]['bid_field']
+        newBarIDInd = fInd['barriers'][newBarIDName]
+        fieldLen = dict((k, len(fields[k])-1) for k in extraBarFields)
+        for row in data[newBarName][1]:
+            bid = row[newBarIDInd]
+            isDam = False
+            for k in extraBarFields:
+            
+                # add data from the rsx and dam datasets
+                if bid in rowInds[k]:
+                    row.extend(data[k][1][rowInds[k][bid]][1:])
+                    if k == 'dams': isDam = True
+                    
+                # populate with empty list to maintain size equality
+                else:
+                    row.extend([None]*fieldLen[k])
+                    
+            row.append(isDam)
+            
+            
+    # load data, reading datasets in parallel threads when requested. 
+    #   Barrier datasets are read first so they can be joined while the
+    #   remaining datasets are still loading.
+    start = time.time()
+    workers = min(P['workers'], len(LOD_ORD_LOD))
+    if workers > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(workers)
+        loaded = pool.imap_unordered(load_dataset, LOD_ORD_LOD)
+    else:
+        pool = None
+        loaded = (load_dataset(datasetName) for datasetName in LOD_ORD_LOD)
+        
+    data = {}
+    joinNames = [fmap[k][0] for k in ('barriers',) + extraBarFields]
+    joined = False
+    try:
+        for datasetName, rows, seconds in loaded:
+            data[fmap[datasetName][0]] = (fInd[datasetName], rows)
+            if P['verbose']:
+                print 'Loaded %i rows from %s in %.2f seconds.' % (len(rows), datasetName, seconds)
                 
-            # populate with empty list to maintain size equality
-            else:
-                row.extend([None]*fieldLen[k])
+            if (not joined) and all(k in data for k in joinNames):
+                joined = True
+                join_barriers()
                 
-        row.append(isDam)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+            
+    if P['verbose']:
+        print 'Loaded %i datasets in %.2f seconds.' % (len(data), time.time() - start)
         
     return data
@@ -0,0 +1,424 @@
+# This file contains sparse-matrix representations of the reach, catchment
+#   and barrier graphs of a hydrography network with stable node numbering
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import numpy
+import scipy.sparse
+
+
+# ~~ NETWORK MATRIX ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class NetworkMatrix(object):
+    """
+    NetworkMatrix numbers a set of OrderedObjects (e.g. all Reaches) and
+    holds their downstream links as a CSR adjacency matrix A, where
+    A[i, j] = 1 when node j drains directly into node i.
+
+    Nodes are numbered in preorder from the mouths upstream, visiting roots
+    and upstream nodes in order of ID, so the numbering only depends on the
+    network and A is strictly upper triangular. Every node's upstream
+    subtree is then the contiguous block of nodes i to end[i], which makes
+    solves with I - A (upstream sums) and I - A.T (downstream sums) prefix
+    sums over the numbering.
+    """
+
+    def __init__(self, objects):
+        """
+        INPUTS:
+            objects     = iterable of OrderedObjects to number. Objects
+                draining to an object that is not included are roots.
+        """
+        from collections import OrderedDict
+        from topology import TreeIndex
+
+        objects = sorted(objects, key=lambda obj: obj.id)
+        tree = TreeIndex(OrderedDict(
+            (obj, (None if obj.down is obj else obj.down)) for obj in reversed(objects)
+        ))
+        if len(tree.unreached) > 0:
+            raise ValueError('Downstream links of %i objects form cycles.' % len(tree.unreached))
+
+        self.__link__(tree.nodes, tree.index, tree.parent, tree.end, tree.depth)
+
+
+    @classmethod
+    def from_arrays(cls, nodes, parent, end, depth):
+        """
+        Creates a NetworkMatrix from an existing preorder numbering instead
+        of downstream links, e.g. for a contracted network whose nodes stand
+        for several objects.
+
+        INPUTS:
+            nodes       = list of node objects in preorder
+
+            parent      = array of each node's parent number, -1 for roots
+
+            end         = array of one past each node's last upstream node
+
+            depth       = array of each node's number of downstream nodes
+
+        OUTPUTS: NetworkMatrix
+        """
+        matrix = cls.__new__(cls)
+        matrix.__link__(nodes, dict((obj, i) for i, obj in enumerate(nodes)), parent, end, depth)
+        return matrix
+
+
+    def __link__(self, nodes, index, parent, end, depth):
+        """Sets the numbering arrays and adjacency matrix of self."""
+        n = len(nodes)
+        self.nodes = nodes
+        self.index = index
+        self.parent = numpy.array(parent, dtype=numpy.int64)
+        self.end = numpy.array(end, dtype=numpy.int64)
+        self.depth = numpy.array(depth, dtype=numpy.int64)
+        self.roots = numpy.flatnonzero(self.parent < 0)
+        edges = numpy.flatnonzero(self.parent >= 0)
+        self.adjacency = scipy.sparse.csr_matrix(
+            (numpy.ones(len(edges)), (self.parent[edges], edges)), shape=(n, n)
+        )
+
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+    def __contains__(self, obj):
+        return obj in self.index
+
+
+    # ~~ CONVERSION ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def indexes(self, objects):
+        """Returns an array of the node numbers of objects."""
+        index = self.index
+        return numpy.fromiter((index[obj] for obj in objects), dtype=numpy.int64)
+
+
+    def objects(self, indexes):
+        """Returns a list of the objects of node numbers."""
+        nodes = self.nodes
+        return [nodes[i] for i in indexes]
+
+
+    def values(self, attribute, default=0.):
+        """
+        Returns an array of an attribute of every node, using default where
+        the attribute is undefined.
+        """
+        values = numpy.empty(len(self.nodes), dtype=float)
+        for i, obj in enumerate(self.nodes):
+            value = obj.__dict__.get(attribute)
+            values[i] = default if value is None else value
+        return values
+
+
+    # ~~ ACCUMULATION ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def upstream_sum(self, values, inclusive=True):
+        """
+        Sums values over each node's upstream subtree, which solves
+        (I - A) x = values.
+
+        INPUTS:
+            values      = array of node values, either 1-dimensional or
+                2-dimensional with nodes along the first dimension
+
+            inclusive   = (optional) whether to include each node's own value
+                (True). Default is True.
+
+        OUTPUTS: array of sums shaped like values
+        """
+        values = numpy.asarray(values, dtype=float)
+        cumulative = numpy.concatenate((numpy.zeros((1,) + values.shape[1:]), numpy.cumsum(values, axis=0)))
+        sums = cumulative[self.end] - cumulative[:-1]
+        if not inclusive: sums -= values
+        return sums
+
+
+    def downstream_sum(self, values, inclusive=True):
+        """
+        Sums values over the path from each node to its mouth, which solves
+        (I - A.T) x = values. See upstream_sum().
+        """
+        values = numpy.asarray(values, dtype=float)
+        n = len(self.nodes)
+
+        # add each node's value to its block of upstream nodes
+        delta = numpy.zeros((n + 1,) + values.shape[1:])
+        delta[:n] += values
+        if values.ndim == 1:
+            delta -= numpy.bincount(self.end, weights=values, minlength=n+1)
+        else:
+            for k in numpy.ndindex(*values.shape[1:]):
+                column = (slice(None),) + k
+                delta[column] -= numpy.bincount(self.end, weights=values[column], minlength=n+1)
+
+        sums = numpy.cumsum(delta, axis=0)[:n]
+        if not inclusive: sums -= values
+        return sums
+
+
+    def downstream_product(self, values, inclusive=True):
+        """
+        Multiplies values (e.g. passabilities) over the path from each node
+        to its mouth, summing logarithms so long paths do not underflow
+        before the end. Zeros are counted separately. See upstream_sum().
+        """
+        values = numpy.asarray(values, dtype=float)
+        zero = values <= 0
+        logs = numpy.log(numpy.where(zero, 1., values))
+        product = numpy.exp(self.downstream_sum(logs, inclusive))
+        product[self.downstream_sum(zero, inclusive) > 0.5] = 0.
+        return product
+
+
+    # ~~ REACHABILITY ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def is_upstream(self, nodes, others):
+        """
+        Returns a boolean array of whether each node number in nodes is
+        upstream of (or is) the node number at the same position in others.
+        """
+        nodes = numpy.asarray(nodes, dtype=numpy.int64)
+        others = numpy.asarray(others, dtype=numpy.int64)
+        return (others <= nodes) & (nodes < self.end[others])
+
+
+    def upstream_mask(self, sources):
+        """
+        Returns a boolean array of the nodes upstream of (or at) any of the
+        node numbers in sources.
+        """
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        n = len(self.nodes)
+        delta = numpy.bincount(sources, minlength=n+1) - numpy.bincount(self.end[sources], minlength=n+1)
+        return numpy.cumsum(delta)[:n] > 0
+
+
+    def downstream_mask(self, sources):
+        """
+        Returns a boolean array of the nodes downstream of (or at) any of the
+        node numbers in sources.
+        """
+        marks = numpy.zeros(len(self.nodes))
+        marks[numpy.asarray(sources, dtype=numpy.int64)] = 1.
+        return self.upstream_sum(marks) > 0.5
+
+
+    def nearest_downstream(self, mask):
+        """
+        Finds each node's nearest downstream node (not itself) where mask is
+        True in one pass over the numbering, which visits every node after
+        its downstream node.
+
+        INPUTS:
+            mask        = boolean array over the nodes
+
+        OUTPUTS: array of node numbers, -1 where there is none
+        """
+        parent = self.parent.tolist()
+        mask = numpy.asarray(mask, dtype=bool).tolist()
+        nearest = [-1] * len(parent)
+        for i, p in enumerate(parent):
+            if p >= 0: nearest[i] = p if mask[p] else nearest[p]
+        return numpy.array(nearest, dtype=numpy.int64)
+
+
+    def mouths(self):
+        """Returns an array of the root node number of every node."""
+        root = self.parent < 0
+        return numpy.where(root, numpy.arange(len(self.nodes)), self.nearest_downstream(root))
+
+
+    # ~~ BATCH TRACING ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def trace_up(self, sources):
+        """
+        Traces upstream of many nodes at once. Each node's upstream nodes are
+        the block of the numbering after it, so the traces are read off the
+        numbering without walking any subtree.
+
+        INPUTS:
+            sources     = array of node numbers to trace from
+
+        OUTPUTS: BatchTrace of each source's upstream node numbers, in
+            preorder
+        """
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        sizes = self.end[sources] - sources - 1
+        offsets = numpy.zeros(len(sources) + 1, dtype=numpy.int64)
+        numpy.cumsum(sizes, out=offsets[1:])
+        indices = numpy.arange(offsets[-1], dtype=numpy.int64)
+        indices += numpy.repeat(sources + 1 - offsets[:-1], sizes)
+        return BatchTrace(self, sources, offsets, indices)
+
+
+    def trace_down(self, sources):
+        """
+        Traces downstream of many nodes at once, stepping all sources down
+        together one level at a time.
+
+        INPUTS:
+            sources     = array of node numbers to trace from
+
+        OUTPUTS: BatchTrace of each source's downstream node numbers, from
+            nearest to the mouth
+        """
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        sizes = self.depth[sources]
+        offsets = numpy.zeros(len(sources) + 1, dtype=numpy.int64)
+        numpy.cumsum(sizes, out=offsets[1:])
+        indices = numpy.empty(offsets[-1], dtype=numpy.int64)
+
+        # positions and current nodes of sources that are not at a mouth yet
+        active = numpy.flatnonzero(sizes > 0)
+        position = offsets[active]
+        current = self.parent[sources[active]]
+        while len(active) > 0:
+            indices[position] = current
+            position += 1
+            more = position < offsets[active + 1]
+            active, position, current = active[more], position[more], self.parent[current[more]]
+
+        return BatchTrace(self, sources, offsets, indices)
+
+
+
+# ~~ BATCH TRACE ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class BatchTrace(object):
+    """
+    BatchTrace holds the traces of many sources in one array of node numbers:
+    the trace of source k is indices[offsets[k]:offsets[k+1]]. Memory is
+    proportional to the total length of the traces.
+    """
+
+    def __init__(self, matrix, sources, offsets, indices):
+        """
+        INPUTS:
+            matrix      = NetworkMatrix the node numbers belong to
+
+            sources     = array of source node numbers
+
+            offsets     = array of where each source's trace starts in
+                indices, with the total length at the end
+
+            indices     = array of the node numbers of all traces
+        """
+        self.matrix = matrix
+        self.sources = sources
+        self.offsets = offsets
+        self.indices = indices
+
+
+    def __len__(self):
+        return len(self.sources)
+
+
+    def __getitem__(self, k):
+        """Returns the objects of the trace of the kth source."""
+        return self.matrix.objects(self.indexes(k))
+
+
+    def indexes(self, k):
+        """Returns the node numbers of the trace of the kth source."""
+        return self.indices[self.offsets[k]:self.offsets[k+1]]
+
+
+    def sizes(self):
+        """Returns an array of the length of each source's trace."""
+        return numpy.diff(self.offsets)
+
+
+    def sums(self, values):
+        """
+        Returns an array of the sum of node values over each source's trace.
+        """
+        values = numpy.asarray(values, dtype=float)
+        cumulative = numpy.concatenate(([0.], numpy.cumsum(values[self.indices])))
+        return cumulative[self.offsets[1:]] - cumulative[self.offsets[:-1]]
+
+
+
+# ~~ NEXT INDEX ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class NextIndex(object):
+    """
+    NextIndex points every reach and barrier of a network to the nearest
+    barrier of a type downstream of it and to the mouth reach of its
+    tributary, so each lookup takes constant time instead of a trace.
+
+    For a barrier the next barrier is along the barrier links. For a reach it
+    is the first barrier met going downstream from the reach's upstream end:
+    the reach's own most upstream barrier, if it has one. Pointers for
+    Barrier, Dam and RSX are built up front and pointers for other barrier
+    types when first asked for.
+    """
+
+    def __init__(self, reaches, barriers):
+        """
+        INPUTS:
+            reaches     = NetworkMatrix of the network's reaches
+
+            barriers    = NetworkMatrix of the network's barriers
+        """
+        from hydrography import Barrier, Dam, RSX
+
+        self.reaches = reaches
+        self.barriers = barriers
+
+        # first barrier below each reach's upstream end, carried up from the
+        #   mouths
+        own = numpy.full(len(reaches), -1, dtype=numpy.int64)
+        for i, reach in enumerate(reaches.nodes):
+            if len(reach.barriers) > 0:
+                own[i] = barriers.index[min(reach.barriers, key=lambda b: (b.fprop, b.id))]
+        nearest = reaches.nearest_downstream(own >= 0)
+        self.first = numpy.where((own < 0) & (nearest >= 0), own[numpy.maximum(nearest, 0)], own)
+
+        # mouth reach of every reach and barrier
+        self.reachMouth = reaches.mouths()
+        barrierReach = reaches.indexes([b.reach for b in barriers.nodes])
+        self.barrierMouth = self.reachMouth[barrierReach]
+
+        self.pointers = {}
+        for objType in (Barrier, Dam, RSX): self.__pointers__(objType)
+
+
+    def __pointers__(self, objType):
+        """
+        Returns a tuple of (array of the next objType barrier of each
+        barrier, array of the next objType barrier of each reach), building
+        them on first use.
+        """
+        if objType not in self.pointers:
+            barriers = self.barriers
+            isType = numpy.fromiter(
+                (isinstance(b, objType) for b in barriers.nodes), dtype=bool, count=len(barriers)
+            )
+            barrierNext = barriers.nearest_downstream(isType)
+            first = self.first
+            safe = numpy.maximum(first, 0)
+            reachNext = numpy.where(first < 0, -1, numpy.where(isType[safe], first, barrierNext[safe]))
+            self.pointers[objType] = (barrierNext, reachNext)
+
+        return self.pointers[objType]
+
+
+    def next(self, obj, objType=None):
+        """
+        Returns the nearest barrier of objType (default any Barrier)
+        downstream of a Reach or Barrier, or None if there is none.
+        """
+        from hydrography import Barrier
+
+        if objType is None: objType = Barrier
+        barrierNext, reachNext = self.__pointers__(objType)
+        if obj in self.barriers: j = barrierNext[self.barriers.index[obj]]
+        else: j = reachNext[self.reaches.index[obj]]
+        return None if j < 0 else self.barriers.nodes[j]
+
+
+    def mouth(self, obj):
+        """Returns the mouth Reach of the tributary of a Reach or Barrier."""
+        if obj in self.barriers: return self.reaches.nodes[self.barrierMouth[self.barriers.index[obj]]]
+        return self.reaches.nodes[self.reachMouth[self.reaches.index[obj]]]
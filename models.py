@@ -0,0 +1,223 @@
+# This file contains parameterized passability and cost models that derive
+#   barrier passabilities and removal costs from barrier dimensions, evaluated
+#   over all barriers at once as arrays
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import numpy
+from abc import ABCMeta, abstractmethod
+
+
+# ~~ CURVES ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class Curve(object):
+    """
+    Curve is a function of one barrier dimension, evaluated over an array of
+    values. Undefined values (nan) stay undefined. Sub-classes define
+    evaluate().
+    """
+
+    __metaclass__ = ABCMeta
+
+    def __call__(self, values):
+        values = numpy.asarray(values, dtype=float)
+        result = numpy.full(values.shape, numpy.nan)
+        defined = ~numpy.isnan(values)
+        result[defined] = self.evaluate(values[defined])
+        return result
+
+
+    @abstractmethod
+    def evaluate(self, values):
+        """Returns the curve at an array of defined values."""
+
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%s' % (k, repr(v)) for k, v in sorted(self.__dict__.items())
+        ))
+
+
+
+class Logistic(Curve):
+    """
+    Logistic is a smooth step from ceiling down to floor (for a positive
+    slope) centered on midpoint, e.g. passability falling with culvert drop.
+    """
+
+    def __init__(self, midpoint, slope, floor=0., ceiling=1.):
+        self.midpoint = midpoint
+        self.slope = slope
+        self.floor = floor
+        self.ceiling = ceiling
+
+
+    def evaluate(self, values):
+        z = numpy.clip(self.slope * (values - self.midpoint), -500., 500.)
+        return self.floor + (self.ceiling - self.floor) / (1. + numpy.exp(z))
+
+
+
+class Piecewise(Curve):
+    """
+    Piecewise interpolates linearly between (x, y) points, holding the end
+    values beyond the first and last point.
+    """
+
+    def __init__(self, points):
+        points = sorted(points)
+        self.x = [float(p[0]) for p in points]
+        self.y = [float(p[1]) for p in points]
+
+
+    def evaluate(self, values):
+        return numpy.interp(values, self.x, self.y)
+
+
+
+class Power(Curve):
+    """
+    Power is intercept + scale * value ** exponent, e.g. cost rising with
+    bankfull width or dam height.
+    """
+
+    def __init__(self, scale, exponent=1., intercept=0.):
+        self.scale = scale
+        self.exponent = exponent
+        self.intercept = intercept
+
+
+    def evaluate(self, values):
+        return self.intercept + self.scale * numpy.power(values, self.exponent)
+
+
+
+# ~~ BARRIER MODEL ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class BarrierModel(object):
+    """
+    BarrierModel derives passabilities and costs of one type of Barrier from
+    its dimensional attributes (e.g. RSX drop and bfw, Dam height).
+
+    A guild's passability is the product of its curves over their
+    attributes, clipped to [0, 1], and the cost is the sum of the cost
+    curves. Either is undefined for a barrier when any attribute it uses is
+    undefined, and undefined results are never written.
+
+    INPUTS:
+        barrierType     = class of Barrier the model applies to, e.g.
+            hydrography.RSX. Sub-classes are included.
+
+        passabilities   = (optional) dictionary of guilds to dictionaries of
+            attribute names to Curves. Default is none.
+
+        costs           = (optional) dictionary of attribute names to Curves.
+            Default is none.
+    """
+
+    def __init__(self, barrierType, passabilities=None, costs=None):
+        self.barrierType = barrierType
+        self.passabilities = {} if passabilities is None else passabilities
+        self.costs = {} if costs is None else costs
+
+
+    def attributes(self, barriers):
+        """
+        Returns a dictionary of every attribute used by the model to an array
+        of its values over barriers, with nan where it is undefined.
+        """
+        names = set(self.costs)
+        for guild in self.passabilities: names.update(self.passabilities[guild])
+        values = {}
+        for name in names:
+            values[name] = numpy.array([
+                numpy.nan if b.__dict__.get(name) is None else b.__dict__[name] for b in barriers
+            ], dtype=float)
+
+        return values
+
+
+    def evaluate(self, barriers, attributes=None):
+        """
+        Evaluates the model over barriers, which should all be of the model's
+        barrierType.
+
+        INPUTS:
+            barriers    = sequence of Barriers
+
+            attributes  = (optional) dictionary of attribute arrays as
+                returned by attributes(). Default (None) reads them from
+                barriers.
+
+        OUTPUTS: tuple of (dictionary of guilds to arrays of passabilities,
+            array of costs or None when the model has no cost curves)
+        """
+        if attributes is None: attributes = self.attributes(barriers)
+        n = len(barriers)
+
+        passabilities = {}
+        for guild in self.passabilities:
+            product = numpy.ones(n)
+            for name, curve in self.passabilities[guild].iteritems():
+                product *= curve(attributes[name])
+            passabilities[guild] = numpy.clip(product, 0., 1.)
+
+        cost = None
+        if len(self.costs) > 0:
+            cost = numpy.zeros(n)
+            for name, curve in self.costs.iteritems():
+                cost += curve(attributes[name])
+
+        return passabilities, cost
+
+
+
+# ~~ apply_models() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def apply_models(barriers, models, overwrite=False):
+    """
+    APPLY_MODELS() evaluates BarrierModels over barriers and writes the
+    results into each barrier's passabilities and cost. Each barrier uses the
+    first model whose barrierType it is an instance of.
+
+    INPUT:
+        barriers    = iterable of Barriers
+
+        models      = sequence of BarrierModels
+
+        overwrite   = (optional) whether to replace passabilities and costs
+            that are already defined (True) or only fill in missing ones
+            (False). Default is False.
+
+    OUTPUT: number of barriers changed
+    """
+    barriers = sorted(barriers, key=lambda b: b.id)
+    groups = [[] for model in models]
+    for barrier in barriers:
+        for k, model in enumerate(models):
+            if isinstance(barrier, model.barrierType):
+                groups[k].append(barrier)
+                break
+
+    changed = 0
+    for model, group in zip(models, groups):
+        if len(group) == 0: continue
+        passabilities, cost = model.evaluate(group)
+        guilds = sorted(passabilities)
+        for i, barrier in enumerate(group):
+            updates = {}
+            for guild in guilds:
+                value = passabilities[guild][i]
+                if (value == value) and (overwrite or (barrier.passabilities.get(guild) is None)):
+                    updates[guild] = float(value)
+            updateCost = (cost is not None) and (cost[i] == cost[i]) and (overwrite or (barrier.cost is None))
+
+            if len(updates) > 0:
+                barrier.passabilities.update(updates)
+            if updateCost:
+                barrier.cost = float(cost[i])
+            if (len(updates) > 0) or updateCost:
+                changed += 1
+
+    return changed
@@ -0,0 +1,256 @@
+# This file contains a multi-objective search for barrier removals that
+#   trades off habitat gained for each guild against spending in each country
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import numpy
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# pareto_front()
+OPT_EPS = 0.001 # size of epsilon-dominance boxes as a proportion of the totals
+OPT_BUD = None # spending limit. None is unlimited
+OPT_MAX = 500 # largest number of solutions kept on a front
+OPT_MIN = 1e-6 # first box size when fronts compared with exact values grow too large
+OPT_PRD = 65536 # number of combined solutions generated and pruned at a time
+OPT_BLK = 256 # number of solutions checked for dominance at a time
+
+
+# ~~ pareto_front() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def pareto_front(hydrography, guilds=None, epsilon=OPT_EPS, budget=OPT_BUD, maxSize=OPT_MAX):
+    """
+    PARETO_FRONT() finds the sets of barrier removals that are not dominated
+    when maximizing the accessible habitat gained for each guild and
+    minimizing the spending in each country.
+
+    Fronts are built by dynamic programming over each tributary's barrier
+    tree (see connectivity.BarrierTree), from the most upstream barriers
+    down. A barrier's front combines the fronts of the barriers just
+    upstream of it with the choice to keep or remove it. Dominated
+    solutions are pruned at every barrier, so each subtree is evaluated
+    once rather than once per set of removals. Combinations of two fronts
+    are generated and pruned a block at a time. The fronts of the mouths
+    are then combined across tributaries.
+
+    INPUT:
+        hydrography = Hydrography (or SubNetwork) whose barriers to search
+
+        guilds      = (optional) iterable of guilds to gain habitat for.
+            Default (None) is every guild of the network's barriers.
+
+        epsilon     = (optional) solutions are compared in boxes of epsilon
+            times the total section length (for habitat) or total barrier
+            cost (for spending), so only one solution is kept per box. 0
+            compares exact values. Default is OPT_EPS.
+
+        budget      = (optional) spending limit, either a number for total
+            spending or a dictionary of countries to limits. Default
+            (OPT_BUD) is unlimited.
+
+        maxSize     = (optional) largest number of solutions kept on a
+            front. Whenever a front would be larger, its boxes are doubled
+            in size until it fits. Fronts combined from a coarsened front
+            keep only its solutions, so a small maxSize bounds the
+            resolution of the front returned, not only its size. None keeps
+            every solution, which can take exponential time. Default is
+            OPT_MAX.
+
+    OUTPUT: tuple of (list of (removed barriers, total cost, dictionary of
+        guilds to habitat gains, dictionary of countries to spending) tuples,
+        sorted by total cost, box size). Barriers without a cost are never
+        removed. The box size is the largest that any front was compared in,
+        as a proportion of the totals like epsilon. It is larger than
+        epsilon when fronts were coarsened to fit in maxSize solutions, and
+        the front returned is then only epsilon-approximate for that size.
+    """
+
+    tree = hydrography.barrier_tree()
+    if guilds is None: guilds = tree.guilds()
+    guilds = sorted(guilds)
+    barriers = numpy.flatnonzero(tree.barrier & ~numpy.isnan(tree.cost))
+    countries = sorted(set([tree.nodes[i].country for i in barriers]))
+    column = dict((c, k) for k, c in enumerate(countries))
+
+    # objectives are compared as proportions of the totals, in boxes
+    costs = tree.cost[barriers]
+    scale = (
+        tree.length.sum() if tree.length.sum() > 0 else 1.,
+        costs.sum() if costs.sum() > 0 else 1.
+    )
+    if budget is None:
+        limits = None
+    elif isinstance(budget, dict):
+        limits = (None, numpy.array([budget.get(c, numpy.inf) for c in countries], dtype=float))
+    else:
+        limits = (float(budget), None)
+
+    # keep the largest box size any front had to be coarsened to
+    used = [epsilon]
+    def prune(S, K):
+        chosen, box = __prune__(S, K, scale, epsilon, limits, maxSize)
+        used[0] = max(used[0], box)
+        return chosen
+
+    passability = numpy.array([tree.passability(g) for g in guilds], dtype=float).T
+    children = [[] for i in xrange(len(tree))]
+    for i in xrange(len(tree)):
+        if tree.parent[i] >= 0: children[tree.parent[i]].append(i)
+
+    # build each node's front from upstream to downstream. A front is
+    #   (habitat per guild, spending per country, removal references)
+    fronts = {}
+    empty = (numpy.zeros((1, len(guilds))), numpy.zeros((1, len(countries))), [None])
+    for level, parents, starts in tree.levels:
+        for i in level:
+            front = None
+            for c in children[i]:
+                front = __combine__(front, fronts.pop(c), prune)
+
+            S, K, refs = empty if front is None else front
+            U = tree.length[i] + S
+            if not tree.barrier[i]:
+                fronts[i] = (U, K, refs)
+            elif numpy.isnan(tree.cost[i]):
+                fronts[i] = (U * passability[i], K, refs)
+            else:
+                removed = K.copy()
+                removed[:,column[tree.nodes[i].country]] += tree.cost[i]
+                S = numpy.concatenate((U * passability[i], U))
+                K = numpy.concatenate((K, removed))
+                refs = refs + [(i, r, None) for r in refs]
+                chosen = prune(S, K)
+                fronts[i] = (S[chosen], K[chosen], [refs[k] for k in chosen])
+
+    # combine tributaries
+    front = None
+    for i in tree.roots:
+        front = __combine__(front, fronts[i], prune)
+
+    base = numpy.array([tree.aggregates(g)[0][tree.roots].sum() for g in guilds])
+    S, K, refs = empty if front is None else front
+    solutions = []
+    for k in xrange(len(refs)):
+        solutions.append((
+            frozenset([tree.nodes[i] for i in __removals__(refs[k])]),
+            K[k].sum(),
+            dict(zip(guilds, S[k] - base)),
+            dict(zip(countries, K[k]))
+        ))
+
+    solutions.sort(key=lambda s: (s[1], [-s[2][g] for g in guilds]))
+    return solutions, used[0]
+
+
+def __combine__(A, B, prune):
+    """
+    Returns the pruned front of every pair of solutions from fronts A and B,
+    where None is the front of no barriers. Pairs are generated OPT_PRD at a
+    time and pruned together with the solutions kept so far, so the full
+    product is never held at once. prune() is a function of habitat and
+    spending arrays that returns the indexes of the solutions to keep.
+    """
+    if A is None: return B
+    if B is None: return A
+    SA, KA, refsA = A
+    SB, KB, refsB = B
+    S = numpy.zeros((0, SA.shape[1]))
+    K = numpy.zeros((0, KA.shape[1]))
+    refs = []
+    step = max(1, OPT_PRD // len(refsB))
+    for start in xrange(0, len(refsA), step):
+        a = slice(start, start + step)
+        n = len(refs)
+        S = numpy.concatenate((S, (SA[a,None,:] + SB[None,:,:]).reshape((-1, SA.shape[1]))))
+        K = numpy.concatenate((K, (KA[a,None,:] + KB[None,:,:]).reshape((-1, KA.shape[1]))))
+        chosen = prune(S, K)
+        refs = [
+            refs[k] if k < n else (-1, refsA[start + (k - n) // len(refsB)], refsB[(k - n) % len(refsB)])
+            for k in chosen.tolist()
+        ]
+        S, K = S[chosen], K[chosen]
+
+    return S, K, refs
+
+
+def __prune__(S, K, scale, box, limits, maxSize):
+    """
+    Finds the solutions of a front that are within the spending limits and
+    not epsilon-dominated, keeping the best solution of each box.
+
+    OUTPUTS: tuple of (array of indexes of the solutions kept, box size,
+        which is larger than box when the front had to be coarsened to fit
+        in maxSize solutions)
+    """
+    rows = numpy.arange(len(S))
+    if limits is not None:
+        total, byCountry = limits
+        keep = numpy.ones(len(S), dtype=bool)
+        if total is not None: keep &= K.sum(axis=1) <= total * (1 + 1e-12)
+        if byCountry is not None: keep &= (K <= byCountry * (1 + 1e-12)).all(axis=1)
+        rows = rows[keep]
+    if len(rows) == 0: return rows, box
+
+    # objectives to minimize, best first
+    G = numpy.concatenate((-S[rows] / scale[0], K[rows] / scale[1]), axis=1)
+    order = numpy.argsort(G.sum(axis=1), kind='mergesort')
+    rows, G = rows[order], G[order]
+
+    while True:
+
+        # keep the best solution of each box, comparing boxes in order of
+        #   their sums with ties broken by their columns
+        F = numpy.floor(G / box) if box > 0 else G
+        first = numpy.unique(F, axis=0, return_index=True)[1]
+        boxes = F[first]
+        first = first[numpy.lexsort([boxes[:,c] for c in xrange(boxes.shape[1] - 1, -1, -1)] + [boxes.sum(axis=1)])]
+
+        # coarsen the boxes while too many solutions are left
+        kept = __nondominated__(F[first], maxSize)
+        if kept is not None: return rows[first[kept]], box
+        box = 2 * box if box > 0 else OPT_MIN
+
+
+def __nondominated__(F, limit=None):
+    """
+    Returns the indexes of the distinct rows of F, sorted by their sums and
+    then their columns, that no other row is smaller than or equal to in
+    every column, or None as soon as more than limit rows are found.
+    """
+    keep = numpy.zeros(len(F), dtype=bool)
+    kept = F[:0]
+    for start in xrange(0, len(F), OPT_BLK):
+        block = F[start:start+OPT_BLK]
+
+        # a row can only be dominated by rows that come before it, and it is
+        #   also dominated by a kept row whenever it is dominated by a
+        #   dropped one
+        dominated = (block[:,None,:] >= block[None,:,:]).all(axis=2)
+        numpy.fill_diagonal(dominated, False)
+        dominated = dominated.any(axis=1)
+        if len(kept) > 0:
+            dominated |= (block[:,None,:] >= kept[None,:,:]).all(axis=2).any(axis=1)
+        keep[start:start+OPT_BLK] = ~dominated
+        kept = numpy.concatenate((kept, block[~dominated]))
+        if (limit is not None) and (len(kept) > limit): return None
+
+    return numpy.flatnonzero(keep)
+
+
+def __removals__(ref):
+    """Returns the node indexes of the removals referenced by ref."""
+    removals = []
+    stack = [ref]
+    while len(stack) > 0:
+        ref = stack.pop()
+        if ref is None: continue
+        i, a, b = ref
+        if i >= 0: removals.append(i)
+        stack.append(a)
+        stack.append(b)
+
+    return removals
@@ -0,0 +1,388 @@
+# This file contains the command-line batch runner that loads a hydrography
+#   network, evaluates scenarios and exports tables as configured in a JSON
+#   file, caching stage outputs and resuming interrupted scenario sweeps
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import os, json, time, hashlib, threading
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# run()
+RUN_STG_LOD = 'load'
+RUN_STG_BLD = 'build'
+RUN_STG_SCN = 'scenarios'
+RUN_STG_RNK = 'rank'
+RUN_STG_EXP = 'export'
+RUN_STG_ALL = (RUN_STG_LOD, RUN_STG_BLD, RUN_STG_SCN, RUN_STG_RNK, RUN_STG_EXP)
+RUN_CCH_DIR = 'cache' # default stage cache directory, relative to the config
+RUN_CHK_NUM = 100 # number of scenario results written between flushes
+RUN_NUM_WRK = 2 # number of independent stages run at the same time
+
+
+# ~~ run() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def run(config, stages=None, resume=True, verbose=True):
+    """
+    RUN() runs the stages of a batch job. The load stage reads the formatted
+    data (from the database, or from a cached or given pickle file), the
+    build stage creates the Hydrography (or reads it from the cache), and
+    the scenarios, rank and export stages use the built network
+    independently of each other, so they run at the same time.
+
+    INPUT:
+        config      = dictionary of the job configuration (see load_config()).
+            Keys are:
+
+            database: path to the mdb database to load with
+                load_data.load_hydro_mdb()
+            data: path to a pickle file of already formatted data to use
+                instead of database
+            load: dictionary of options for load_hydro_mdb()
+            hydrography: dictionary of keyword arguments for Hydrography
+            cache: directory for cached stage outputs. Default is
+                RUN_CCH_DIR.
+            workers: number of independent stages run at the same time.
+                Default is RUN_NUM_WRK.
+            scenarios: dictionary with keys "guilds" (list of guilds),
+                "output" (JSON lines file of results) and either "sets" (list
+                of scenarios) or "file" (JSON lines file of scenarios), and
+                optionally "cache" (whether to reuse results of scenarios
+                evaluated before on the same network, kept in the cache
+                directory; default is true). Each scenario is a dictionary
+                with a "name" and optional "removed" (list of barrier IDs),
+                "passabilities" (barrier IDs to guilds to passabilities) and
+                "costs" (barrier IDs to costs).
+            rank: dictionary with keys "guilds" (optional list of guilds)
+                and "output" (JSON file of Hydrography.rank_removals())
+            export: dictionary of keyword arguments for Hydrography.export()
+
+        stages      = (optional) iterable of stages to run. Stages the given
+            stages need are run too. Default (None) is every configured stage.
+
+        resume      = (optional) whether to skip scenarios that already have
+            results in the scenario output file (True). Default is True.
+
+        verbose     = (optional) whether to print the progress and time of
+            each stage (True). Default is True.
+
+    OUTPUT: dictionary of stage names to their outputs
+    """
+    from multiprocessing.pool import ThreadPool
+
+    if stages is None:
+        stages = [s for s in RUN_STG_ALL if (s in config) or (s in (RUN_STG_LOD, RUN_STG_BLD))]
+
+    lock = threading.Lock()
+    def log(message):
+        if verbose:
+            with lock: print message
+
+    def timed(name, function, *args):
+        log('Starting %s' % name)
+        start = time.time()
+        result = function(*args)
+        log('Finished %s in %.1f s' % (name, time.time() - start))
+        return result
+
+    outputs = {}
+    outputs[RUN_STG_LOD] = timed(RUN_STG_LOD, __load__, config, log)
+    outputs[RUN_STG_BLD] = timed(RUN_STG_BLD, __build__, config, outputs[RUN_STG_LOD], log)
+
+    # stages that only need the network
+    functions = {RUN_STG_SCN: __scenarios__, RUN_STG_RNK: __rank__, RUN_STG_EXP: __export__}
+    independent = [s for s in RUN_STG_ALL if (s in stages) and (s in functions)]
+    for stage in independent:
+        if stage not in config:
+            raise ValueError('Stage %s is not configured.' % stage)
+
+    # build shared caches before stages use them from different threads
+    hydrography = outputs[RUN_STG_BLD]
+    if (RUN_STG_SCN in independent) or (RUN_STG_RNK in independent):
+        hydrography.barrier_tree()
+
+    workers = min(config.get('workers', RUN_NUM_WRK), max(len(independent), 1))
+    pool = ThreadPool(workers)
+    try:
+        results = [
+            (s, pool.apply_async(timed, (s, functions[s], config, hydrography, resume, log)))
+            for s in independent
+        ]
+        for stage, result in results:
+            outputs[stage] = result.get()
+    finally:
+        pool.close()
+        pool.join()
+
+    return outputs
+
+
+
+# ~~ load_config() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def load_config(path):
+    """
+    LOAD_CONFIG() reads a JSON job configuration (see run()). Relative paths
+    in the configuration are taken from the configuration file's directory.
+
+    INPUT:
+        path        = path to the JSON configuration file
+
+    OUTPUT: configuration dictionary
+    """
+    f = open(path)
+    try:
+        config = json.load(f)
+    finally:
+        f.close()
+
+    root = os.path.dirname(os.path.abspath(path))
+    def resolve(value):
+        return value if os.path.isabs(value) else os.path.join(root, value)
+
+    for key in ('database', 'data'):
+        if key in config: config[key] = resolve(config[key])
+    config['cache'] = resolve(config.get('cache', RUN_CCH_DIR))
+    for stage in (RUN_STG_SCN, RUN_STG_RNK):
+        for key in ('output', 'file'):
+            if key in config.get(stage, {}):
+                config[stage][key] = resolve(config[stage][key])
+    if 'path' in config.get(RUN_STG_EXP, {}):
+        config[RUN_STG_EXP]['path'] = resolve(config[RUN_STG_EXP]['path'])
+
+    return config
+
+
+
+# ~~ STAGES ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def __load__(config, log):
+    """
+    Returns the formatted data, reading it from the stage cache when the
+    database and load options have not changed since it was cached.
+    """
+    import cPickle
+
+    if 'data' in config:
+        return __read_pickle__(config['data'])
+
+    cachePath = os.path.join(
+        config.get('cache', RUN_CCH_DIR), 'load-%s.pickle' % __load_key__(config)
+    )
+    if os.path.isfile(cachePath):
+        log('Using cached data %s' % cachePath)
+        return __read_pickle__(cachePath)
+
+    from load_data import load_hydro_mdb
+    options = config.get('load', {})
+    data = load_hydro_mdb(config['database'], **dict((str(k), options[k]) for k in options))
+    __write_atomic__(cachePath, lambda f: cPickle.dump(data, f, cPickle.HIGHEST_PROTOCOL))
+    return data
+
+
+def __load_key__(config):
+    """
+    Returns the cache key of the load stage: a hash of the path, size and
+    modification time of the data pickle or database, and the load options.
+    """
+    if 'data' in config:
+        source, options = config['data'], None
+    elif 'database' in config:
+        source, options = config['database'], config.get('load', {})
+    else:
+        raise ValueError('Either database or data must be configured.')
+
+    stat = os.stat(source)
+    return hashlib.sha1(json.dumps(
+        [os.path.abspath(source), stat.st_size, stat.st_mtime, options], sort_keys=True
+    )).hexdigest()
+
+
+def __build__(config, data, log):
+    """
+    Returns the Hydrography of the formatted data, reading it from the stage
+    cache when the loaded data and Hydrography options have not changed
+    since it was cached.
+    """
+    import cPickle
+
+    options = config.get('hydrography', {})
+    key = hashlib.sha1(json.dumps([__load_key__(config), options], sort_keys=True)).hexdigest()
+    cachePath = os.path.join(config.get('cache', RUN_CCH_DIR), 'build-%s.pickle' % key)
+    if os.path.isfile(cachePath):
+        log('Using cached network %s' % cachePath)
+        return __read_pickle__(cachePath)
+
+    from hydrography import Hydrography
+    hydrography = Hydrography(data, **dict((str(k), options[k]) for k in options))
+    __write_atomic__(cachePath, lambda f: cPickle.dump(hydrography, f, cPickle.HIGHEST_PROTOCOL))
+    return hydrography
+
+
+def __scenarios__(config, hydrography, resume, log):
+    """
+    Evaluates each configured scenario, appending one JSON line of results
+    per scenario to the output file. Scenarios with results already in the
+    file are skipped when resuming.
+    """
+    from hydrography import Barrier
+    settings = config[RUN_STG_SCN]
+    output = settings['output']
+    guilds = settings.get('guilds')
+    if guilds is None: guilds = sorted(hydrography.barrier_tree().guilds())
+
+    # scenarios already evaluated
+    done = set()
+    if resume and os.path.isfile(output):
+        __truncate_partial__(output)
+        f = open(output)
+        try:
+            for line in f: done.add(json.loads(line)['name'])
+        finally:
+            f.close()
+    elif os.path.isfile(output):
+        os.remove(output)
+
+    directory = os.path.dirname(os.path.abspath(output))
+    if not os.path.isdir(directory): os.makedirs(directory)
+
+    def barrier(bid): return hydrography.get_object(Barrier, bid)
+
+    # results of scenarios evaluated by earlier jobs on the same network
+    from cache import ScenarioCache
+    directory = None
+    if settings.get('cache', True):
+        directory = os.path.join(config.get('cache', RUN_CCH_DIR), RUN_STG_SCN)
+    cache = ScenarioCache(directory)
+
+    count = 0
+    f = open(output, 'a')
+    try:
+        for definition in __scenario_definitions__(settings):
+            name = definition['name']
+            if name in done: continue
+            result = cache.evaluate(
+                hydrography,
+                removed=[barrier(b) for b in definition.get('removed', ())],
+                passabilities=dict(
+                    (barrier(b), v) for b, v in definition.get('passabilities', {}).items()
+                ),
+                costs=dict((barrier(b), v) for b, v in definition.get('costs', {}).items()),
+                guilds=guilds
+            )
+            f.write(json.dumps(dict(result, name=name), sort_keys=True) + '\n')
+            done.add(name)
+            count += 1
+            if count % RUN_CHK_NUM == 0:
+                f.flush()
+                os.fsync(f.fileno())
+                log('Evaluated %i scenarios' % count)
+    finally:
+        f.close()
+
+    return output
+
+
+def __scenario_definitions__(settings):
+    """Yields the scenario definitions of the scenarios stage settings."""
+    if 'file' in settings:
+        f = open(settings['file'])
+        try:
+            for line in f:
+                if line.strip(): yield json.loads(line)
+        finally:
+            f.close()
+    else:
+        for definition in settings.get('sets', ()):
+            yield definition
+
+
+def __rank__(config, hydrography, resume, log):
+    """Writes the barrier removal ranking of each guild to a JSON file."""
+    settings = config[RUN_STG_RNK]
+    output = settings['output']
+    ranks = hydrography.rank_removals(settings.get('guilds'))
+    table = dict((g, [
+        {'id': b.id, 'gain': gain, 'cost': cost, 'score': score}
+        for b, gain, cost, score in ranks[g]
+    ]) for g in ranks)
+    __write_atomic__(output, lambda f: json.dump(table, f, sort_keys=True))
+    return output
+
+
+def __export__(config, hydrography, resume, log):
+    """Exports the network's tables. See Hydrography.export()."""
+    options = config[RUN_STG_EXP]
+    return hydrography.export(**dict((str(k), options[k]) for k in options))
+
+
+
+# ~~ FILES ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def __read_pickle__(path):
+    import cPickle
+    f = open(path, 'rb')
+    try:
+        return cPickle.load(f)
+    finally:
+        f.close()
+
+
+def __write_atomic__(path, write):
+    """
+    Writes a file by calling write on a temporary file that replaces path
+    only once it is complete, so failures never leave partial outputs.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory): os.makedirs(directory)
+    temporary = '%s.%i.tmp' % (path, os.getpid())
+    f = open(temporary, 'wb')
+    try:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+    if os.path.exists(path): os.remove(path)
+    os.rename(temporary, path)
+
+
+def __truncate_partial__(path):
+    """Removes a partly written last line from a JSON lines file."""
+    f = open(path, 'rb+')
+    try:
+        content = f.read()
+        end = content.rfind('\n') + 1
+        if end < len(content):
+            f.seek(end)
+            f.truncate()
+    finally:
+        f.close()
+
+
+
+# ~~ main() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def main(arguments=None):
+    """MAIN() runs a batch job from command line arguments."""
+    import argparse
+    parser = argparse.ArgumentParser(description='Runs a hydrography batch job.')
+    parser.add_argument('config', help='path to the JSON job configuration')
+    parser.add_argument(
+        '--stages', nargs='+', choices=RUN_STG_ALL,
+        help='stages to run. Default is every configured stage.'
+    )
+    parser.add_argument(
+        '--restart', action='store_true',
+        help='evaluate all scenarios again instead of resuming'
+    )
+    parser.add_argument('--quiet', action='store_true', help='do not print progress')
+    arguments = parser.parse_args(arguments)
+
+    config = load_config(arguments.config)
+    run(config, arguments.stages, not arguments.restart, not arguments.quiet)
+
+
+
+if __name__ == '__main__':
+    main()
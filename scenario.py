@@ -0,0 +1,223 @@
+# This file contains copy-on-write scenario overlays that change barrier
+#   passabilities, costs or presence on top of a shared hydrography network
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+
+# ~~ SCENARIO ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class Scenario(object):
+    """
+    Scenario is a layer of barrier changes over a base Hydrography (or another
+    Scenario). It stores only its differences from the base: barriers that are
+    removed, and overridden passabilities and costs. The base network is never
+    modified, so any number of scenarios can share one network.
+
+    Barrier attributes, tracing and accessible habitat read through the
+    scenario. Habitat is evaluated from the base network's cached barrier
+    tree aggregates, recomputing only the nodes downstream of changed
+    barriers.
+    """
+
+    def __init__(self, base, removed=(), passabilities=None, costs=None):
+        """
+        INPUTS:
+            base        = Hydrography or Scenario to lay the scenario over
+
+            removed     = (optional) iterable of barriers to remove, which
+                makes them fully passable. Default is none.
+
+            passabilities = (optional) dictionary of barriers to dictionaries
+                of guilds to overriding passabilities. Default is none.
+
+            costs       = (optional) dictionary of barriers to overriding
+                costs. Default is none.
+        """
+        self.base = base
+        self.removed = set()
+        self.passabilities = {}
+        self.costs = {}
+        self.remove(removed)
+        if passabilities is not None:
+            for barrier in passabilities:
+                for guild in passabilities[barrier]:
+                    self.set_passability(barrier, guild, passabilities[barrier][guild])
+        if costs is not None:
+            for barrier in costs: self.set_cost(barrier, costs[barrier])
+
+
+    def __repr__(self):
+        return 'Scenario with %i removed and %i changed barriers' % (
+            len(self.removed), len(set(self.passabilities).union(self.costs))
+        )
+
+
+    @property
+    def network(self):
+        """The Hydrography at the bottom of the scenario's layers."""
+        if isinstance(self.base, Scenario): return self.base.network
+        return self.base
+
+
+    # ~~ CHANGES ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def remove(self, barriers):
+        """Removes barriers in the scenario."""
+        self.removed.update(barriers)
+
+
+    def restore(self, barriers):
+        """Undoes removing barriers in the scenario."""
+        self.removed.difference_update(barriers)
+
+
+    def set_passability(self, barrier, guild, value):
+        """Overrides the passability of a barrier for a guild."""
+        if (value < 0) or (value > 1):
+            raise ValueError('passabilities must be between 0 and 1.')
+        self.passabilities.setdefault(barrier, {})[guild] = value
+
+
+    def set_cost(self, barrier, value):
+        """Overrides the cost of a barrier."""
+        self.costs[barrier] = value
+
+
+    def changes(self):
+        """
+        Returns the scenario's differences from the network, merged through
+        every layer, as a tuple of (removed set, passabilities dictionary,
+        costs dictionary).
+        """
+        if isinstance(self.base, Scenario):
+            removed, passabilities, costs = self.base.changes()
+        else:
+            removed, passabilities, costs = set(), {}, {}
+
+        removed.update(self.removed)
+        for barrier in self.passabilities:
+            passabilities[barrier] = dict(passabilities.get(barrier, {}))
+            passabilities[barrier].update(self.passabilities[barrier])
+        costs.update(self.costs)
+        return removed, passabilities, costs
+
+
+    # ~~ READ-THROUGH ATTRIBUTES ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def present(self, barrier):
+        """Returns True if the barrier has not been removed in the scenario."""
+        if barrier in self.removed: return False
+        if isinstance(self.base, Scenario): return self.base.present(barrier)
+        return True
+
+
+    def passability(self, barrier, guild):
+        """Returns the passability of a barrier for a guild in the scenario."""
+        if not self.present(barrier): return 1.
+        if (barrier in self.passabilities) and (guild in self.passabilities[barrier]):
+            return self.passabilities[barrier][guild]
+        if isinstance(self.base, Scenario): return self.base.passability(barrier, guild)
+        return barrier.passabilities.get(guild)
+
+
+    def cost(self, barrier):
+        """Returns the cost of a barrier in the scenario."""
+        if barrier in self.costs: return self.costs[barrier]
+        if isinstance(self.base, Scenario): return self.base.cost(barrier)
+        return barrier.cost
+
+
+    def removal_cost(self):
+        """Returns the total cost of the barriers removed in the scenario."""
+        removed = self.changes()[0]
+        return sum([self.cost(b) for b in removed if self.cost(b) is not None])
+
+
+    # ~~ TRACING ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def get_barriers(self):
+        """Returns the set of barriers present in the scenario."""
+        return set([b for b in self.network.get_barriers() if self.present(b)])
+
+
+    def trace_up(self, startingObject, levels=None, filters=None):
+        """
+        See Tributary.trace_up(), leaving out barriers removed in the
+        scenario.
+        """
+        upstream = startingObject.tributary.trace_up(startingObject, levels, filters)
+        return set([obj for obj in upstream if (not hasattr(obj, 'passabilities')) or self.present(obj)])
+
+
+    def trace_down(self, startingObject, levels=None, filters=None, types=None):
+        """
+        See OrderedObject.trace_down(), leaving out barriers removed in the
+        scenario.
+        """
+        downstream = startingObject.trace_down(levels, filters, types)
+        return [obj for obj in downstream if (not hasattr(obj, 'passabilities')) or self.present(obj)]
+
+
+    # ~~ HABITAT ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+    def habitat(self, guild):
+        """
+        Calculates each tributary's habitat accessible from its mouth for a
+        guild in the scenario. See connectivity.BarrierTree.
+
+        Only nodes downstream of changed barriers are recomputed; all other
+        subtrees use the base network's cached aggregates.
+
+        OUTPUTS: dictionary of Tributaries to accessible habitat
+        """
+        from connectivity import BTR_DPS
+
+        tree = self.network.barrier_tree()
+        S, C = tree.aggregates(guild)
+        base = tree.passability(guild)
+        parent = tree.parent
+
+        # new passabilities of changed nodes
+        removed, passabilities = self.changes()[:2]
+        changed = {}
+        for barrier in removed:
+            if barrier in tree.index: changed[tree.index[barrier]] = 1.
+        for barrier in passabilities:
+            if (barrier in tree.index) and (barrier not in removed) and (guild in passabilities[barrier]):
+                value = passabilities[barrier][guild]
+                changed[tree.index[barrier]] = BTR_DPS if value is None else value
+
+        # nodes whose subtree includes a changed node
+        depth = {}
+        for i in changed:
+            while (i >= 0) and (i not in depth):
+                depth[i] = tree.depth[i]
+                i = parent[i]
+
+        # recompute affected nodes from upstream to downstream, passing the
+        #   change in each node's S down to its parent
+        upDelta = {}
+        habitat = dict((tree.nodes[i], S[i]) for i in tree.roots)
+        for i in sorted(depth, key=lambda i: (-depth[i], i)):
+            p = changed.get(i, base[i])
+            newS = p * (tree.length[i] + C[i] + upDelta.get(i, 0.))
+            if parent[i] >= 0:
+                upDelta[parent[i]] = upDelta.get(parent[i], 0.) + newS - S[i]
+            else:
+                habitat[tree.nodes[i]] = newS
+
+        return habitat
+
+
+    def total_habitat(self, guild):
+        """Returns the total accessible habitat for a guild in the scenario."""
+        habitat = self.habitat(guild)
+        return sum([habitat[t] for t in sorted(habitat, key=lambda t: t.id)])
+
+
+    def gain(self, guild):
+        """
+        Returns the scenario's total accessible habitat for a guild minus the
+        base network's.
+        """
+        habitat = self.network.barrier_tree().habitat(guild)
+        return self.total_habitat(guild) - sum([habitat[t] for t in sorted(habitat, key=lambda t: t.id)])
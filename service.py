@@ -0,0 +1,388 @@
+# This file contains a local HTTP query service that keeps built hydrography
+#   networks in memory and answers batches of tracing, aggregation, lookup
+#   and scenario queries from concurrent clients
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import json, threading, Queue
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# QueryServer
+SRV_HST = '127.0.0.1' # address to serve on. The default only accepts local clients
+SRV_PRT = 8150
+SRV_WIN = 0.005 # seconds to wait for more requests to join a batch
+SRV_MXB = 1000 # largest number of queries evaluated in one batch
+SRV_TMO = 60. # seconds a client waits for its results
+
+# query()
+SRV_PTH_QRY = '/query'
+SRV_PTH_NET = '/networks'
+
+
+# ~~ QUERY BATCHER ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class QueryBatcher(object):
+    """
+    QueryBatcher evaluates queries from many request threads in batches on a
+    single worker thread. Requests arriving within SRV_WIN seconds of each
+    other are evaluated together, identical queries in a batch are evaluated
+    once, and networks are only ever used from the worker thread, so their
+    lazily created lakes and cached indexes need no locking. Scenario
+    results are also kept between batches in a cache.ScenarioCache.
+    """
+
+    def __init__(self, networks, window=SRV_WIN, maxBatch=SRV_MXB):
+        """
+        INPUTS:
+            networks    = dictionary of names to Hydrography networks
+
+            window      = (optional) seconds to wait for more requests to join
+                a batch. Default is SRV_WIN.
+
+            maxBatch    = (optional) largest number of queries in a batch.
+                Default is SRV_MXB.
+        """
+        from cache import ScenarioCache
+        self.networks = networks
+        self.cache = ScenarioCache()
+        self.window = window
+        self.maxBatch = maxBatch
+        self.queue = Queue.Queue()
+        self.worker = threading.Thread(target=self.__work__)
+        self.worker.daemon = True
+        self.worker.start()
+
+
+    def submit(self, network, queries, timeout=SRV_TMO):
+        """
+        Queues queries on a network and waits for their results. See
+        evaluate() for the form of queries and results.
+        """
+        if not isinstance(network, basestring):
+            raise TypeError('The network must be a name.')
+        if (not isinstance(queries, list)) or not all([isinstance(q, dict) for q in queries]):
+            raise TypeError('Queries must be a list of dictionaries.')
+        request = {'network': network, 'queries': queries, 'results': None, 'done': threading.Event()}
+        self.queue.put(request)
+        if not request['done'].wait(timeout):
+            raise RuntimeError('Timed out waiting for query results.')
+        return request['results']
+
+
+    def stop(self):
+        """Stops the worker thread once queued requests are answered."""
+        self.queue.put(None)
+        self.worker.join()
+
+
+    def __work__(self):
+        import time
+        while True:
+            request = self.queue.get()
+            if request is None: return
+
+            # collect requests arriving during the batch window
+            batch = [request]
+            size = len(request['queries'])
+            end = time.time() + self.window
+            while size < self.maxBatch:
+                try:
+                    request = self.queue.get(timeout=max(end - time.time(), 0))
+                except Queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)
+                    break
+                batch.append(request)
+                size += len(request['queries'])
+
+            # evaluate each distinct query once. A request that fails is
+            #   answered with the error so the worker keeps serving
+            answers = {}
+            for request in batch:
+                try:
+                    results = []
+                    for query in request['queries']:
+                        key = (request['network'], json.dumps(query, sort_keys=True))
+                        if key not in answers:
+                            answers[key] = self.evaluate(request['network'], query)
+                        results.append(answers[key])
+                    request['results'] = results
+                except Exception as e:
+                    error = {'error': '%s: %s' % (e.__class__.__name__, str(e))}
+                    request['results'] = [error for query in request['queries']]
+                finally:
+                    request['done'].set()
+
+
+    def evaluate(self, network, query):
+        """
+        Evaluates one query on a network.
+
+        INPUTS:
+            network     = name of the network
+
+            query       = dictionary with an "op" and its arguments:
+
+                get: "type" and "id". Returns the object's attributes.
+                trace_up, trace_down: "type", "id" and optional "levels".
+                    Returns the IDs of objects of the same kind (barriers,
+                    reaches or catchments) up- or downstream of the object
+                    in its tributary.
+                length_up, length_down, area_up, area_down: "type", "id" and
+                    optional "levels". Returns the total length (of a reach)
+                    or area (of a catchment) up- or downstream in its
+                    tributary.
+                length_all, area_all: "type" and "id" of a Catchment,
+                    Tributary or Lake, or no "id" for the whole network.
+                scenario: optional "removed" (barrier IDs), "passabilities"
+                    (barrier IDs to guilds to passabilities), "costs"
+                    (barrier IDs to costs) and "guilds". Returns the removal
+                    cost and habitat gain for each guild.
+
+        OUTPUTS: dictionary with a "result", or an "error" message
+        """
+        from hydrography import Barrier, Reach, Catchment
+        try:
+            if network not in self.networks:
+                raise KeyError('Unknown network: %s' % network)
+            hydrography = self.networks[network]
+            op = query.get('op')
+
+            if op == 'scenario':
+                def barrier(bid): return hydrography.get_object(Barrier, bid)
+                return {'result': self.cache.evaluate(
+                    hydrography,
+                    removed=[barrier(b) for b in query.get('removed', ())],
+                    passabilities=dict(
+                        (barrier(b), v) for b, v in query.get('passabilities', {}).items()
+                    ),
+                    costs=dict((barrier(b), v) for b, v in query.get('costs', {}).items()),
+                    guilds=query.get('guilds')
+                )}
+
+            if op in ('length_all', 'area_all') and (query.get('id') is None):
+                return {'result': getattr(self, '__%s__' % op)(hydrography)}
+
+            obj = hydrography.get_object(__object_type__(query.get('type')), query.get('id'))
+            levels = query.get('levels')
+            if op == 'get':
+                result = __describe__(obj)
+            elif op == 'trace_up':
+                result = sorted([o.id for o in obj.tributary.trace_up(obj, levels)])
+            elif op == 'trace_down':
+                kinds = [k for k in (Barrier, Reach, Catchment) if isinstance(obj, k)]
+                result = [o.id for o in obj.trace_down(levels, types=(kinds or [type(obj)])[0])]
+            elif op in ('length_up', 'length_down', 'area_up', 'area_down'):
+                result = getattr(obj.tributary, op)(obj, levels)
+            elif op in ('length_all', 'area_all'):
+                result = getattr(obj, op)()
+            else:
+                raise ValueError('Unknown op: %s' % op)
+
+            return {'result': result}
+
+        except Exception as e:
+            return {'error': '%s: %s' % (e.__class__.__name__, str(e))}
+
+
+    @staticmethod
+    def __length_all__(hydrography):
+        return sum([lake.length_all() for lake in hydrography.get_lakes()])
+
+
+    @staticmethod
+    def __area_all__(hydrography):
+        return sum([lake.area_all() for lake in hydrography.get_lakes()])
+
+
+def __object_type__(name):
+    """Returns the hydrography class of a type name."""
+    import hydrography
+    types = {
+        'Barrier': hydrography.Barrier, 'Reach': hydrography.Reach,
+        'Catchment': hydrography.Catchment, 'Tributary': hydrography.Tributary,
+        'Lake': hydrography.Lake
+    }
+    if name not in types: raise TypeError('Unknown type: %s' % name)
+    return types[name]
+
+
+def __describe__(obj):
+    """Returns the JSON-compatible attributes of an object."""
+    description = {'type': obj.__class__.__name__}
+    for k, v in obj.__dict__.items():
+        if hasattr(v, 'id') and not isinstance(v, (list, set, dict)):
+            v = v.id
+        if isinstance(v, (basestring, int, long, float, bool, type(None))):
+            description[k] = v
+        elif isinstance(v, dict) and all([isinstance(x, (int, long, float, type(None))) for x in v.values()]):
+            description[k] = v
+    return description
+
+
+
+# ~~ QUERY SERVER ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class QueryServer(ThreadingMixIn, HTTPServer):
+    """
+    QueryServer serves queries on resident networks over HTTP, one thread per
+    client connection, with queries evaluated by a shared QueryBatcher.
+
+    POST SRV_PTH_QRY with a JSON body of {"network": name, "queries": [...]}
+    returns {"results": [...]} (see QueryBatcher.evaluate()). GET
+    SRV_PTH_NET returns the names of the networks.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, networks, host=SRV_HST, port=SRV_PRT, window=SRV_WIN):
+        """
+        INPUTS:
+            networks    = dictionary of names to Hydrography networks
+
+            host        = (optional) address to serve on. Default is SRV_HST.
+
+            port        = (optional) port to serve on. 0 picks a free port.
+                Default is SRV_PRT.
+
+            window      = (optional) see QueryBatcher
+        """
+        HTTPServer.__init__(self, (host, port), QueryHandler)
+        self.networks = networks
+        self.batcher = QueryBatcher(networks, window)
+
+
+    def start(self):
+        """Serves in a background thread and returns the thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+    def stop(self):
+        """Stops serving and closes the server."""
+        self.shutdown()
+        self.server_close()
+        self.batcher.stop()
+
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Handles HTTP requests to a QueryServer."""
+
+    def do_GET(self):
+        if self.path != SRV_PTH_NET:
+            return self.__respond__(404, {'error': 'Unknown path: %s' % self.path})
+        self.__respond__(200, {'networks': sorted(self.server.networks)})
+
+
+    def do_POST(self):
+        if self.path != SRV_PTH_QRY:
+            return self.__respond__(404, {'error': 'Unknown path: %s' % self.path})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.getheader('content-length', 0))))
+            network, queries = body['network'], body['queries']
+            if not isinstance(network, basestring): raise TypeError
+            if not isinstance(queries, list): raise TypeError
+            if not all([isinstance(q, dict) for q in queries]): raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return self.__respond__(400, {'error': 'Requests need a network and a list of queries.'})
+        try:
+            results = self.server.batcher.submit(network, queries)
+        except RuntimeError as e:
+            return self.__respond__(503, {'error': str(e)})
+        self.__respond__(200, {'results': results})
+
+
+    def __respond__(self, status, content):
+        body = json.dumps(content)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+
+# ~~ query() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def query(network, queries, host=SRV_HST, port=SRV_PRT, timeout=SRV_TMO):
+    """
+    QUERY() sends a batch of queries to a running QueryServer.
+
+    INPUT:
+        network     = name of the network to query
+
+        queries     = list of query dictionaries (see QueryBatcher.evaluate())
+
+        host, port  = (optional) address of the server. Defaults are SRV_HST
+            and SRV_PRT.
+
+        timeout     = (optional) seconds to wait for results. Default is
+            SRV_TMO.
+
+    OUTPUT: list of result dictionaries, one per query
+    """
+    import urllib2
+    request = urllib2.Request(
+        'http://%s:%i%s' % (host, port, SRV_PTH_QRY),
+        json.dumps({'network': network, 'queries': queries}),
+        {'Content-Type': 'application/json'}
+    )
+    response = urllib2.urlopen(request, timeout=timeout)
+    try:
+        return json.loads(response.read())['results']
+    finally:
+        response.close()
+
+
+
+# ~~ main() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def main(arguments=None):
+    """
+    MAIN() builds networks from batch job configurations (see
+    runner.load_config()) and serves them until interrupted.
+    """
+    import argparse, os
+    from runner import load_config, run
+    parser = argparse.ArgumentParser(description='Serves queries on hydrography networks.')
+    parser.add_argument(
+        'configs', nargs='+',
+        help='JSON job configurations of networks to serve, as name=path or path'
+    )
+    parser.add_argument('--host', default=SRV_HST, help='address to serve on')
+    parser.add_argument('--port', type=int, default=SRV_PRT, help='port to serve on')
+    arguments = parser.parse_args(arguments)
+
+    networks = {}
+    for config in arguments.configs:
+        if '=' in config: name, path = config.split('=', 1)
+        else: name, path = os.path.splitext(os.path.basename(config))[0], config
+        networks[name] = run(load_config(path), stages=[], verbose=False)['build']
+
+    server = QueryServer(networks, arguments.host, arguments.port)
+    print 'Serving %s on %s:%i' % (', '.join(sorted(networks)), arguments.host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.stop()
+
+
+
+if __name__ == '__main__':
+    main()
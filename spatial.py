@@ -0,0 +1,155 @@
+# This file contains an in-memory spatial index of reach geometries for
+#   snapping point locations (e.g. field-surveyed barriers) onto reaches
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+import math
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# ReachGrid
+GRD_CEL = None # grid cell size. None sizes cells from the mean segment length
+GRD_MXD = None # maximum snapping distance. None is unlimited
+
+
+# ~~ REACH GRID ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class ReachGrid(object):
+    """
+    ReachGrid is a uniform grid of the line segments of reach geometries used
+    to find the nearest reach to points. Reach geometries are lists of (x, y)
+    vertices ordered from the upstream to the downstream end of the reach, as
+    loaded by load_data.load_hydro_mdb() with the geometry option.
+    """
+
+    def __init__(self, reaches, cellSize=GRD_CEL):
+        """
+        INPUTS:
+            reaches     = iterable of Reaches. Reaches without a geometry are
+                skipped.
+
+            cellSize    = (optional) width and height of grid cells in map
+                units. Default (GRD_CEL) is the mean segment length.
+        """
+
+        # split geometries into segments of (reach, x1, y1, x2, y2, distance
+        #   along the reach to the segment start, reach geometry length)
+        segments = []
+        for reach in reaches:
+            vertices = reach.geometry
+            if not vertices: continue
+            start = len(segments)
+            along = 0.
+            for k in xrange(len(vertices)-1):
+                (x1, y1), (x2, y2) = vertices[k], vertices[k+1]
+                segments.append([reach, x1, y1, x2, y2, along, None])
+                along += math.hypot(x2-x1, y2-y1)
+
+            for segment in segments[start:]: segment[6] = along
+
+        if cellSize is None:
+            total = sum([math.hypot(s[3]-s[1], s[4]-s[2]) for s in segments])
+            cellSize = (total / len(segments)) if total > 0 else 1.
+
+        # add each segment to every cell its bounding box overlaps
+        cells = {}
+        for i in xrange(len(segments)):
+            reach, x1, y1, x2, y2 = segments[i][:5]
+            for cx in xrange(int(math.floor(min(x1, x2) / cellSize)), int(math.floor(max(x1, x2) / cellSize)) + 1):
+                for cy in xrange(int(math.floor(min(y1, y2) / cellSize)), int(math.floor(max(y1, y2) / cellSize)) + 1):
+                    cells.setdefault((cx, cy), []).append(i)
+
+        self.segments = segments
+        self.cells = cells
+        self.cellSize = cellSize
+        if len(cells) > 0:
+            self.extent = (
+                min([c[0] for c in cells]), min([c[1] for c in cells]),
+                max([c[0] for c in cells]), max([c[1] for c in cells])
+            )
+
+
+    def nearest(self, x, y, maxDistance=GRD_MXD):
+        """
+        Finds the nearest reach to a point.
+
+        INPUTS:
+            x, y        = point coordinates in the reach geometries' map units
+
+            maxDistance = (optional) largest distance from the point to a
+                reach to snap to. Default (GRD_MXD) is unlimited.
+
+        OUTPUTS: tuple of (reach, fprop, distance), where fprop is the
+            proportion along the reach from its upstream end, or None if no
+            reach is within maxDistance
+        """
+        if len(self.cells) == 0: return None
+        size = self.cellSize
+        px, py = int(math.floor(x / size)), int(math.floor(y / size))
+        x0, y0, x1, y1 = self.extent
+        minRing = max(x0 - px, px - x1, y0 - py, py - y1, 0)
+        maxRing = max(px - x0, x1 - px, py - y0, y1 - py, 0)
+
+        # search rings of cells around the point's cell, starting at the
+        #   first ring that reaches the grid. Segments in ring r or beyond
+        #   are farther than (r - 1) * size from the point.
+        best = None
+        seen = set()
+        for r in xrange(minRing, maxRing + 1):
+            if (best is not None) and (best[2] <= (r - 1) * size): break
+            if (maxDistance is not None) and ((r - 1) * size > maxDistance): break
+            for cell in self.__ring__(px, py, r):
+                for i in self.cells.get(cell, ()):
+                    if i in seen: continue
+                    seen.add(i)
+                    candidate = self.__project__(i, x, y)
+                    if (best is None) or (candidate[2] < best[2]):
+                        best = candidate
+
+        if (best is None) or ((maxDistance is not None) and (best[2] > maxDistance)):
+            return None
+
+        return best
+
+
+    def snap(self, points, maxDistance=GRD_MXD):
+        """
+        Finds the nearest reach to each of many points. See nearest().
+
+        INPUTS:
+            points      = iterable of (x, y) coordinates
+
+            maxDistance = (optional) see nearest()
+
+        OUTPUTS: list of (reach, fprop, distance) tuples or None for each point
+        """
+        return [self.nearest(x, y, maxDistance) for x, y in points]
+
+
+    @staticmethod
+    def __ring__(px, py, r):
+        """Returns the cells r cells away from cell (px, py)."""
+        if r == 0: return [(px, py)]
+        cells = []
+        for cx in xrange(px - r, px + r + 1):
+            cells.append((cx, py - r))
+            cells.append((cx, py + r))
+        for cy in xrange(py - r + 1, py + r):
+            cells.append((px - r, cy))
+            cells.append((px + r, cy))
+        return cells
+
+
+    def __project__(self, i, x, y):
+        """Projects a point onto segment i, returning (reach, fprop, distance)."""
+        reach, x1, y1, x2, y2, along, total = self.segments[i]
+        dx, dy = x2 - x1, y2 - y1
+        norm = dx*dx + dy*dy
+        t = 0. if norm == 0 else min(1., max(0., ((x - x1)*dx + (y - y1)*dy) / norm))
+        distance = math.hypot(x - (x1 + t*dx), y - (y1 + t*dy))
+        fprop = 0. if total == 0 else min(1., (along + t*math.sqrt(norm)) / total)
+        return reach, fprop, distance
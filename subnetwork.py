@@ -0,0 +1,225 @@
+# This file contains views of part of a hydrography network (a lake, a
+#   tributary or everything upstream of a reach) that share the objects of
+#   the full network instead of copying them
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+from hydrography import (
+    Hydrography, OrderedCollection, Barrier, Reach, Catchment, Tributary, Lake
+)
+
+
+# ~~ SUBNETWORK ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class SubNetwork(Hydrography):
+    """
+    SubNetwork is a Hydrography restricted to a Lake, a Tributary, or a Reach
+    and everything upstream of it. It holds no objects of its own: members
+    are found from the full network's objects when needed, so creating a
+    SubNetwork takes constant time. All Hydrography methods work on the
+    members of the view, and tracing and aggregation stop at its edges.
+    """
+
+    def __init__(self, hydrography, feature):
+        """
+        INPUTS:
+            hydrography = full Hydrography (or another SubNetwork) to view
+
+            feature     = Lake, Tributary or Reach of the hydrography to
+                restrict the view to
+        """
+        if isinstance(hydrography, SubNetwork):
+            if not hydrography.contains(feature):
+                raise ValueError('%s is not in %s.' % (repr(feature), repr(hydrography)))
+            hydrography = hydrography.network
+
+        if not isinstance(feature, (Lake, Tributary, Reach)):
+            raise TypeError('SubNetworks are restricted to a Lake, Tributary or Reach.')
+
+        self.network = hydrography
+        self.feature = feature
+        self.ids = hydrography.ids
+        self.version = hydrography.version
+        self.problems = hydrography.problems
+        self.tree = hydrography.reach_index() if isinstance(feature, Reach) else None
+
+
+    def __repr__(self):
+        return 'SubNetwork of %s' % repr(self.feature)
+
+
+    def __getstate__(self):
+        """Pickles the full network and the ID of the feature."""
+        return {'network': self.network, 'feature': (self.feature.__class__, self.feature.id)}
+
+
+    def __setstate__(self, state):
+        featureType, featureID = state['feature']
+        network = state['network']
+        self.__init__(network, network.get_object(featureType, featureID))
+
+
+    @property
+    def lakes(self):
+        """List of the Lakes in the view."""
+        return list(self.get_lakes())
+
+
+    def lake_ids(self):
+        """Returns a list of the IDs of the Lakes in the view."""
+        return [lake.id for lake in self.get_lakes()]
+
+
+    def get_lake(self, lakeID):
+        """See Hydrography.get_lake(), restricted to members of self."""
+        lake = self.network.get_lake(lakeID)
+        if not self.contains(lake):
+            raise KeyError('%s is not in %s.' % (repr(lake), repr(self)))
+        return lake
+
+
+    def contains(self, obj):
+        """Returns True if obj is part of the view, and False otherwise."""
+        feature = self.feature
+        if isinstance(feature, Lake):
+            if isinstance(obj, Lake): return obj is feature
+            if isinstance(obj, Tributary): return obj.lake is feature
+            tributary = obj.__dict__.get('tributary')
+            return (tributary is not None) and (tributary.lake is feature)
+
+        elif isinstance(feature, Tributary):
+            if isinstance(obj, Lake): return obj is feature.lake
+            if isinstance(obj, Tributary): return obj is feature
+            return obj.__dict__.get('tributary') is feature
+
+        # upstream of a reach, where catchments are included when their most
+        #   downstream reach is
+        else:
+            if isinstance(obj, Lake): return obj is feature.tributary.lake
+            if isinstance(obj, Tributary): return obj is feature.tributary
+            if isinstance(obj, Barrier): return self.tree.is_upstream(obj.reach, feature)
+            if isinstance(obj, Catchment):
+                return any([
+                    self.tree.is_upstream(r, feature) for r in obj.reaches
+                    if (r.down is r) or (r.down.catchment is not obj)
+                ])
+            return self.tree.is_upstream(obj, feature)
+
+
+    def subnetwork(self, feature):
+        """Returns a SubNetwork of feature, which must be in self."""
+        return SubNetwork(self, feature)
+
+
+    def get_object(self, objType, oid):
+        """See Hydrography.get_object(), restricted to members of self."""
+        obj = self.network.get_object(objType, oid)
+        if not self.contains(obj):
+            raise KeyError('%s is not in %s.' % (repr(obj), repr(self)))
+        return obj
+
+
+    def get_objects(self, objType):
+        """Returns all objects of a given class in the view."""
+        feature = self.feature
+        if isinstance(feature, Lake):
+            tributaries = feature.tributaries
+        else:
+            tributaries = [feature.tributary] if isinstance(feature, Reach) else [feature]
+
+        if objType is Lake:
+            return set([t.lake for t in tributaries if t.lake is not None])
+        elif objType is Tributary:
+            return set(tributaries)
+
+        # reaches upstream of a reach are a contiguous block of the tree
+        if isinstance(feature, Reach):
+            i = self.tree.index[feature]
+            reaches = self.tree.nodes[i:self.tree.end[i]]
+        else:
+            reaches = [r for t in tributaries for r in t.reaches]
+
+        objects = set()
+        if objType is Reach:
+            objects.update(reaches)
+        elif objType is Catchment:
+            if isinstance(feature, Reach):
+                objects.update([r.catchment for r in reaches if self.contains(r.catchment)])
+            else:
+                for t in tributaries: objects.update(t.catchments)
+        elif objType is Barrier:
+            for reach in reaches: objects.update(reach.barriers)
+        else:
+            raise TypeError('Unknown return type: %s' % objType.__name__)
+
+        return objects
+
+
+    def trace_up(self, startingObject, levels=None, filters=None):
+        """
+        Traces upstream of a reach, catchment or barrier within the view. See
+        Tributary.trace_up().
+        """
+        upstream = startingObject.tributary.trace_up(startingObject, levels, filters)
+        if isinstance(self.feature, (Lake, Tributary)): return upstream
+        return set([obj for obj in upstream if self.contains(obj)])
+
+
+    def trace_down(self, startingObject, levels=None, filters=None):
+        """
+        Traces downstream of an object within the view. See
+        OrderedObject.trace_down().
+        """
+        downstream = []
+        for obj in startingObject.trace_down(levels, filters):
+            if not self.contains(obj): break
+            downstream.append(obj)
+        return downstream
+
+
+    def length_all(self, ignoreNone=True):
+        """Calculates the total length of reaches in the view."""
+        return OrderedCollection.__operate_over__(
+            self.get_reaches(), 'length', '+', ignoreNone
+        )
+
+
+    def area_all(self, ignoreNone=True):
+        """Calculates the total area of catchments in the view."""
+        return OrderedCollection.__operate_over__(
+            self.get_catchments(), 'area', '+', ignoreNone
+        )
+
+
+    def length_up(self, reach, levels=None, ignoreNone=True):
+        """Calculates the length of reaches upstream of reach in the view."""
+        return OrderedCollection.__operate_over__(
+            self.trace_up(reach, levels), 'length', '+', ignoreNone
+        )
+
+
+    def length_down(self, reach, levels=None, ignoreNone=True):
+        """Calculates the length of reaches downstream of reach in the view."""
+        return OrderedCollection.__operate_over__(
+            self.trace_down(reach, levels), 'length', '+', ignoreNone
+        )
+
+
+    def area_up(self, catchment, levels=None, ignoreNone=True):
+        """Calculates the area of catchments upstream of catchment in the view."""
+        return OrderedCollection.__operate_over__(
+            self.trace_up(catchment, levels), 'area', '+', ignoreNone
+        )
+
+
+    def area_down(self, catchment, levels=None, ignoreNone=True):
+        """
+        Calculates the area of catchments downstream of catchment in the
+        view.
+        """
+        return OrderedCollection.__operate_over__(
+            self.trace_down(catchment, levels), 'area', '+', ignoreNone
+        )
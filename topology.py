@@ -0,0 +1,360 @@
+# This file contains linear-time topology tools for hydrography networks,
+#   including tree indexing of downstream links and validation of formatted
+#   data before hydrography creation
+
+# Created 10/19/2026
+# Updated 10/19/2026
+# Author: Austin Milt
+# ArcGIS version: 10.3.1
+# Python version: 2.7.8
+
+
+# ~~ GLOBAL CONSTANTS ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# validate_data()
+VAL_DUP = 'duplicate' # ID appears more than once in a dataset
+VAL_MIS = 'missing' # referenced ID does not exist
+VAL_CYC = 'cycle' # downstream links form a loop
+VAL_HIE = 'hierarchy' # reach, catchment and tributary links disagree
+VAL_ORD = 'order' # barrier downstream link disagrees with reach order
+VAL_ORP = 'orphan' # object is discarded because nothing refers to it
+VAL_WRN = (VAL_ORP,) # problem kinds that are reported but do not stop creation
+VAL_MAX = 20 # maximum number of problems listed in a TopologyError message
+
+
+# ~~ TREE INDEX ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class TreeIndex(object):
+    """
+    TreeIndex numbers the nodes of a forest of downstream links in preorder
+    (downstream to upstream) so that every node's upstream subtree is a
+    contiguous block of the numbering. Upstream/downstream relationships can
+    then be answered with integer comparisons instead of traces.
+    """
+
+    def __init__(self, downs):
+        """
+        INPUTS:
+            downs   = dictionary where keys are nodes and values are the next
+                downstream node. Nodes that are their own downstream node,
+                have None as their downstream node, or drain to a node that is
+                not a key are roots.
+        """
+
+        # find roots and upstream nodes of each node
+        children = dict((node, []) for node in downs)
+        roots = []
+        for node in downs:
+            down = downs[node]
+            if (down is None) or (down == node) or (down not in children):
+                roots.append(node)
+            else:
+                children[down].append(node)
+
+        # number nodes in preorder
+        nodes = []
+        parent = []
+        depth = []
+        index = {}
+        stack = [(root, -1, 0) for root in roots]
+        while len(stack) > 0:
+            node, p, d = stack.pop()
+            i = len(nodes)
+            index[node] = i
+            nodes.append(node)
+            parent.append(p)
+            depth.append(d)
+            stack.extend([(child, i, d+1) for child in children[node]])
+
+        # subtree of node i is nodes[i:end[i]]
+        end = range(1, len(nodes)+1)
+        for i in xrange(len(nodes)-1, 0, -1):
+            if parent[i] >= 0:
+                end[parent[i]] = max(end[parent[i]], end[i])
+
+        self.nodes = nodes
+        self.index = index
+        self.parent = parent
+        self.depth = depth
+        self.end = end
+        self.roots = roots
+
+        # nodes that do not drain to a root are in or upstream of a cycle
+        self.unreached = [node for node in downs if node not in index]
+
+
+    @classmethod
+    def from_objects(cls, objects):
+        """Creates a TreeIndex from the down attributes of OrderedObjects."""
+        return cls(dict((obj, (None if obj.down is obj else obj.down)) for obj in objects))
+
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+    def __contains__(self, node):
+        return node in self.index
+
+
+    def is_upstream(self, node, other):
+        """
+        Returns True if node is upstream of (or is) other, and False otherwise
+        or when either node is not indexed.
+        """
+        if (node not in self.index) or (other not in self.index): return False
+        i = self.index[node]
+        j = self.index[other]
+        return (j <= i) and (i < self.end[j])
+
+
+    def upstream(self, node):
+        """Returns the list of all nodes upstream of node, in preorder."""
+        i = self.index[node]
+        return self.nodes[i+1:self.end[i]]
+
+
+
+# ~~ find_cycles() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def find_cycles(downs):
+    """
+    FIND_CYCLES() finds all loops in a dictionary of downstream links,
+    visiting each node once.
+
+    INPUT:
+        downs   = dictionary where keys are nodes and values are the next
+            downstream node (see TreeIndex)
+
+    OUTPUT: list of cycles, each a list of nodes in downstream order
+    """
+    walk = {}
+    cycles = []
+    for start in downs:
+        if start in walk: continue
+
+        # follow downstream links until reaching a root or a visited node
+        path = []
+        node = start
+        while (node in downs) and (node not in walk):
+            walk[node] = start
+            path.append(node)
+            down = downs[node]
+            if (down is None) or (down == node): break
+            node = down
+
+        # reaching a node visited on this walk means a loop
+        else:
+            if (node in walk) and (walk[node] == start):
+                cycles.append(path[path.index(node):])
+
+    return cycles
+
+
+
+# ~~ TOPOLOGY ERROR ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+class TopologyError(ValueError):
+    """
+    TopologyError is raised when formatted hydrography data has problems that
+    prevent creating a valid network. All problems are kept in the problems
+    attribute as returned by find_problems().
+    """
+
+    def __init__(self, problems):
+        self.problems = problems
+        counts = {}
+        for problem in problems:
+            counts[problem[0]] = counts.get(problem[0], 0) + 1
+
+        lines = ['Found %i topology problems (%s):' % (
+            len(problems),
+            ', '.join(['%i %s' % (counts[k], k) for k in sorted(counts)])
+        )]
+        lines.extend(['    %s' % problem[3] for problem in problems[:VAL_MAX]])
+        if len(problems) > VAL_MAX:
+            lines.append('    ... and %i more' % (len(problems) - VAL_MAX))
+
+        ValueError.__init__(self, '\n'.join(lines))
+
+
+
+# ~~ find_problems() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def find_problems(data, barrierLinks=True):
+    """
+    FIND_PROBLEMS() checks data formatted for Hydrography for duplicate IDs,
+    missing downstream or parent IDs, cycles, reaches whose downstream reach
+    leaves their catchment or tributary inconsistently, barriers whose
+    downstream barrier disagrees with reach order, and orphan catchments.
+    Every check is a single pass over the tables.
+
+    INPUT:
+        data        = dictionary formatted for Hydrography (see
+            load_data.load_hydro_mdb())
+
+        barrierLinks = (optional) whether to check (True) the downstream
+            barrier IDs. Default is True.
+
+    OUTPUT: list of (kind, dataset, id, message) tuples, where kind is one of
+        the VAL_ constants
+    """
+
+    from hydrography import (
+        CRH_DAT_BAR, CRH_DAT_FLO, CRH_DAT_CAT, CRH_DAT_TRB, CRH_FLD_BID,
+        CRH_FLD_BDS, CRH_FLD_RID, CRH_FLD_FPR, CRH_FLD_RDS, CRH_FLD_TID,
+        CRH_FLD_CAT, CRH_FLD_CDS
+    )
+
+    problems = []
+
+    # read ID columns from each table
+    def read(dataset, idField, otherFields):
+        fields, table = data[dataset]
+        rows = {}
+        for row in table:
+            oid = row[fields[idField]]
+            if oid in rows:
+                problems.append((
+                    VAL_DUP, dataset, oid,
+                    'Duplicate ID %s in %s' % (repr(oid), dataset)
+                ))
+            rows[oid] = tuple(row[fields[k]] for k in otherFields)
+        return rows
+
+    barriers = read(CRH_DAT_BAR, CRH_FLD_BID, (CRH_FLD_BDS, CRH_FLD_RID, CRH_FLD_FPR))
+    reaches = read(CRH_DAT_FLO, CRH_FLD_RID, (CRH_FLD_RDS, CRH_FLD_CAT, CRH_FLD_TID))
+    catchments = read(CRH_DAT_CAT, CRH_FLD_CAT, (CRH_FLD_CDS,))
+    tributaries = read(CRH_DAT_TRB, CRH_FLD_TID, ())
+
+    # check that downstream IDs exist and do not form cycles
+    def check_links(dataset, rows, check):
+        downs = dict((oid, None) for oid in rows)
+        if not check: return downs
+        for oid in rows:
+            down = rows[oid][0]
+            if (down is not None) and (down not in rows):
+                problems.append((
+                    VAL_MIS, dataset, oid,
+                    'Downstream ID %s of %s in %s does not exist' % (repr(down), repr(oid), dataset)
+                ))
+                down = None
+            downs[oid] = down
+
+        for cycle in find_cycles(downs):
+            problems.append((
+                VAL_CYC, dataset, cycle[0],
+                'Downstream IDs form a cycle in %s: %s' % (
+                    dataset, ' -> '.join([repr(oid) for oid in cycle + cycle[:1]])
+                )
+            ))
+
+        return downs
+
+    barrierDowns = check_links(CRH_DAT_BAR, barriers, barrierLinks)
+    reachDowns = check_links(CRH_DAT_FLO, reaches, True)
+    check_links(CRH_DAT_CAT, catchments, True)
+
+    # check reach parents and that reach, catchment and tributary links agree
+    catchmentTributary = {}
+    for rid in reaches:
+        rds, cid, tid = reaches[rid]
+        if cid not in catchments:
+            problems.append((
+                VAL_MIS, CRH_DAT_FLO, rid,
+                'Catchment %s of reach %s does not exist' % (repr(cid), repr(rid))
+            ))
+        elif catchmentTributary.setdefault(cid, tid) != tid:
+            problems.append((
+                VAL_HIE, CRH_DAT_FLO, rid,
+                'Reach %s is in tributary %s but its catchment %s is in tributary %s' % (
+                    repr(rid), repr(tid), repr(cid), repr(catchmentTributary[cid])
+                )
+            ))
+
+        if tid not in tributaries:
+            problems.append((
+                VAL_ORP, CRH_DAT_FLO, rid,
+                'Reach %s is discarded because its tributary %s does not exist' % (repr(rid), repr(tid))
+            ))
+
+        if reachDowns[rid] is None: continue
+        dcid, dtid = reaches[rds][1:]
+        if dtid != tid:
+            problems.append((
+                VAL_HIE, CRH_DAT_FLO, rid,
+                'Reach %s in tributary %s drains to reach %s in tributary %s' % (
+                    repr(rid), repr(tid), repr(rds), repr(dtid)
+                )
+            ))
+        elif (dcid != cid) and (cid in catchments) and (catchments[cid][0] != dcid):
+            problems.append((
+                VAL_HIE, CRH_DAT_FLO, rid,
+                'Reach %s drains from catchment %s to catchment %s, but catchment %s drains to %s' % (
+                    repr(rid), repr(cid), repr(dcid), repr(cid), repr(catchments[cid][0])
+                )
+            ))
+
+    # check barrier parents and that barrier links follow the reach order
+    reachIndex = TreeIndex(reachDowns)
+    for bid in barriers:
+        bds, rid, fprop = barriers[bid]
+        if rid not in reaches:
+            problems.append((
+                VAL_ORP, CRH_DAT_BAR, bid,
+                'Barrier %s is discarded because its reach %s does not exist' % (repr(bid), repr(rid))
+            ))
+            continue
+
+        if (not barrierLinks) or (barrierDowns[bid] is None): continue
+        drid, dfprop = barriers[bds][1:]
+        if drid == rid:
+            consistent = dfprop >= fprop
+        else:
+            consistent = reachIndex.is_upstream(rid, drid) or (drid not in reachIndex) or (rid not in reachIndex)
+        if not consistent:
+            problems.append((
+                VAL_ORD, CRH_DAT_BAR, bid,
+                'Barrier %s drains to barrier %s, which is not downstream of it along reaches' % (
+                    repr(bid), repr(bds)
+                )
+            ))
+
+    # check for catchments and tributaries without reaches
+    for cid in catchments:
+        if cid not in catchmentTributary:
+            problems.append((
+                VAL_ORP, CRH_DAT_CAT, cid,
+                'Catchment %s is discarded because it has no reaches' % repr(cid)
+            ))
+
+    return problems
+
+
+
+# ~~ validate_data() ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+def validate_data(data, barrierLinks=True, verbose=True):
+    """
+    VALIDATE_DATA() checks data formatted for Hydrography with
+    find_problems(), raising a TopologyError listing every problem that
+    would prevent creating a valid network.
+
+    INPUT:
+        data        = dictionary formatted for Hydrography
+
+        barrierLinks = (optional) see find_problems()
+
+        verbose     = (optional) whether to print (True) a warning summarizing
+            problems that do not stop creation. Default is True.
+
+    OUTPUT: list of problems as returned by find_problems()
+    """
+    problems = find_problems(data, barrierLinks)
+    errors = [p for p in problems if p[0] not in VAL_WRN]
+    if len(errors) > 0:
+        raise TopologyError(errors)
+
+    if verbose:
+        counts = {}
+        for problem in problems:
+            counts[problem[1]] = counts.get(problem[1], 0) + 1
+        for dataset in sorted(counts):
+            print 'WARNING: Automatically discarded %i %s that are not connected to the network.' % (counts[dataset], dataset)
+
+    return problems